@@ -0,0 +1,1032 @@
+"""Headless football skill analysis core.
+
+Upload, skill detection, prompts, Gemini analysis and response parsing,
+plus the process-wide scheduling around them: deadline budgets,
+cancellation, request coalescing, memory admission and overload
+degradation. Importing this module has no Streamlit side effects and
+loads the Gemini SDK only on first use, so workers, CLIs and tests can
+reuse it.
+
+Status updates go through a progress callback `progress(level, message)`
+where level is "info", "success", "warning" or "error".
+"""
+import os
+import time
+import logging
+import hashlib
+import asyncio
+import threading
+import concurrent.futures
+import collections
+import contextlib
+import math
+
+import rubric
+from rubric import NOT_CLEAR_AR
+from result_cache import gemini_file_cache_key, GEMINI_FILE_CACHE_TTL_SECONDS
+
+# --- Constants ---
+
+# Assessment options
+ASSESSMENT_OPTIONS = {
+    "تمرير": "Passing",
+    "استقبال": "Receiving", 
+    "كلاهما": "Both"
+}
+
+# Assessment grades in Arabic - Updated with new rubric terminology
+GRADE_MAP = {
+    "مثالي": "مثالي",
+    "الزاوية المثالية": "مثالي",
+    "جيد": "جيد",
+    "النطاق الجيد": "جيد",
+    "غير مقبول": "غير مقبول",
+    "تحذير": "غير مقبول",
+    "غير مقبول/تحذير": "غير مقبول",
+    # Legacy mappings for compatibility
+    "ضعيف": "غير مقبول",
+    "متوسط": "جيد", 
+    "poor": "غير مقبول",
+    "average": "جيد",
+    "good": "جيد",
+    "weak": "غير مقبول",
+    "medium": "جيد",
+    "excellent": "مثالي",
+    "ideal": "مثالي",
+    "acceptable": "جيد",
+    "unacceptable": "غير مقبول",
+    "warning": "غير مقبول"
+}
+
+# Gemini Models - Updated with latest models
+GEMINI_MODELS = [
+    # Gemini 2.5 Series (Latest and Recommended)
+    "models/gemini-2.5-flash",
+    "models/gemini-2.5-pro",
+    
+    # Gemini 2.0 Series
+    "models/gemini-2.0-flash",
+    "models/gemini-2.0-pro", 
+    "models/gemini-2.0-flash-exp",
+    "models/gemini-2.0-flash-thinking-exp",
+    
+    # Gemini 1.5 Series (Legacy - for compatibility)
+    "models/gemini-1.5-pro",
+    "models/gemini-1.5-flash", 
+    "models/gemini-1.5-flash-8b",
+    "models/gemini-1.5-pro-exp-0827",
+    "models/gemini-1.5-pro-exp-0801",
+    "models/gemini-1.5-flash-exp-0827",
+    "models/gemini-1.5-flash-8b-exp-0827",
+    
+    # Additional models
+    "models/gemini-pro",
+    "models/gemini-pro-vision"
+]
+
+DEFAULT_GEMINI_MODEL = "models/gemini-2.5-flash"
+
+# Local pose-estimation backend (pose_backend.py): graded on the CPU, no upload or API call
+LOCAL_POSE_MODEL = "local/mediapipe-pose"
+ANALYSIS_MODELS = GEMINI_MODELS + [LOCAL_POSE_MODEL]
+
+# Placeholder value shipped in .env.example
+PLACEHOLDER_API_KEY = "your_gemini_api_key_here"
+
+def no_progress(level, message):
+    """Default progress callback: drop status updates."""
+
+# --- Gemini SDK ---
+def _genai():
+    """Import the Gemini SDK on first use; it dominates this module's import time."""
+    import google.generativeai as genai
+    return genai
+
+def resolve_api_key(secrets=None):
+    """Find the Gemini API key; returns (key, source) or (None, None).
+
+    `secrets` is an optional mapping checked before the GEMINI_API_KEY and
+    GOOGLE_API_KEY environment variables (e.g. Streamlit secrets).
+    """
+    candidates = []
+    if secrets is not None:
+        try:
+            candidates.append((secrets["GEMINI_API_KEY"], "secrets"))
+        except (KeyError, FileNotFoundError):
+            logging.info("Gemini API Key not found in secrets, trying environment variables.")
+    candidates.append((os.getenv("GEMINI_API_KEY"), "GEMINI_API_KEY environment variable"))
+    candidates.append((os.getenv("GOOGLE_API_KEY"), "GOOGLE_API_KEY environment variable"))
+    for api_key, source in candidates:
+        if api_key:
+            if api_key == PLACEHOLDER_API_KEY:
+                return None, None
+            logging.info(f"Gemini API Key loaded from {source}.")
+            return api_key, source
+    return None, None
+
+def configure_gemini(api_key, requests_per_minute=None):
+    """Configure the Gemini SDK for this process, optionally rate limiting requests with this key."""
+    global _active_rate_limiter
+    _genai().configure(api_key=api_key)
+    _active_rate_limiter = get_rate_limiter(api_key, requests_per_minute) if requests_per_minute else None
+    logging.info("Gemini API configured successfully.")
+
+# --- Analysis Deadline ---
+# One end-to-end budget per analysis, shared by upload, detection and analysis.
+ANALYSIS_DEADLINE_SECONDS = float(os.getenv("ANALYSIS_DEADLINE_SECONDS", "360"))
+
+# Per-stage ceilings; a stage never gets more than what is left of the budget
+UPLOAD_PROCESSING_TIMEOUT = 300
+DETECTION_TIMEOUT = 120
+ANALYSIS_TIMEOUT = 180
+POLL_INTERVAL_SECONDS = 10
+
+# A Gemini call with less time than this is not worth starting
+MIN_STAGE_SECONDS = 15
+# Budget held back for the assessment call while upload/detection run
+ANALYSIS_RESERVE_SECONDS = 60
+
+# How often waits wake up to check for cancellation
+CANCEL_CHECK_INTERVAL = 0.5
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the remaining analysis budget cannot cover the next stage."""
+
+class AnalysisCancelled(Exception):
+    """Raised when an analysis was abandoned (tab closed, file changed or re-submitted)."""
+
+class AnalysisBudget:
+    """End-to-end time budget for one analysis, split across the pipeline stages.
+
+    The budget also carries the analysis' cancellation state: it is cancelled
+    explicitly via `cancel()` or implicitly when `is_alive()` reports that
+    nobody is waiting for the result any more. Token usage of the calls made
+    under it is added up in `usage`.
+    """
+
+    def __init__(self, total_seconds=ANALYSIS_DEADLINE_SECONDS, is_alive=None):
+        self.total_seconds = total_seconds
+        self.deadline = time.monotonic() + total_seconds
+        self.is_alive = is_alive
+        self._cancelled = threading.Event()
+        # Token usage of the Gemini calls made under this budget
+        self.usage = {"calls": 0, "prompt_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+
+    def remaining(self):
+        """Seconds left before the deadline (never negative)."""
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        if not self._cancelled.is_set() and self.is_alive and not self.is_alive():
+            self._cancelled.set()
+        return self._cancelled.is_set()
+
+    def check(self):
+        """Raise if the analysis was cancelled or the deadline has passed."""
+        if self.cancelled:
+            raise AnalysisCancelled("تم إلغاء التحليل.")
+        if self.remaining() <= 0:
+            raise DeadlineExceeded(f"انتهت المهلة الإجمالية للتحليل ({int(self.total_seconds)} ثانية). حاول مرة أخرى.")
+
+    def sleep(self, seconds):
+        """Sleep up to `seconds`, waking early to raise if the analysis is cancelled."""
+        end = time.monotonic() + seconds
+        while True:
+            self.check()
+            left = end - time.monotonic()
+            if left <= 0:
+                return
+            self._cancelled.wait(min(left, CANCEL_CHECK_INTERVAL))
+
+    def restart(self):
+        """Start the deadline clock again, e.g. once a queued analysis is admitted."""
+        self.deadline = time.monotonic() + self.total_seconds
+
+    def stage_timeout(self, ceiling, reserve=0):
+        """Timeout for the next stage: the remaining budget minus `reserve`, capped at `ceiling`."""
+        self.check()
+        available = min(ceiling, self.remaining() - reserve)
+        if available < MIN_STAGE_SECONDS:
+            raise DeadlineExceeded(f"انتهت المهلة الإجمالية للتحليل ({int(self.total_seconds)} ثانية). حاول مرة أخرى.")
+        return available
+
+# --- Cancellable Gemini Calls ---
+# Concurrent generate_content calls per process; further calls wait in line
+GEMINI_MAX_CONCURRENT_CALLS = int(os.getenv("GEMINI_MAX_CONCURRENT_CALLS", "4"))
+
+_call_loop = None
+_singletons_lock = threading.Lock()
+
+def get_gemini_call_loop():
+    """Process-wide event loop that runs Gemini calls behind a concurrency limit.
+
+    Calls run as asyncio tasks so an abandoned analysis can cancel its
+    request outright; the freed slot goes to the next waiting call.
+    """
+    global _call_loop
+    with _singletons_lock:
+        if _call_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="gemini-calls", daemon=True).start()
+            _call_loop = (loop, asyncio.Semaphore(GEMINI_MAX_CONCURRENT_CALLS))
+        return _call_loop
+
+def run_gemini_call(model, contents, timeout, budget):
+    """Run `model.generate_content` on the shared call loop, cancelling it if the analysis is abandoned."""
+    throttle(budget)
+    loop, semaphore = get_gemini_call_loop()
+
+    async def call():
+        async with semaphore:
+            return await model.generate_content_async(contents, request_options={"timeout": timeout})
+
+    future = asyncio.run_coroutine_threadsafe(call(), loop)
+    try:
+        while True:
+            budget.check()
+            try:
+                response = future.result(timeout=CANCEL_CHECK_INTERVAL)
+            except concurrent.futures.TimeoutError:
+                if future.done():
+                    raise
+                continue
+            record_usage(budget, response)
+            return response
+    finally:
+        if not future.done():
+            future.cancel()
+            logging.info("Cancelled in-flight Gemini call")
+
+def record_usage(budget, response):
+    """Add a response's token counts to the budget's usage totals."""
+    budget.usage["calls"] += 1
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata is None:
+        return
+    budget.usage["prompt_tokens"] += getattr(metadata, "prompt_token_count", 0) or 0
+    budget.usage["output_tokens"] += getattr(metadata, "candidates_token_count", 0) or 0
+    budget.usage["total_tokens"] += getattr(metadata, "total_token_count", 0) or 0
+
+# --- Rate Limiting ---
+class RateLimiter:
+    """Token bucket pacing Gemini requests made with one API key."""
+
+    def __init__(self, requests_per_minute):
+        self.requests_per_minute = requests_per_minute
+        self._rate = requests_per_minute / 60.0
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, budget=None):
+        """Wait for the next request slot; the wait is cancellable through `budget`."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(1.0, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self._rate
+            if budget:
+                budget.sleep(wait)
+            else:
+                time.sleep(wait)
+
+# API key fingerprint -> RateLimiter, shared by every caller using that key
+_rate_limiters = {}
+_active_rate_limiter = None
+
+def get_rate_limiter(api_key, requests_per_minute):
+    """The process-wide limiter for `api_key`, created or re-rated on demand."""
+    fingerprint = hashlib.sha256(api_key.encode()).hexdigest()[:12]
+    with _singletons_lock:
+        limiter = _rate_limiters.get(fingerprint)
+        if limiter is None or limiter.requests_per_minute != requests_per_minute:
+            limiter = RateLimiter(requests_per_minute)
+            _rate_limiters[fingerprint] = limiter
+            logging.info(f"Rate limiting API key {fingerprint} to {requests_per_minute} requests/minute")
+        return limiter
+
+def throttle(budget=None):
+    """Wait for the configured API key's rate limiter, if any."""
+    if _active_rate_limiter:
+        _active_rate_limiter.acquire(budget)
+
+def delete_gemini_file(gemini_file_obj):
+    """Delete a remote Gemini file, logging instead of raising on failure."""
+    try:
+        throttle()
+        _genai().delete_file(gemini_file_obj.name)
+        logging.info(f"Cleaned up Gemini file: {gemini_file_obj.name}")
+    except Exception as e:
+        logging.warning(f"Could not delete Gemini file: {e}")
+
+def load_gemini_model(model_name, progress=no_progress):
+    """Loads the Gemini model with specific configurations."""
+    try:
+        safety_settings = [
+            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+        ]
+        model = _genai().GenerativeModel(
+            model_name=model_name,
+            safety_settings=safety_settings
+        )
+        logging.info(f"Gemini Model '{model_name}' loaded successfully.")
+        logging.info(f"Safety settings applied: {safety_settings}")
+        return model
+    except Exception as e:
+        progress("error", f"فشل تحميل نموذج Gemini '{model_name}': {e}")
+        logging.error(f"Gemini model loading failed: {e}")
+        return None
+
+def detect_skill_in_video(gemini_file_obj, budget=None, model_name=DEFAULT_GEMINI_MODEL):
+    """Detect what skill is actually shown in the video"""
+    budget = budget or AnalysisBudget()
+    try:
+        # Detection is optional, so it must leave enough budget for the assessment itself
+        timeout = budget.stage_timeout(DETECTION_TIMEOUT, reserve=ANALYSIS_RESERVE_SECONDS)
+    except DeadlineExceeded:
+        logging.warning(f"Skipping skill detection, only {budget.remaining():.0f}s of budget left")
+        return None
+
+    model = load_gemini_model(model_name)
+    if not model:
+        return None
+        
+    detection_prompt = """
+    Watch this football training video and identify the main skill being demonstrated.
+    
+    Look for these specific actions:
+    - تمرير: Player kicking/passing the ball to another location
+    - استقبال: Player receiving/controlling an incoming ball with their foot
+    - تصويب: Player shooting the ball towards a goal
+    - أخرى: Any other football skill
+    
+    Respond with ONLY one of these exact words:
+    تمرير
+    استقبال  
+    تصويب
+    أخرى
+    
+    Nothing else - just the skill name.
+    """
+    
+    try:
+        response = run_gemini_call(model, [detection_prompt, gemini_file_obj], timeout, budget)
+        
+        if not response.candidates:
+            return None
+            
+        candidate = response.candidates[0]
+        if hasattr(candidate, 'finish_reason') and candidate.finish_reason == 2:
+            return None
+            
+        detected_skill = response.text.strip()
+        # Clean up response to get only the skill name
+        for skill in ["تمرير", "استقبال", "تصويب", "أخرى"]:
+            if skill in detected_skill:
+                return skill
+                
+        return None
+        
+    except AnalysisCancelled:
+        raise
+    except Exception as e:
+        logging.error(f"Skill detection failed: {e}")
+        return None
+
+def create_assessment_prompt(skill_type):
+    """Creates the prompt for skill assessment from the rubric table (rubric.py)."""
+    return rubric.assessment_prompt(skill_type)
+
+def upload_and_wait_gemini(video_path, display_name="video_upload", progress=no_progress, budget=None):
+    """Upload video to Gemini and wait for processing."""
+    genai = _genai()
+    budget = budget or AnalysisBudget()
+    uploaded_file = None
+    progress("info", f"جاري رفع الفيديو '{os.path.basename(display_name)}'...")
+    logging.info(f"Starting upload for {display_name}")
+    
+    try:
+        safe_display_name = f"upload_{int(time.time())}_{os.path.basename(display_name)}"
+        throttle(budget)
+        uploaded_file = genai.upload_file(path=video_path, display_name=safe_display_name)
+        progress("info", f"اكتمل الرفع. برجاء الانتظار للمعالجة...")
+        logging.info(f"Upload successful for {display_name}, file name: {uploaded_file.name}")
+
+        timeout = budget.stage_timeout(UPLOAD_PROCESSING_TIMEOUT, reserve=ANALYSIS_RESERVE_SECONDS)
+        start_time = time.monotonic()
+        while uploaded_file.state.name == "PROCESSING":
+            waited = time.monotonic() - start_time
+            if waited > timeout:
+                logging.error(f"Timeout waiting for file processing after {waited:.0f}s")
+                raise TimeoutError(f"انتهت مهلة معالجة الفيديو. حاول مرة أخرى.")
+            budget.sleep(min(POLL_INTERVAL_SECONDS, max(1, timeout - waited)))
+            throttle(budget)
+            uploaded_file = genai.get_file(uploaded_file.name)
+            logging.debug(f"File {uploaded_file.name} state: {uploaded_file.state.name}")
+
+        if uploaded_file.state.name == "FAILED":
+            logging.error(f"File processing failed")
+            raise ValueError(f"فشلت معالجة الفيديو من جانب Google.")
+        elif uploaded_file.state.name != "ACTIVE":
+             logging.error(f"Unexpected file state {uploaded_file.state.name}")
+             raise ValueError(f"حالة ملف فيديو غير متوقعة: {uploaded_file.state.name}")
+
+        budget.check()
+        progress("success", f"الفيديو جاهز للتحليل.")
+        logging.info(f"File {uploaded_file.name} is ACTIVE.")
+        return uploaded_file
+
+    except AnalysisCancelled:
+        logging.info(f"Upload of {display_name} abandoned")
+        if uploaded_file:
+            delete_gemini_file(uploaded_file)
+        raise
+    except DeadlineExceeded as e:
+        progress("error", str(e))
+        logging.error(f"Analysis budget exhausted during upload of {display_name}")
+        # Nobody will use the file, whatever its state
+        if uploaded_file:
+            delete_gemini_file(uploaded_file)
+        return None
+    except Exception as e:
+        progress("error", f"خطأ أثناء رفع/معالجة الفيديو: {e}")
+        logging.error(f"Upload/Wait failed: {e}", exc_info=True)
+        if uploaded_file and uploaded_file.state.name != "ACTIVE":
+            try:
+                genai.delete_file(uploaded_file.name)
+                logging.info(f"Cleaned up failed file: {uploaded_file.name}")
+            except Exception as del_e:
+                 logging.warning(f"Failed to delete file: {del_e}")
+        return None
+
+def create_simple_fallback_prompt(skill_type):
+    """Simple fallback prompt that's less likely to trigger safety filters"""
+    return rubric.fallback_prompt(skill_type)
+
+def analyze_video_skill(gemini_file_obj, skill_type, progress=no_progress, budget=None, model_name=DEFAULT_GEMINI_MODEL, simple_prompt=False):
+    """Analyze video for skill assessment."""
+    budget = budget or AnalysisBudget()
+    model = load_gemini_model(model_name)
+    if not model:
+        return None
+        
+    prompt = create_simple_fallback_prompt(skill_type) if simple_prompt else create_assessment_prompt(skill_type)
+    progress("info", f"Gemini يحلل مهارة {skill_type}...")
+    logging.info(f"Requesting analysis for skill '{skill_type}' using file {gemini_file_obj.name}")
+
+    try:
+        response = run_gemini_call(model, [prompt, gemini_file_obj], budget.stage_timeout(ANALYSIS_TIMEOUT), budget)
+
+        # Check if response was blocked by safety filters
+        if not response.candidates:
+             progress("warning", f"استجابة Gemini فارغة لمهارة {skill_type}")
+             logging.warning(f"No candidates returned for {skill_type}")
+             return None
+        
+        # Check for safety blocking
+        candidate = response.candidates[0]
+        if hasattr(candidate, 'finish_reason'):
+            finish_reason = candidate.finish_reason
+            if finish_reason == 2:  # SAFETY
+                progress("error", f"تم حظر المحتوى بواسطة مرشحات الأمان - يرجى استخدام فيديو مختلف")
+                logging.error(f"Content blocked by safety filters for {skill_type}, finish_reason: {finish_reason}")
+                return None
+            elif finish_reason == 3:  # RECITATION
+                progress("error", f"تم حظر المحتوى بسبب مخاوف النسخ - يرجى استخدام فيديو مختلف")
+                logging.error(f"Content blocked by recitation filter for {skill_type}, finish_reason: {finish_reason}")
+                return None
+            elif finish_reason == 4:  # OTHER
+                progress("error", f"فشل في التحليل لأسباب أخرى - يرجى المحاولة مرة أخرى")
+                logging.error(f"Content blocked for other reasons for {skill_type}, finish_reason: {finish_reason}")
+                return None
+
+        # Try to get text, with error handling for safety blocks
+        try:
+            raw_text = response.text.strip()
+            logging.info(f"Raw response for {skill_type}: {raw_text}")
+        except ValueError as ve:
+            if "finish_reason" in str(ve):
+                progress("warning", f"لم يتمكن Gemini من تحليل هذا الفيديو - جاري المحاولة بطريقة مختلفة...")
+                logging.warning(f"Primary prompt blocked, trying fallback for {skill_type}: {ve}")
+                
+                # Try with simpler fallback prompt
+                fallback_prompt = create_simple_fallback_prompt(skill_type)
+                progress("info", f"جاري المحاولة بطريقة مبسطة...")
+                
+                try:
+                    fallback_response = run_gemini_call(model, [fallback_prompt, gemini_file_obj], budget.stage_timeout(ANALYSIS_TIMEOUT), budget)
+                    if fallback_response.candidates and hasattr(fallback_response.candidates[0], 'content'):
+                        raw_text = fallback_response.text.strip()
+                        logging.info(f"Fallback successful for {skill_type}: {raw_text}")
+                        progress("success", f"تم التحليل بنجاح باستخدام طريقة مبسطة")
+                    else:
+                        progress("error", f"فشل في تحليل الفيديو - يرجى استخدام فيديو أوضح")
+                        logging.error(f"Both primary and fallback prompts failed for {skill_type}")
+                        return None
+                except (DeadlineExceeded, AnalysisCancelled):
+                    raise
+                except Exception as fallback_error:
+                    progress("error", f"فشل في تحليل الفيديو - يرجى استخدام فيديو مختلف")
+                    logging.error(f"Fallback also failed for {skill_type}: {fallback_error}")
+                    return None
+            else:
+                raise ve
+        
+        return parse_assessment_text(raw_text, skill_type)
+
+    except AnalysisCancelled:
+        raise
+    except DeadlineExceeded as e:
+        progress("error", str(e))
+        logging.error(f"Analysis budget exhausted for {skill_type}: {budget.remaining():.0f}s left")
+        return None
+    except Exception as e:
+        progress("error", f"حدث خطأ أثناء تحليل مهارة {skill_type}: {e}")
+        logging.error(f"Analysis failed for {skill_type}: {e}", exc_info=True)
+        return None
+
+def parse_assessment_text(raw_text, skill_type):
+    """Parse Gemini's rubric answer into {criterion: grade} (nested per skill for كلاهما)."""
+    if skill_type == "كلاهما":
+        # Parse both skills with detailed criteria
+        results = {
+            'التمرير': {},
+            'الاستلام': {}
+        }
+        
+        lines = raw_text.split('\n')
+        for line in lines:
+            line = line.strip()
+            if ':' in line:
+                parts = line.split(':')
+                if len(parts) >= 2:
+                    key = parts[0].strip()
+                    value = parts[1].strip().replace('[', '').replace(']', '')
+                    
+                    # Map the grade using GRADE_MAP
+                    mapped_value = GRADE_MAP.get(value.lower(), value)
+                    
+                    # Parse passing criteria
+                    if 'التمرير -' in key:
+                        criterion = key.replace('التمرير -', '').strip()
+                        results['التمرير'][criterion] = mapped_value
+                    # Parse receiving criteria
+                    elif 'الاستلام -' in key:
+                        criterion = key.replace('الاستلام -', '').strip()
+                        results['الاستلام'][criterion] = mapped_value
+        
+        # If no detailed results, try fallback parsing
+        if not results['التمرير'] and not results['الاستلام']:
+            for grade in rubric.GRADES:
+                if grade in raw_text:
+                    results['التمرير']['التقييم العام'] = grade
+                    results['الاستلام']['التقييم العام'] = grade
+                    break
+                    
+        return results if results['التمرير'] or results['الاستلام'] else {'التمرير': {'التقييم العام': NOT_CLEAR_AR}, 'الاستلام': {'التقييم العام': NOT_CLEAR_AR}}
+    else:
+        # Parse single skill with detailed criteria
+        results = {}
+        lines = raw_text.split('\n')
+        
+        for line in lines:
+            line = line.strip()
+            if ':' in line:
+                parts = line.split(':')
+                if len(parts) >= 2:
+                    key = parts[0].strip()
+                    value = parts[1].strip().replace('[', '').replace(']', '')
+                    
+                    # Map the grade using GRADE_MAP
+                    mapped_value = GRADE_MAP.get(value.lower(), value)
+                    results[key] = mapped_value
+        
+        # If no detailed results, try simple grade parsing
+        if not results:
+            for grade in rubric.GRADES:
+                if grade in raw_text:
+                    results['التقييم العام'] = grade
+                    break
+                    
+        return results if results else {'التقييم العام': NOT_CLEAR_AR}
+
+# --- Analysis Pipeline ---
+# Skills detected in a clip that this app cannot assess
+UNSUPPORTED_SKILLS = ["تصويب", "أخرى"]
+
+def reuse_cached_gemini_file(cache, content_hash, budget):
+    """Gemini file previously uploaded for this content (by any replica), if it is still ACTIVE."""
+    entry = cache.get_json(gemini_file_cache_key(content_hash))
+    if not entry:
+        return None
+    try:
+        throttle(budget)
+        gemini_file = _genai().get_file(entry["name"])
+    except Exception as e:
+        logging.info(f"Cached Gemini file {entry['name']} is gone: {e}")
+        gemini_file = None
+    if gemini_file is None or gemini_file.state.name != "ACTIVE":
+        cache.discard(gemini_file_cache_key(content_hash))
+        return None
+    logging.info(f"Reusing Gemini file {gemini_file.name} for {content_hash[:12]}")
+    return gemini_file
+
+def run_analysis_pipeline(video_path, display_name, selected_skill, model_name=DEFAULT_GEMINI_MODEL, progress=no_progress, budget=None, tier=None, cache=None, content_hash=None):
+    """Upload, detect and assess one clip; returns an outcome dict for the caller to render.
+
+    `tier` is one of DEGRADATION_TIERS and defaults to the full analysis.
+    With a `cache` backend and the clip's `content_hash`, the Gemini upload
+    is shared through the cache instead of deleted, so re-analyses on any
+    replica skip the upload until GEMINI_FILE_CACHE_TTL_SECONDS passes.
+    """
+    budget = budget or AnalysisBudget()
+    tier = tier or DEGRADATION_TIERS[0]
+    if model_name == LOCAL_POSE_MODEL:
+        return run_local_analysis(video_path, selected_skill, progress, budget, tier, content_hash)
+    model_name = tier["model"] or model_name
+    outcome = {
+        "selected_skill": selected_skill,
+        "model_name": model_name,
+        "degradation_tier": tier["name"],
+        "detection_skipped": tier["skip_detection"],
+        "detected_skill": None,
+        "skill_analyzed": None,
+        "result": None,
+        "error": None,
+        # Seconds per stage and token counts, for batch reports
+        "timings": {},
+        "usage": budget.usage,
+    }
+    started = time.monotonic()
+
+    share_upload = cache is not None and content_hash is not None
+    gemini_file = reuse_cached_gemini_file(cache, content_hash, budget) if share_upload else None
+    if gemini_file:
+        progress("success", "الفيديو جاهز للتحليل.")
+    else:
+        gemini_file = upload_and_wait_gemini(video_path, display_name, progress, budget=budget)
+        if gemini_file and share_upload:
+            cache.set_json(gemini_file_cache_key(content_hash), {"name": gemini_file.name}, GEMINI_FILE_CACHE_TTL_SECONDS)
+    outcome["timings"]["upload"] = round(time.monotonic() - started, 3)
+    if not gemini_file:
+        outcome["error"] = "gemini_upload_failed"
+        outcome["timings"]["total"] = outcome["timings"]["upload"]
+        return outcome
+
+    try:
+        # First, detect what skill is actually in the video (skipped under load)
+        detected_skill = None
+        if not tier["skip_detection"]:
+            progress("info", "🔍 جاري تحديد المهارة في الفيديو...")
+            stage_start = time.monotonic()
+            detected_skill = detect_skill_in_video(gemini_file, budget=budget, model_name=model_name)
+            outcome["timings"]["detection"] = round(time.monotonic() - stage_start, 3)
+        outcome["detected_skill"] = detected_skill
+        if detected_skill in UNSUPPORTED_SKILLS and detected_skill != selected_skill:
+            return outcome
+
+        # Analyze the detected skill, or the selected one if detection was inconclusive
+        skill_to_analyze = detected_skill or selected_skill
+        outcome["skill_analyzed"] = skill_to_analyze
+        stage_start = time.monotonic()
+        outcome["result"] = analyze_video_skill(
+            gemini_file,
+            skill_to_analyze,
+            progress,
+            budget=budget,
+            model_name=model_name,
+            simple_prompt=tier["simple_prompt"]
+        )
+        outcome["timings"]["analysis"] = round(time.monotonic() - stage_start, 3)
+        if not outcome["result"]:
+            outcome["error"] = "analysis_result_none"
+        return outcome
+    finally:
+        # Cleanup Gemini file, also when the pipeline stopped early or was abandoned;
+        # shared uploads are left to expire on Gemini's side
+        if not share_upload:
+            delete_gemini_file(gemini_file)
+        outcome["timings"]["total"] = round(time.monotonic() - started, 3)
+
+def run_local_analysis(video_path, selected_skill, progress, budget, tier, content_hash=None):
+    """`run_analysis_pipeline` for LOCAL_POSE_MODEL: the selected skill is graded from pose keypoints.
+
+    There is no skill detection; the tier only labels the outcome, since
+    the local backend has no cheaper profile to fall back to.
+    """
+    from pose_backend import analyze_video_pose
+
+    started = time.monotonic()
+    result = analyze_video_pose(video_path, selected_skill, progress, budget, content_hash)
+    elapsed = round(time.monotonic() - started, 3)
+    return {
+        "selected_skill": selected_skill,
+        "model_name": LOCAL_POSE_MODEL,
+        "degradation_tier": tier["name"],
+        "detection_skipped": True,
+        "detected_skill": None,
+        "skill_analyzed": selected_skill,
+        "result": result,
+        "error": None if result else "analysis_result_none",
+        "timings": {"analysis": elapsed, "total": elapsed},
+        "usage": budget.usage,
+    }
+
+# --- In-flight Request Coalescing ---
+# Process-wide registry of running analyses keyed by (content hash, skill, model)
+_analysis_flights = {
+    "lock": threading.Lock(),
+    "in_flight": {},
+    "stats": {"requests": 0, "executed": 0, "coalesced": 0},
+}
+
+def get_analysis_flights():
+    return _analysis_flights
+
+def file_content_hash(path, chunk_size=1024 * 1024):
+    """SHA-256 of a clip on disk, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def clip_content_hash(clip):
+    """SHA-256 of a clip given as bytes or a BytesIO-like upload, hashed without copying it."""
+    if hasattr(clip, "getbuffer"):
+        with clip.getbuffer() as buffer:
+            return hashlib.sha256(buffer).hexdigest()
+    return hashlib.sha256(clip).hexdigest()
+
+def run_coalesced(key, run, budget, on_wait=None):
+    """Run `run()` once for concurrent callers with the same key (singleflight).
+
+    The first caller executes the pipeline; callers arriving while it runs
+    attach to it and receive the same outcome. Returns (outcome, shared).
+    If the executing caller is abandoned, a waiting caller takes over with
+    its deadline restarted.
+    """
+    flights = get_analysis_flights()
+    with flights["lock"]:
+        flights["stats"]["requests"] += 1
+
+    while True:
+        with flights["lock"]:
+            future = flights["in_flight"].get(key)
+            is_leader = future is None
+            if is_leader:
+                future = concurrent.futures.Future()
+                flights["in_flight"][key] = future
+                flights["stats"]["executed"] += 1
+            else:
+                flights["stats"]["coalesced"] += 1
+
+        if is_leader:
+            try:
+                outcome = run()
+            except BaseException as e:
+                # The host stopping the leader's thread (e.g. a Streamlit rerun) counts as abandonment
+                error = e if isinstance(e, Exception) else AnalysisCancelled("تم إلغاء التحليل الأصلي.")
+                with flights["lock"]:
+                    del flights["in_flight"][key]
+                future.set_exception(error)
+                raise
+            with flights["lock"]:
+                del flights["in_flight"][key]
+            future.set_result(outcome)
+            return outcome, False
+
+        logging.info(f"Attached to in-flight analysis {key[0][:12]}/{key[1]}/{key[2]}")
+        if on_wait:
+            on_wait()
+        try:
+            while True:
+                budget.check()
+                try:
+                    return future.result(timeout=CANCEL_CHECK_INTERVAL), True
+                except concurrent.futures.TimeoutError:
+                    if future.done():
+                        raise
+        except AnalysisCancelled:
+            if budget.cancelled:
+                raise
+            logging.info("In-flight analysis was abandoned by its owner, retrying")
+            # The retry is a new analysis: it gets a full deadline, not what waiting for the leader left
+            budget.restart()
+            with flights["lock"]:
+                flights["stats"]["coalesced"] -= 1
+
+# --- Memory Admission Control ---
+# Memory the process may use for analyses, including the Streamlit baseline
+ANALYSIS_MEMORY_BUDGET_MB = float(os.getenv("ANALYSIS_MEMORY_BUDGET_MB", "1024"))
+# Working memory per video byte: upload buffer plus temp-file and SDK upload copies
+VIDEO_MEMORY_FACTOR = 2.0
+# Assumed analysis duration until real ones have been measured
+DEFAULT_ANALYSIS_SECONDS = 60
+ADMISSION_WAIT_INTERVAL = 1.0
+
+def process_rss_bytes():
+    """Current resident set size of this process; peak RSS where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS bytes
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+    except (ImportError, AttributeError):
+        return 0
+
+class AdmissionController:
+    """Admits analyses in FIFO order while their video memory fits the memory budget.
+
+    A job costs its video size times VIDEO_MEMORY_FACTOR for as long as it
+    runs. It is admitted when it is first in line and process RSS plus the
+    cost of all in-flight jobs leaves room for it. The RSS already contains
+    part of those jobs, so the estimate errs on the safe side. A job is always
+    admitted when nothing else is running, so one oversized clip cannot stall
+    the queue.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._cond = threading.Condition()
+        self._queue = collections.deque()
+        self._inflight = {}
+        self._durations = collections.deque(maxlen=20)
+
+    def headroom(self):
+        """Bytes left in the budget after process RSS and in-flight jobs."""
+        with self._cond:
+            inflight_bytes = sum(self._inflight.values())
+        return self.budget_bytes - process_rss_bytes() - inflight_bytes
+
+    def snapshot(self):
+        with self._cond:
+            inflight_bytes = sum(self._inflight.values())
+            inflight_jobs = len(self._inflight)
+            queued = len(self._queue)
+        rss = process_rss_bytes()
+        return {
+            "budget_bytes": self.budget_bytes,
+            "rss_bytes": rss,
+            "inflight_bytes": inflight_bytes,
+            "inflight_jobs": inflight_jobs,
+            "queued_jobs": queued,
+            "headroom_bytes": self.budget_bytes - rss - inflight_bytes,
+        }
+
+    def recent_latency(self):
+        """Mean duration of recent analyses in seconds, or None before any finished."""
+        with self._cond:
+            if not self._durations:
+                return None
+            return sum(self._durations) / len(self._durations)
+
+    def estimated_wait(self, position):
+        """Rough seconds until the job at `position` in the queue is admitted."""
+        with self._cond:
+            average = sum(self._durations) / len(self._durations) if self._durations else DEFAULT_ANALYSIS_SECONDS
+            running = max(1, len(self._inflight))
+        return average * math.ceil((position + 1) / running)
+
+    def _can_admit(self, ticket, cost):
+        if self._queue[0] is not ticket:
+            return False
+        if not self._inflight:
+            return True
+        return process_rss_bytes() + sum(self._inflight.values()) + cost <= self.budget_bytes
+
+    @contextlib.contextmanager
+    def admit(self, video_bytes, budget, on_wait=None):
+        """Hold a slot for one analysis of `video_bytes`, queueing until memory allows it.
+
+        `on_wait(position, estimated_seconds)` is called while queued. The
+        analysis deadline starts once the job is admitted.
+        """
+        cost = video_bytes * VIDEO_MEMORY_FACTOR
+        ticket = object()
+        with self._cond:
+            self._queue.append(ticket)
+        try:
+            while True:
+                with self._cond:
+                    if self._can_admit(ticket, cost):
+                        self._queue.popleft()
+                        self._inflight[ticket] = cost
+                        break
+                    position = self._queue.index(ticket)
+                if budget.cancelled:
+                    raise AnalysisCancelled("تم إلغاء التحليل.")
+                if on_wait:
+                    on_wait(position, self.estimated_wait(position))
+                with self._cond:
+                    self._cond.wait(ADMISSION_WAIT_INTERVAL)
+        except BaseException:
+            with self._cond:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                self._cond.notify_all()
+            raise
+
+        logging.info(f"Admitted analysis of {video_bytes / (1024 * 1024):.1f} MB, headroom {self.headroom() / (1024 * 1024):.0f} MB")
+        budget.restart()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._cond:
+                del self._inflight[ticket]
+                self._durations.append(time.monotonic() - started)
+                self._cond.notify_all()
+
+_admission_controller = None
+
+def get_admission_controller():
+    """Process-wide admission controller for video analyses."""
+    global _admission_controller
+    with _singletons_lock:
+        if _admission_controller is None:
+            _admission_controller = AdmissionController(int(ANALYSIS_MEMORY_BUDGET_MB * 1024 * 1024))
+        return _admission_controller
+
+# --- Overload Degradation ---
+# Cheaper analysis profiles, from full detail to the lightest answer we still give
+DEGRADED_GEMINI_MODEL = os.getenv("DEGRADED_GEMINI_MODEL", "models/gemini-2.0-flash")
+DEGRADATION_TIERS = [
+    {"name": "full", "label": "كامل", "skip_detection": False, "simple_prompt": False, "model": None},
+    {"name": "reduced", "label": "مخفف", "skip_detection": True, "simple_prompt": False, "model": None},
+    {"name": "minimal", "label": "سريع", "skip_detection": True, "simple_prompt": True, "model": DEGRADED_GEMINI_MODEL},
+]
+
+# Step down a tier when either signal passes its high mark ...
+OVERLOAD_QUEUE_DEPTH = int(os.getenv("OVERLOAD_QUEUE_DEPTH", "3"))
+OVERLOAD_LATENCY_SECONDS = float(os.getenv("OVERLOAD_LATENCY_SECONDS", "120"))
+# ... and back up only once both are below their low marks
+RECOVER_QUEUE_DEPTH = 0
+RECOVER_LATENCY_SECONDS = OVERLOAD_LATENCY_SECONDS / 2
+# Minimum time between tier changes, so the controller does not flap
+TIER_HOLD_SECONDS = 30
+
+class OverloadController:
+    """Picks the degradation tier for new analyses from queue depth and latency.
+
+    Moves one tier at a time with hysteresis: it degrades while the queue or
+    the recent analysis latency is past its high mark, and steps back up once
+    both are below their low marks.
+    """
+
+    def __init__(self, admission):
+        self.admission = admission
+        self.level = 0
+        self._lock = threading.Lock()
+        self._last_change = 0.0
+
+    def current_tier(self):
+        """Re-evaluate the load and return the tier a new analysis should use."""
+        queued = self.admission.snapshot()["queued_jobs"]
+        latency = self.admission.recent_latency() or 0
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_change >= TIER_HOLD_SECONDS:
+                previous = self.level
+                if queued >= OVERLOAD_QUEUE_DEPTH or latency >= OVERLOAD_LATENCY_SECONDS:
+                    self.level = min(self.level + 1, len(DEGRADATION_TIERS) - 1)
+                elif queued <= RECOVER_QUEUE_DEPTH and latency <= RECOVER_LATENCY_SECONDS:
+                    self.level = max(self.level - 1, 0)
+                if self.level != previous:
+                    self._last_change = now
+                    logging.warning(
+                        f"Analysis tier {DEGRADATION_TIERS[previous]['name']} -> {DEGRADATION_TIERS[self.level]['name']} "
+                        f"(queued={queued}, latency={latency:.0f}s)"
+                    )
+            return DEGRADATION_TIERS[self.level]
+
+    def last_tier(self):
+        """The tier from the last `current_tier()` call, without re-evaluating the load (for display)."""
+        return DEGRADATION_TIERS[self.level]
+
+_overload_controller = None
+
+def get_overload_controller():
+    """Process-wide overload controller, fed by the admission controller's load signals."""
+    global _overload_controller
+    admission = get_admission_controller()
+    with _singletons_lock:
+        if _overload_controller is None:
+            _overload_controller = OverloadController(admission)
+        return _overload_controller
@@ -0,0 +1,81 @@
+"""Buffered analytics events for the Streamlit app.
+
+Events are appended to a bounded ring buffer in the session's analytics
+data (st.session_state.analytics_session) and flushed once per script run
+as a single data-only page element, which static/analytics.js forwards to
+Google Analytics. Each run therefore costs one element and O(events logged
+in that run), however long the session has been open.
+
+A page_view is recorded once per session and page, not on every rerun.
+
+No Streamlit import, so the buffer can be exercised without a server
+(see benchmarks/bench_analytics.py).
+"""
+import html
+import json
+import collections
+from datetime import datetime, timezone
+
+# Events kept per session; older events are dropped first
+ANALYTICS_BUFFER_SIZE = 200
+
+def new_analytics_session(session_id):
+    return {
+        "session_id": session_id,
+        "start_time": datetime.now(timezone.utc).isoformat(),
+        "events": collections.deque(maxlen=ANALYTICS_BUFFER_SIZE),
+        # Sequence number of the next event, and of the first one not yet flushed
+        "next_seq": 0,
+        "flushed_seq": 0,
+        "page_views": set(),
+    }
+
+def ga_params(session, event_name, properties=None):
+    """GA4 event parameters: the session's fixed fields plus `properties` as strings."""
+    params = {
+        "event_category": "user_interaction",
+        "event_label": event_name,
+        "session_id": session["session_id"],
+    }
+    for key, value in (properties or {}).items():
+        # Convert to GA4 compatible format
+        params[key.replace(" ", "_").lower()] = str(value)
+    return params
+
+def record_event(session, event_name, properties=None):
+    """Append an event to the session's buffer; returns False for a repeated page_view."""
+    if event_name == "page_view":
+        page = json.dumps(properties or {}, sort_keys=True, ensure_ascii=False)
+        if page in session["page_views"]:
+            return False
+        session["page_views"].add(page)
+    session["events"].append({
+        "id": f"{session['session_id']}-{session['next_seq']}",
+        "seq": session["next_seq"],
+        "name": event_name,
+        "params": ga_params(session, event_name, properties),
+        "time": datetime.now(timezone.utc).isoformat(),
+    })
+    session["next_seq"] += 1
+    return True
+
+def take_pending_events(session):
+    """Events recorded since the last flush (oldest first), marked as flushed."""
+    # Walk back from the newest event only as far as the last flush
+    pending = []
+    for event in reversed(session["events"]):
+        if event["seq"] < session["flushed_seq"]:
+            break
+        pending.append(event)
+    session["flushed_seq"] = session["next_seq"]
+    pending.reverse()
+    return pending
+
+def events_html(events):
+    """One hidden element carrying a batch of events for static/analytics.js."""
+    batch = json.dumps(
+        [{"id": event["id"], "name": event["name"], "params": event["params"]} for event in events],
+        ensure_ascii=False,
+    )
+    # Single-quoted attribute, so the JSON's double quotes need no escaping
+    return f"<span hidden data-ga-events='{html.escape(batch, quote=False).replace(chr(39), '&#39;')}'></span>"
@@ -0,0 +1,90 @@
+"""Admin dashboard for the local analytics store.
+
+Run next to the app, on a port that is not public:
+
+    ANALYTICS_DB=analytics.db streamlit run analytics_dashboard.py --server.port 8502
+
+Every figure comes from the rollup counters in analytics_store.py, so the
+page costs the same however many events have been stored.
+"""
+import html
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import streamlit as st
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from analytics_store import ANALYTICS_DB, AnalyticsStore
+from ui_theme import apply_theme
+
+st.set_page_config(page_title="لوحة تحليلات التطبيق", layout="wide")
+apply_theme()
+
+PERIODS = {"آخر 7 أيام": 7, "آخر 30 يوماً": 30, "آخر 90 يوماً": 90, "كل الفترات": None}
+
+@st.cache_resource
+def get_analytics_store():
+    return AnalyticsStore(ANALYTICS_DB)
+
+def metric_card(label, value):
+    return (
+        f'<div class="analytics-card"><div class="analytics-metric">{html.escape(str(value))}</div>'
+        f'<div class="analytics-label">{html.escape(label)}</div></div>'
+    )
+
+def percent(rate):
+    return "—" if rate is None else f"{rate * 100:.1f}%"
+
+def breakdown_table(counts, label):
+    rows = sorted(counts.items(), key=lambda item: item[1], reverse=True)
+    return pd.DataFrame(rows, columns=[label, "العدد"])
+
+def main():
+    st.markdown('<h1 class="main-header">لوحة تحليلات التطبيق</h1>', unsafe_allow_html=True)
+    if not ANALYTICS_DB:
+        st.error("لم يتم ضبط ANALYTICS_DB: شغّل التطبيق ولوحة التحليلات مع نفس ملف قاعدة البيانات.")
+        return
+    store = get_analytics_store()
+
+    period = st.radio("الفترة:", list(PERIODS), horizontal=True)
+    days = PERIODS[period]
+    since_day = (datetime.now(timezone.utc) - timedelta(days=days - 1)).date().isoformat() if days else None
+    summary = store.summary(since_day)
+
+    cards = [
+        ("تحليلات بدأت", summary["analyses_started"]),
+        ("تحليلات مكتملة", summary["analyses_completed"]),
+        ("نسبة الفشل", percent(summary["failure_rate"])),
+        ("عدم تطابق المهارة المكتشفة", percent(summary["detection_mismatch_rate"])),
+        ("نتائج مشتركة", summary["shared_results"]),
+        ("فيديوهات مرفوعة", summary["uploads"]),
+    ]
+    # One element for the whole row of cards
+    st.markdown(
+        '<div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(160px, 1fr)); gap: 10px;">'
+        + "".join(metric_card(label, value) for label, value in cards) + "</div>",
+        unsafe_allow_html=True,
+    )
+
+    daily = store.daily_totals(since_day)
+    if daily:
+        st.markdown("### التحليلات يومياً")
+        chart = pd.DataFrame.from_dict(daily, orient="index").reindex(
+            columns=["analysis_started", "analysis_completed", "analysis_failed", "upload_failed"]
+        ).fillna(0)
+        st.bar_chart(chart)
+
+    columns = st.columns(3)
+    with columns[0]:
+        st.markdown("#### تحليلات مكتملة حسب النموذج")
+        st.dataframe(breakdown_table(summary["completed_per_model"], "النموذج"), hide_index=True)
+    with columns[1]:
+        st.markdown("#### تحليلات مكتملة حسب المهارة")
+        st.dataframe(breakdown_table(summary["completed_per_skill"], "المهارة"), hide_index=True)
+    with columns[2]:
+        st.markdown("#### مستوى التحليل")
+        st.dataframe(breakdown_table(summary["completed_per_tier"], "المستوى"), hide_index=True)
+
+main()
@@ -0,0 +1,168 @@
+"""Local append-only analytics event store with incrementally maintained rollups.
+
+Every event the app logs (analysis_completed, skill_detection_completed,
+upload_failed, ...) is appended to an `events` table. In the same
+transaction, counters in a `rollups` table are bumped per day, per event
+and per value of the event's rollup dimensions (model, skill, detection
+match, ...). Dashboards read only the rollups, so a query costs the same
+with a hundred events or ten million.
+
+    ANALYTICS_DB=analytics.db streamlit run new_app.py
+    ANALYTICS_DB=analytics.db streamlit run analytics_dashboard.py --server.port 8502
+"""
+import os
+import json
+import sqlite3
+import threading
+import contextlib
+
+ANALYTICS_DB = os.getenv("ANALYTICS_DB")
+
+# Event -> properties whose values are counted in the rollups
+ROLLUP_DIMENSIONS = {
+    "analysis_started": ("model_used", "skill_type"),
+    "analysis_completed": ("model_used", "skill_analyzed", "degradation_tier", "shared_result"),
+    "analysis_failed": ("model_used", "skill_type"),
+    "analysis_cancelled": ("model_used", "skill_type"),
+    "upload_failed": ("skill_type",),
+    "processing_error": ("skill_type",),
+    "skill_detection_completed": ("match", "selected_skill"),
+    "video_uploaded": ("selected_skill",),
+    "model_changed": ("to_model",),
+}
+FAILURE_EVENTS = ("analysis_failed", "upload_failed", "processing_error")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    event_id TEXT PRIMARY KEY,
+    time TEXT NOT NULL,
+    session_id TEXT,
+    name TEXT NOT NULL,
+    properties TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollups (
+    day TEXT NOT NULL,
+    name TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, name, dimension, value)
+);
+"""
+
+def rollup_keys(event):
+    """(day, name, dimension, value) counters an event adds one to; '' / '' is the event total."""
+    day = event["time"][:10]
+    keys = [(day, event["name"], "", "")]
+    for dimension in ROLLUP_DIMENSIONS.get(event["name"], ()):
+        if dimension in event["params"]:
+            keys.append((day, event["name"], dimension, str(event["params"][dimension])))
+    return keys
+
+class AnalyticsStore:
+    """SQLite event log plus rollup counters, shared by the app's processes on one host."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def append(self, events):
+        """Store a batch of analytics.py events; an event ID seen before is ignored. Returns the number stored."""
+        stored = 0
+        with self._transaction() as conn:
+            for event in events:
+                inserted = conn.execute(
+                    "INSERT OR IGNORE INTO events (event_id, time, session_id, name, properties) VALUES (?, ?, ?, ?, ?)",
+                    (event["id"], event["time"], event["params"].get("session_id"), event["name"],
+                     json.dumps(event["params"], ensure_ascii=False)),
+                ).rowcount
+                if inserted:
+                    stored += 1
+                    conn.executemany(
+                        "INSERT INTO rollups (day, name, dimension, value, count) VALUES (?, ?, ?, ?, 1) "
+                        "ON CONFLICT (day, name, dimension, value) DO UPDATE SET count = count + 1",
+                        rollup_keys(event),
+                    )
+        return stored
+
+    def rebuild_rollups(self):
+        """Recompute every rollup from the event log (after changing ROLLUP_DIMENSIONS); a full scan."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM rollups")
+            for event_id, event_time, name, properties in conn.execute("SELECT event_id, time, name, properties FROM events").fetchall():
+                event = {"id": event_id, "time": event_time, "name": name, "params": json.loads(properties)}
+                conn.executemany(
+                    "INSERT INTO rollups (day, name, dimension, value, count) VALUES (?, ?, ?, ?, 1) "
+                    "ON CONFLICT (day, name, dimension, value) DO UPDATE SET count = count + 1",
+                    rollup_keys(event),
+                )
+
+    def counts(self, since_day=None):
+        """{(name, dimension, value): count} summed over days >= `since_day` (YYYY-MM-DD), from the rollups."""
+        rows = self._connection().execute(
+            "SELECT name, dimension, value, SUM(count) FROM rollups WHERE day >= ? GROUP BY name, dimension, value",
+            (since_day or "",),
+        )
+        return {(name, dimension, value): count for name, dimension, value, count in rows}
+
+    def daily_totals(self, since_day=None):
+        """{day: {event name: count}}, from the rollups."""
+        daily = {}
+        rows = self._connection().execute(
+            "SELECT day, name, count FROM rollups WHERE dimension = '' AND day >= ? ORDER BY day", (since_day or "",)
+        )
+        for day, name, count in rows:
+            daily.setdefault(day, {})[name] = count
+        return daily
+
+    def summary(self, since_day=None):
+        """Dashboard figures since `since_day`: totals, rates, and breakdowns per model and skill."""
+        counts = self.counts(since_day)
+        total = lambda name: counts.get((name, "", ""), 0)
+
+        def breakdown(name, dimension):
+            return {value: count for (n, d, value), count in counts.items() if n == name and d == dimension}
+
+        started = total("analysis_started")
+        detections = total("skill_detection_completed")
+        mismatches = counts.get(("skill_detection_completed", "match", "False"), 0)
+        failures = sum(total(name) for name in FAILURE_EVENTS)
+        return {
+            "analyses_started": started,
+            "analyses_completed": total("analysis_completed"),
+            "failures": failures,
+            "failure_rate": failures / started if started else None,
+            "detections": detections,
+            "detection_mismatch_rate": mismatches / detections if detections else None,
+            "shared_results": counts.get(("analysis_completed", "shared_result", "True"), 0),
+            "completed_per_model": breakdown("analysis_completed", "model_used"),
+            "failed_per_model": breakdown("analysis_failed", "model_used"),
+            "completed_per_skill": breakdown("analysis_completed", "skill_analyzed"),
+            "completed_per_tier": breakdown("analysis_completed", "degradation_tier"),
+            "uploads": total("video_uploaded"),
+            "page_views": total("page_view"),
+        }
+
+    def event_count(self):
+        return self._connection().execute("SELECT COUNT(*) FROM events").fetchone()[0]
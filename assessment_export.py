@@ -0,0 +1,149 @@
+"""Columnar export of graded criteria for notebooks (Parquet or Arrow IPC).
+
+One row per graded criterion: the assessment's key, player, date, skill,
+model, clip and degradation tier, then section, criterion, grade and score.
+The source is the assessment history store (assessment_history.py) or
+grade_clips.py / batch_grading.py JSONL output. Rows are read and written
+`--row-group-size` at a time, so memory stays flat however large the
+export is:
+
+    python assessment_export.py grades.parquet [--db history.db] [--player ...] [--since YYYY-MM-DD]
+    python assessment_export.py grades.arrow --jsonl results.jsonl [--jsonl more.jsonl]
+
+The format follows the extension (.parquet, or .arrow/.feather/.ipc for an
+Arrow IPC file). Grades are dictionary-encoded with the same dictionary in
+every row group, so they load as a categorical:
+
+    pd.read_parquet("grades.parquet")["grade"].cat.categories
+
+Needs pyarrow (installed with Streamlit).
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+from assessment_history import GRADE_SCORES, AssessmentHistory, grade_rows, record_assessment
+
+ROW_GROUP_SIZE = 65536
+
+# Dictionary of the grade column; any other grade text is exported as null
+GRADE_CATEGORIES = list(GRADE_SCORES) + ["غير واضح"]
+GRADE_INDEX = {grade: index for index, grade in enumerate(GRADE_CATEGORIES)}
+
+ASSESSMENT_COLUMNS = ["assessment_key", "player", "assessed_at", "skill", "model", "content_hash", "clip_id",
+                      "degradation_tier", "source"]
+GRADE_COLUMNS = ["section", "criterion", "grade", "score"]
+COLUMNS = ASSESSMENT_COLUMNS + GRADE_COLUMNS
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Columnar export needs pyarrow: pip install pyarrow")
+    return pyarrow
+
+def export_schema(pa):
+    grade_type = pa.dictionary(pa.int8(), pa.string())
+    types = {"assessed_at": pa.timestamp("us", tz="UTC"), "grade": grade_type, "score": pa.int8()}
+    return pa.schema([(column, types.get(column, pa.string())) for column in COLUMNS])
+
+def parse_timestamp(value):
+    moment = datetime.fromisoformat(value)
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+def history_rows(history, player=None, since=None):
+    """Grade rows (tuples in COLUMNS order) from the history store, read with one streaming query."""
+    return history.iter_grades(ASSESSMENT_COLUMNS, player, since, batch_size=ROW_GROUP_SIZE)
+
+def jsonl_rows(paths, player=None, since=None):
+    """Grade rows from grade_clips.py / batch_grading.py output, one line at a time."""
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                assessment = record_assessment(json.loads(line))
+                if assessment is None or (player is not None and assessment["player"] != player):
+                    continue
+                if since and assessment["assessed_at"] < since:
+                    continue
+                head = tuple(assessment[column] for column in ASSESSMENT_COLUMNS)
+                for section, criterion, grade in grade_rows(assessment["grades"]):
+                    yield head + (section, criterion, grade, GRADE_SCORES.get(grade))
+
+def record_batch(pa, schema, rows):
+    """Arrow record batch of up to ROW_GROUP_SIZE rows."""
+    columns = list(zip(*rows))
+    arrays = []
+    for field, values in zip(schema, columns):
+        if field.name == "assessed_at":
+            arrays.append(pa.array([parse_timestamp(value) for value in values], type=field.type))
+        elif field.name == "grade":
+            indices = pa.array([GRADE_INDEX.get(grade) for grade in values], type=pa.int8())
+            arrays.append(pa.DictionaryArray.from_arrays(indices, GRADE_CATEGORIES))
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def export_rows(rows, out_path, row_group_size=ROW_GROUP_SIZE):
+    """Write grade rows to `out_path`, one row group (or IPC batch) at a time; returns the row count."""
+    pa = _pyarrow()
+    schema = export_schema(pa)
+    if out_path.endswith(".parquet"):
+        writer = pa.parquet.ParquetWriter(out_path, schema, compression="zstd")
+        write = lambda batch: writer.write_batch(batch, row_group_size=row_group_size)
+    elif out_path.endswith((".arrow", ".feather", ".ipc")):
+        writer = pa.ipc.new_file(out_path, schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+        write = writer.write_batch
+    else:
+        raise ValueError(f"Unknown export format for {out_path}: use .parquet, .arrow, .feather or .ipc")
+    written = 0
+    chunk = []
+    try:
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= row_group_size:
+                write(record_batch(pa, schema, chunk))
+                written += len(chunk)
+                chunk = []
+        if chunk:
+            write(record_batch(pa, schema, chunk))
+            written += len(chunk)
+    finally:
+        writer.close()
+    return written
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Export graded criteria to Parquet or Arrow IPC.")
+    parser.add_argument("out", help="output file (.parquet, .arrow, .feather or .ipc)")
+    parser.add_argument("--db", default=os.getenv("ASSESSMENT_HISTORY_DB"), help="history database (default: $ASSESSMENT_HISTORY_DB)")
+    parser.add_argument("--jsonl", action="append", default=[], help="export grade_clips.py / batch_grading.py output instead")
+    parser.add_argument("--player", default=None)
+    parser.add_argument("--since", default=None, help="YYYY-MM-DD")
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_SIZE)
+    args = parser.parse_args(argv)
+
+    if args.jsonl:
+        rows = jsonl_rows(args.jsonl, args.player, args.since)
+    elif args.db:
+        rows = history_rows(AssessmentHistory(args.db), args.player, args.since)
+    else:
+        print("Nothing to export: pass --jsonl, --db or set ASSESSMENT_HISTORY_DB", file=sys.stderr)
+        return 2
+    try:
+        written = export_rows(rows, args.out, args.row_group_size)
+    except (RuntimeError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    print(f"{written} graded criteria written to {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,480 @@
+"""Player assessment history: per-criterion grades kept across sessions.
+
+Every finished assessment (from the app, or imported from grade_clips.py /
+batch_grading.py JSONL output) is stored with its player, date, skill,
+model and clip hash, and its grades are stored one row per criterion, so
+coaches can follow a criterion such as "انحناء الجذع" week by week.
+
+Queries are index-backed and paginated with keyset cursors (the last row's
+date and ID, not an OFFSET), so a page costs the same on page 1 and page
+5,000 of a history of hundreds of thousands of assessments:
+
+    python assessment_history.py import results.jsonl [--player "اسم اللاعب"]
+    python assessment_history.py players
+    python assessment_history.py history --player "اسم اللاعب" [--limit 20] [--cursor ...]
+    python assessment_history.py trend --player "اسم اللاعب" --criterion "انحناء الجذع"
+    python assessment_history.py thumbnails results.jsonl [--out thumbnails/]
+
+The database is ASSESSMENT_HISTORY_DB (or --db). `thumbnails` writes one
+{content_hash}.jpg per clip into ASSESSMENT_THUMBNAIL_DIR (or --out), for
+the squad review page (needs opencv-python-headless).
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+ASSESSMENT_HISTORY_DB = os.getenv("ASSESSMENT_HISTORY_DB")
+ASSESSMENT_THUMBNAIL_DIR = os.getenv("ASSESSMENT_THUMBNAIL_DIR")
+
+# Grades as numbers for trends and sorting
+GRADE_SCORES = {"مثالي": 2, "جيد": 1, "غير مقبول": 0}
+
+IMPORT_BATCH_SIZE = 1000
+DEFAULT_PAGE_SIZE = 50
+THUMBNAIL_WIDTH = 320
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assessments (
+    assessment_id INTEGER PRIMARY KEY,
+    assessment_key TEXT NOT NULL UNIQUE,
+    player TEXT NOT NULL,
+    assessed_at TEXT NOT NULL,
+    skill TEXT NOT NULL,
+    model TEXT,
+    content_hash TEXT,
+    clip_id TEXT,
+    degradation_tier TEXT,
+    source TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS assessments_by_player ON assessments (player, assessed_at, assessment_id);
+CREATE INDEX IF NOT EXISTS assessments_by_date ON assessments (assessed_at, assessment_id);
+CREATE INDEX IF NOT EXISTS assessments_by_clip ON assessments (content_hash);
+CREATE TABLE IF NOT EXISTS grades (
+    assessment_id INTEGER NOT NULL REFERENCES assessments (assessment_id),
+    section TEXT NOT NULL,
+    criterion TEXT NOT NULL,
+    grade TEXT NOT NULL,
+    score INTEGER,
+    player TEXT NOT NULL,
+    assessed_at TEXT NOT NULL,
+    PRIMARY KEY (assessment_id, section, criterion)
+);
+-- Covers criterion_series, so a trend never reads the table itself
+CREATE INDEX IF NOT EXISTS grades_by_player_criterion ON grades (player, criterion, assessed_at, section, grade, score);
+-- Squad-wide pages sorted or filtered by one criterion's grade
+CREATE INDEX IF NOT EXISTS grades_by_criterion_score ON grades (criterion, score, assessed_at, assessment_id);
+CREATE TABLE IF NOT EXISTS criteria (
+    criterion TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS players (
+    player TEXT PRIMARY KEY,
+    assessments INTEGER NOT NULL,
+    first_assessed_at TEXT NOT NULL,
+    last_assessed_at TEXT NOT NULL
+);
+"""
+
+def grade_rows(grades):
+    """(section, criterion, grade) rows; section is "التمرير"/"الاستلام" for كلاهما results, else ""."""
+    if isinstance(grades, str):
+        return [("", "", grades)]
+    if not isinstance(grades, dict):
+        return []
+    rows = []
+    for key, value in grades.items():
+        if isinstance(value, dict):
+            rows.extend((key, criterion, str(grade)) for criterion, grade in value.items())
+        else:
+            rows.append(("", key, str(value)))
+    return rows
+
+def record_assessment(record, default_player=None):
+    """Assessment dict of a grade_clips.py / batch_grading.py record, or None if it has no grades or player.
+
+    The assessment key is derived from the record, so importing it twice stores it once.
+    """
+    player = record.get("player") or default_player
+    if record.get("status") != "ok" or not record.get("grades") or not player:
+        return None
+    key_source = json.dumps(
+        [record.get("clip_id"), record.get("content_hash"), record.get("model"), record.get("finished_at")],
+        ensure_ascii=False,
+    )
+    return {
+        "assessment_key": "import:" + hashlib.sha256(key_source.encode()).hexdigest(),
+        "player": player,
+        "assessed_at": record.get("finished_at") or datetime.now(timezone.utc).isoformat(),
+        "skill": record.get("skill_analyzed") or record.get("selected_skill"),
+        "model": record.get("model"),
+        "content_hash": record.get("content_hash"),
+        "clip_id": record.get("clip_id"),
+        "degradation_tier": record.get("degradation_tier"),
+        "source": "batch" if record.get("batch_job") else "cli",
+        "grades": record["grades"],
+    }
+
+# Orders of AssessmentHistory.page: sort key columns and whether they run descending.
+# "best" and "worst" sort by one criterion's grade, so they need `criterion`.
+SORT_ORDERS = {
+    "newest": (("assessed_at", "assessment_id"), True),
+    "oldest": (("assessed_at", "assessment_id"), False),
+    "best": (("score", "assessed_at", "assessment_id"), True),
+    "worst": (("score", "assessed_at", "assessment_id"), False),
+}
+
+def encode_cursor(values):
+    """Opaque page cursor from the sort key values of a page's last row."""
+    return json.dumps(values, ensure_ascii=False)
+
+def decode_cursor(cursor):
+    return json.loads(cursor)
+
+class AssessmentHistory:
+    """SQLite store of assessments and their per-criterion grades."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _insert(self, conn, assessment):
+        """Insert one assessment dict and its grades; False if its key was already stored."""
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO assessments "
+            "(assessment_key, player, assessed_at, skill, model, content_hash, clip_id, degradation_tier, source) "
+            "VALUES (:assessment_key, :player, :assessed_at, :skill, :model, :content_hash, :clip_id, :degradation_tier, :source)",
+            assessment,
+        )
+        if not cursor.rowcount:
+            return False
+        assessment_id = cursor.lastrowid
+        conn.executemany(
+            "INSERT OR REPLACE INTO grades (assessment_id, section, criterion, grade, score, player, assessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (assessment_id, section, criterion, grade, GRADE_SCORES.get(grade), assessment["player"], assessment["assessed_at"])
+                for section, criterion, grade in grade_rows(assessment["grades"])
+            ],
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO criteria (criterion) VALUES (?)",
+            [(criterion,) for _, criterion, _ in grade_rows(assessment["grades"]) if criterion],
+        )
+        conn.execute(
+            "INSERT INTO players (player, assessments, first_assessed_at, last_assessed_at) VALUES (?, 1, ?, ?) "
+            "ON CONFLICT (player) DO UPDATE SET assessments = assessments + 1, "
+            "first_assessed_at = MIN(first_assessed_at, excluded.first_assessed_at), "
+            "last_assessed_at = MAX(last_assessed_at, excluded.last_assessed_at)",
+            (assessment["player"], assessment["assessed_at"], assessment["assessed_at"]),
+        )
+        return True
+
+    def add(self, player, skill, grades, model=None, content_hash=None, clip_id=None,
+            degradation_tier=None, assessed_at=None, source="app", assessment_key=None):
+        """Store one assessment; returns False if `assessment_key` was already stored."""
+        assessed_at = assessed_at or datetime.now(timezone.utc).isoformat()
+        assessment = {
+            "assessment_key": assessment_key or f"{source}:{player}:{content_hash}:{skill}:{model}:{assessed_at}",
+            "player": player,
+            "assessed_at": assessed_at,
+            "skill": skill,
+            "model": model,
+            "content_hash": content_hash,
+            "clip_id": clip_id,
+            "degradation_tier": degradation_tier,
+            "source": source,
+            "grades": grades,
+        }
+        with self._transaction() as conn:
+            return self._insert(conn, assessment)
+
+    def import_records(self, records, default_player=None):
+        """Store successful grade_clips.py / batch_grading.py records, IMPORT_BATCH_SIZE per transaction.
+
+        Records without a player (and no `default_player`) or without grades
+        are skipped; importing the same file twice stores nothing new.
+        Returns (imported, skipped).
+        """
+        imported = skipped = 0
+        batch = []
+
+        def flush():
+            nonlocal imported, skipped
+            with self._transaction() as conn:
+                for assessment in batch:
+                    if self._insert(conn, assessment):
+                        imported += 1
+                    else:
+                        skipped += 1
+            batch.clear()
+
+        for record in records:
+            assessment = record_assessment(record, default_player)
+            if assessment is None:
+                skipped += 1
+                continue
+            batch.append(assessment)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                flush()
+        if batch:
+            flush()
+        return imported, skipped
+
+    def import_jsonl(self, path, default_player=None):
+        with open(path, encoding="utf-8") as f:
+            return self.import_records((json.loads(line) for line in f if line.strip()), default_player)
+
+    def page(self, player=None, skill=None, cursor=None, limit=DEFAULT_PAGE_SIZE, since=None, until=None,
+             criterion=None, section=None, grade=None, sort="newest"):
+        """One page of assessments (with their grades) and the cursor of the next page, or None.
+
+        Filters: player, skill, `since` <= date < `until` (ISO dates) and, with
+        `criterion` (optionally in one `section`), that criterion's `grade`.
+        `sort` is a SORT_ORDERS key; best and worst skip ungraded (غير واضح)
+        rows. Each page is an index range scan from the cursor, never an
+        OFFSET. A كلاهما assessment that grades the criterion in both
+        sections is listed once, by its best section when sorting best
+        first and by its worst one otherwise.
+        """
+        columns, descending = SORT_ORDERS[sort]
+        if "score" in columns and criterion is None:
+            raise ValueError(f"Sorting by '{sort}' needs a criterion")
+        # With a criterion, the grades row drives the query (its index holds score and date)
+        source = "g" if criterion is not None else "a"
+        conditions, params = [], []
+        for column, value in (("player", player), ("skill", skill)):
+            if value is not None:
+                conditions.append(f"a.{column} = ?")
+                params.append(value)
+        if since:
+            conditions.append(f"{source}.assessed_at >= ?")
+            params.append(since)
+        if until:
+            conditions.append(f"{source}.assessed_at < ?")
+            params.append(until)
+        join = ""
+        if criterion is not None:
+            join = "JOIN grades g ON g.assessment_id = a.assessment_id AND g.criterion = ?"
+            params.insert(0, criterion)
+            if section is not None:
+                join += " AND g.section = ?"
+                params.insert(1, section)
+            if player is not None:
+                # Lets the planner use the grades (player, criterion, ...) index
+                conditions.append("g.player = ?")
+                params.append(player)
+            if grade in GRADE_SCORES:
+                # The score, unlike the grade text, is in the (criterion, score, ...) index
+                conditions.append("g.score = ?")
+                params.append(GRADE_SCORES[grade])
+            elif grade is not None:
+                conditions.append("g.grade = ?")
+                params.append(grade)
+            if "score" in columns:
+                # Ungraded (غير واضح) rows have no place in a best or worst order, and a NULL would break the cursor
+                conditions.append("g.score IS NOT NULL")
+            if section is None:
+                # A كلاهما assessment grades shared criteria once per section: keep one of its
+                # matching rows, the best for descending orders and the worst for ascending ones.
+                # The unary + leaves only the assessment_id lookup indexable: the primary key, two rows at most.
+                duplicate = ["g2.assessment_id = g.assessment_id", "+g2.criterion = g.criterion"]
+                duplicate_params = []
+                if grade in GRADE_SCORES:
+                    duplicate.append("+g2.score = ?")
+                    duplicate_params.append(GRADE_SCORES[grade])
+                elif grade is not None:
+                    duplicate.append("+g2.grade = ?")
+                    duplicate_params.append(grade)
+                if "score" in columns:
+                    duplicate.append("+g2.score IS NOT NULL")
+                duplicate.append(f"(COALESCE(g2.score, -1), g2.section) {'>' if descending else '<'} "
+                                 "(COALESCE(g.score, -1), g.section)")
+                conditions.append(f"NOT EXISTS (SELECT 1 FROM grades g2 WHERE {' AND '.join(duplicate)})")
+                params.extend(duplicate_params)
+        key = [f"{'g' if column == 'score' else source}.{column}" for column in columns]
+        if cursor:
+            conditions.append(f"({', '.join(key)}) {'<' if descending else '>'} ({', '.join('?' * len(key))})")
+            params.extend(decode_cursor(cursor))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        direction = "DESC" if descending else "ASC"
+        score = ", g.score AS score" if criterion is not None else ""
+        rows = [dict(row) for row in self._connection().execute(
+            f"SELECT a.*{score} FROM assessments a {join} {where} "
+            f"ORDER BY {', '.join(f'{column} {direction}' for column in key)} LIMIT ?",
+            params + [limit + 1],
+        )]
+        next_cursor = encode_cursor([rows[limit - 1][column] for column in columns]) if len(rows) > limit else None
+        rows = rows[:limit]
+        self._attach_grades(rows)
+        return rows, next_cursor
+
+    def _attach_grades(self, rows):
+        by_id = {row["assessment_id"]: row for row in rows}
+        for row in rows:
+            row["grades"] = []
+        if not by_id:
+            return
+        placeholders = ",".join("?" * len(by_id))
+        for grade in self._connection().execute(
+            f"SELECT assessment_id, section, criterion, grade, score FROM grades WHERE assessment_id IN ({placeholders})",
+            list(by_id),
+        ):
+            by_id[grade["assessment_id"]]["grades"].append(dict(grade))
+
+    def iter_grades(self, columns, player=None, since=None, batch_size=IMPORT_BATCH_SIZE):
+        """Yield (assessment `columns`..., section, criterion, grade, score) per grade, in assessment order.
+
+        One streaming query, read `batch_size` rows at a time, so a full export never holds the history in memory.
+        """
+        conditions, params = [], []
+        if player is not None:
+            conditions.append("a.player = ?")
+            params.append(player)
+        if since:
+            conditions.append("a.assessed_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        cursor = self._connection().execute(
+            f"SELECT {', '.join('a.' + column for column in columns)}, g.section, g.criterion, g.grade, g.score "
+            f"FROM assessments a JOIN grades g ON g.assessment_id = a.assessment_id {where} "
+            "ORDER BY a.assessment_id",
+            params,
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from (tuple(row) for row in rows)
+
+    def criterion_series(self, player, criterion, since=None, section=None):
+        """Oldest-first [{"assessed_at", "section", "grade", "score"}] of one criterion for one player."""
+        query = "SELECT assessed_at, section, grade, score FROM grades WHERE player = ? AND criterion = ? AND assessed_at >= ?"
+        params = [player, criterion, since or ""]
+        if section is not None:
+            query += " AND section = ?"
+            params.append(section)
+        return [dict(row) for row in self._connection().execute(query + " ORDER BY assessed_at", params)]
+
+    def criteria(self):
+        """Every criterion name seen so far, from the criteria table."""
+        return [row["criterion"] for row in self._connection().execute("SELECT criterion FROM criteria ORDER BY criterion")]
+
+    def players(self):
+        """Players with their assessment counts and date range, from the players table."""
+        return [dict(row) for row in self._connection().execute("SELECT * FROM players ORDER BY player")]
+
+def thumbnail_path(thumbnail_dir, content_hash):
+    return os.path.join(thumbnail_dir, f"{content_hash}.jpg")
+
+def write_thumbnail(video_path, out_path, width=THUMBNAIL_WIDTH):
+    """Save a frame from the middle of the clip as a small JPEG; False if no frame could be read."""
+    try:
+        import cv2
+    except ImportError:
+        raise RuntimeError("Thumbnails need OpenCV: pip install opencv-python-headless")
+    capture = cv2.VideoCapture(video_path)
+    try:
+        frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        if frames > 0:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, frames // 2)
+        ok, frame = capture.read()
+    finally:
+        capture.release()
+    if not ok:
+        return False
+    height = round(frame.shape[0] * width / frame.shape[1])
+    frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    return cv2.imwrite(out_path, frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Player assessment history.")
+    parser.add_argument("--db", default=os.getenv("ASSESSMENT_HISTORY_DB"), help="database (default: $ASSESSMENT_HISTORY_DB)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="import grade_clips.py / batch_grading.py JSONL output")
+    import_parser.add_argument("paths", nargs="+")
+    import_parser.add_argument("--player", default=None, help="player for records without one")
+    commands.add_parser("players", help="list players")
+    history_parser = commands.add_parser("history", help="a player's assessments, newest first")
+    history_parser.add_argument("--player", required=True)
+    history_parser.add_argument("--skill", default=None)
+    history_parser.add_argument("--limit", type=int, default=20)
+    history_parser.add_argument("--cursor", default=None, help="next_cursor printed by the previous page")
+    trend_parser = commands.add_parser("trend", help="one criterion of one player over time")
+    trend_parser.add_argument("--player", required=True)
+    trend_parser.add_argument("--criterion", required=True)
+    trend_parser.add_argument("--since", default=None, help="YYYY-MM-DD")
+    thumbnails_parser = commands.add_parser("thumbnails", help="write clip thumbnails for the squad review page")
+    thumbnails_parser.add_argument("paths", nargs="+", help="grade_clips.py JSONL output (records with a path)")
+    thumbnails_parser.add_argument("--out", default=os.getenv("ASSESSMENT_THUMBNAIL_DIR"),
+                                   help="thumbnail folder (default: $ASSESSMENT_THUMBNAIL_DIR)")
+    args = parser.parse_args(argv)
+
+    if args.command == "thumbnails":
+        if not args.out:
+            print("No thumbnail folder: pass --out or set ASSESSMENT_THUMBNAIL_DIR", file=sys.stderr)
+            return 2
+        os.makedirs(args.out, exist_ok=True)
+        written = 0
+        for path in args.paths:
+            with open(path, encoding="utf-8") as f:
+                for record in (json.loads(line) for line in f if line.strip()):
+                    if not record.get("path") or not record.get("content_hash"):
+                        continue
+                    out_path = thumbnail_path(args.out, record["content_hash"])
+                    if not os.path.exists(out_path) and os.path.exists(record["path"]):
+                        written += bool(write_thumbnail(record["path"], out_path))
+        print(f"{written} thumbnails written to {args.out}")
+        return 0
+    if not args.db:
+        print("No history database: pass --db or set ASSESSMENT_HISTORY_DB", file=sys.stderr)
+        return 2
+    history = AssessmentHistory(args.db)
+    if args.command == "import":
+        for path in args.paths:
+            imported, skipped = history.import_jsonl(path, args.player)
+            print(f"{path}: {imported} imported, {skipped} skipped")
+    elif args.command == "players":
+        for player in history.players():
+            print(json.dumps(player, ensure_ascii=False))
+    elif args.command == "history":
+        rows, next_cursor = history.page(args.player, args.skill, args.cursor, args.limit)
+        for row in rows:
+            print(json.dumps(row, ensure_ascii=False))
+        print(json.dumps({"next_cursor": next_cursor}))
+    elif args.command == "trend":
+        for point in history.criterion_series(args.player, args.criterion, args.since):
+            print(json.dumps(point, ensure_ascii=False))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+"""Bulk re-grading through the Gemini Batch API.
+
+For archive re-grading that does not need interactive latency: clips are
+uploaded to the File API, their `create_assessment_prompt` requests are
+packed into asynchronous batch jobs (`models/*:batchGenerateContent`), and
+the results are collected later, parsed with the same grade mapping as
+`analyze_video_skill` (`parse_assessment_text`) and reconciled per clip.
+There is no skill-detection step: each clip is graded for the skill given
+in the folder/manifest, as with grade_clips.py.
+
+Job state lives in a JSON file, so submission and collection can run in
+different processes (e.g. submit in the evening, collect in the morning):
+
+    python batch_grading.py submit clips/ --state archive.json --skill تمرير
+    python batch_grading.py status --state archive.json
+    python batch_grading.py collect --state archive.json --out results.jsonl --wait
+
+Everything goes through the REST API at --base-url, so the whole flow can run
+against the local stand-in in devtools/fake_gemini_batch.py.
+"""
+import argparse
+import io
+import json
+import logging
+import mimetypes
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+import requests
+from dotenv import load_dotenv
+
+# Before the project imports: they read their settings from the environment
+load_dotenv()
+
+from analysis_core import (
+    DEFAULT_GEMINI_MODEL,
+    resolve_api_key,
+    create_assessment_prompt,
+    parse_assessment_text,
+    file_content_hash,
+)
+from grade_clips import load_clips, RecordWriter
+
+GEMINI_API_BASE_URL = os.getenv("GEMINI_API_BASE_URL", "https://generativelanguage.googleapis.com")
+
+# Batch job states that will not change any more
+TERMINAL_BATCH_STATES = {"BATCH_STATE_SUCCEEDED", "BATCH_STATE_FAILED", "BATCH_STATE_CANCELLED", "BATCH_STATE_EXPIRED"}
+FILE_POLL_INTERVAL = 5
+BATCH_POLL_INTERVAL = 60
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+class MultipartUpload:
+    """multipart/related body of a file's JSON metadata and its bytes, read from disk as it is sent.
+
+    Has a length, so requests sends a Content-Length and streams the file
+    in UPLOAD_CHUNK_SIZE reads instead of holding the clip in memory.
+    """
+
+    def __init__(self, file, display_name, mime_type):
+        boundary = uuid.uuid4().hex
+        metadata = json.dumps({"file": {"display_name": display_name}})
+        self.content_type = f"multipart/related; boundary={boundary}"
+        head = (
+            f"--{boundary}\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n{metadata}\r\n"
+            f"--{boundary}\r\nContent-Type: {mime_type}\r\n\r\n"
+        ).encode()
+        tail = f"\r\n--{boundary}--\r\n".encode()
+        self._length = len(head) + os.fstat(file.fileno()).st_size - file.tell() + len(tail)
+        self._parts = [io.BytesIO(head), file, io.BytesIO(tail)]
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        chunks = []
+        while self._parts and (size < 0 or size > 0):
+            chunk = self._parts[0].read(size)
+            if not chunk:
+                self._parts.pop(0)
+                continue
+            chunks.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+        return b"".join(chunks)
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+class BatchClient:
+    """Minimal REST client for the Gemini File and Batch APIs."""
+
+    def __init__(self, api_key, base_url=GEMINI_API_BASE_URL, timeout=120):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["x-goog-api-key"] = api_key
+
+    def _request(self, method, path, **kwargs):
+        response = self.session.request(method, f"{self.base_url}/{path}", timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        return response.json() if response.content else {}
+
+    def upload_file(self, path, display_name):
+        """Upload a clip (multipart, streamed from disk) and return the File resource."""
+        mime_type = mimetypes.guess_type(path)[0] or "video/mp4"
+        with open(path, "rb") as f:
+            body = MultipartUpload(f, display_name, mime_type)
+            return self._request(
+                "POST", "upload/v1beta/files",
+                data=body,
+                headers={"Content-Type": body.content_type, "X-Goog-Upload-Protocol": "multipart"},
+            )["file"]
+
+    def wait_for_file(self, name, timeout=600):
+        """Poll a File resource until it leaves PROCESSING; raises unless it ends ACTIVE."""
+        deadline = time.monotonic() + timeout
+        while True:
+            resource = self._request("GET", f"v1beta/{name}")
+            state = resource.get("state", "ACTIVE")
+            if state == "ACTIVE":
+                return resource
+            if state != "PROCESSING" or time.monotonic() > deadline:
+                raise RuntimeError(f"File {name} ended in state {state}")
+            time.sleep(FILE_POLL_INTERVAL)
+
+    def delete_file(self, name):
+        try:
+            self._request("DELETE", f"v1beta/{name}")
+        except requests.RequestException as e:
+            logging.warning(f"Could not delete {name}: {e}")
+
+    def create_batch(self, model_name, inline_requests, display_name):
+        """Submit inline GenerateContent requests as one batch job; returns the job resource."""
+        body = {"batch": {
+            "display_name": display_name,
+            "input_config": {"requests": {"requests": inline_requests}},
+        }}
+        return self._request("POST", f"v1beta/{model_name}:batchGenerateContent", json=body)
+
+    def get_batch(self, name):
+        return self._request("GET", f"v1beta/{name}")
+
+def batch_state(job):
+    """State of a batch job resource (reported in the operation metadata or at the top level)."""
+    return (job.get("metadata") or {}).get("state") or job.get("state") or "BATCH_STATE_PENDING"
+
+def batch_responses(job):
+    """Inlined per-request responses of a finished batch job."""
+    for container in (job.get("response"), (job.get("metadata") or {}).get("output"), job.get("output"), job.get("dest")):
+        if container and "inlinedResponses" in container:
+            inlined = container["inlinedResponses"]
+            return inlined.get("inlinedResponses", []) if isinstance(inlined, dict) else inlined
+    return []
+
+def build_assessment_request(key, skill, file_resource):
+    """One inline batch request: the assessment prompt plus the uploaded clip."""
+    return {
+        "request": {"contents": [{"role": "user", "parts": [
+            {"text": create_assessment_prompt(skill)},
+            {"file_data": {"file_uri": file_resource["uri"], "mime_type": file_resource.get("mimeType", "video/mp4")}},
+        ]}]},
+        "metadata": {"key": key},
+    }
+
+def response_text(response):
+    """Concatenated text of the first candidate, or None if the request was blocked."""
+    candidates = response.get("candidates") or []
+    if not candidates:
+        return None
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    text = "".join(part.get("text", "") for part in parts).strip()
+    return text or None
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {"model": None, "clips": {}, "jobs": []}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_state(path, state):
+    """Write the job state atomically so an interrupted run never leaves it half written."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def submit(client, state, state_path, clips, model_name, batch_size):
+    """Upload clips not yet submitted and pack their requests into batch jobs of `batch_size`.
+
+    Raises ValueError if the state file's jobs were submitted with a different model than `model_name`.
+    """
+    if state["model"] and model_name and model_name != state["model"]:
+        raise ValueError(f"{state_path} was submitted with {state['model']}, not {model_name}: "
+                         "use the same --model or a new --state file")
+    state["model"] = state["model"] or model_name or DEFAULT_GEMINI_MODEL
+    pending = [clip for clip in clips if clip["clip_id"] not in state["clips"]]
+    logging.info(f"{len(clips)} clips, {len(pending)} to submit with {state['model']}, {len(clips) - len(pending)} already submitted")
+
+    for start in range(0, len(pending), batch_size):
+        chunk = pending[start:start + batch_size]
+        inline_requests, uploaded, job = [], [], None
+        try:
+            for clip in chunk:
+                key = clip["clip_id"]
+                file_resource = client.upload_file(clip["path"], f"batch_{os.path.basename(clip['path'])}")
+                uploaded.append(file_resource["name"])
+                file_resource = client.wait_for_file(file_resource["name"])
+                state["clips"][key] = {
+                    **clip,
+                    "content_hash": file_content_hash(clip["path"]),
+                    "file_name": file_resource["name"],
+                    "job": None,
+                }
+                inline_requests.append(build_assessment_request(key, clip["skill"], file_resource))
+
+            job = client.create_batch(state["model"], inline_requests, f"football-regrade-{int(time.time())}")
+        finally:
+            if job is None:
+                # The chunk was not submitted: nothing will collect (and delete) the files uploaded for it
+                for clip in chunk:
+                    state["clips"].pop(clip["clip_id"], None)
+                for name in uploaded:
+                    client.delete_file(name)
+        state["jobs"].append({"name": job["name"], "state": batch_state(job), "keys": [c["clip_id"] for c in chunk], "collected": False})
+        for clip in chunk:
+            state["clips"][clip["clip_id"]]["job"] = job["name"]
+        save_state(state_path, state)
+        logging.info(f"Submitted {job['name']} with {len(chunk)} clips")
+
+def refresh(client, state, state_path):
+    """Update the recorded state of every uncollected job."""
+    for job in state["jobs"]:
+        if not job["collected"] and job["state"] not in TERMINAL_BATCH_STATES:
+            job["state"] = batch_state(client.get_batch(job["name"]))
+    save_state(state_path, state)
+
+def reconcile(job_resource, job, state):
+    """Match a finished job's responses to its clips and build one output record per clip."""
+    by_key = {}
+    for entry in batch_responses(job_resource):
+        key = (entry.get("metadata") or {}).get("key")
+        if key is not None:
+            by_key[key] = entry
+
+    records = []
+    for key in job["keys"]:
+        clip = state["clips"][key]
+        record = {
+            "clip_id": key,
+            "path": clip["path"],
+            "player": clip.get("player"),
+            "selected_skill": clip["skill"],
+            "content_hash": clip.get("content_hash"),
+            "model": state["model"],
+            "batch_job": job["name"],
+            "grades": None,
+            "usage": None,
+        }
+        entry = by_key.get(key)
+        if job["state"] != "BATCH_STATE_SUCCEEDED":
+            record.update({"status": "failed", "error": job["state"]})
+        elif entry is None:
+            record.update({"status": "failed", "error": "missing_response"})
+        elif "error" in entry:
+            record.update({"status": "failed", "error": json.dumps(entry["error"], ensure_ascii=False)})
+        else:
+            response = entry.get("response") or {}
+            text = response_text(response)
+            usage = response.get("usageMetadata") or {}
+            record["usage"] = {
+                "calls": 1,
+                "prompt_tokens": usage.get("promptTokenCount", 0),
+                "output_tokens": usage.get("candidatesTokenCount", 0),
+                "total_tokens": usage.get("totalTokenCount", 0),
+            }
+            if text is None:
+                record.update({"status": "failed", "error": "blocked_or_empty"})
+            else:
+                record.update({"status": "ok", "error": None, "grades": parse_assessment_text(text, clip["skill"])})
+        record["finished_at"] = datetime.now(timezone.utc).isoformat()
+        records.append(record)
+    return records
+
+def collect(client, state, state_path, out_path, wait, poll_interval=BATCH_POLL_INTERVAL):
+    """Write records for every finished, uncollected job; with `wait`, poll until all are done."""
+    writer = RecordWriter(out_path)
+    try:
+        while True:
+            refresh(client, state, state_path)
+            for job in state["jobs"]:
+                if job["collected"] or job["state"] not in TERMINAL_BATCH_STATES:
+                    continue
+                job_resource = client.get_batch(job["name"])
+                for record in reconcile(job_resource, job, state):
+                    writer.write(record)
+                for key in job["keys"]:
+                    client.delete_file(state["clips"][key]["file_name"])
+                job["collected"] = True
+                save_state(state_path, state)
+                logging.info(f"Collected {job['name']} ({job['state']}, {len(job['keys'])} clips)")
+
+            outstanding = [job for job in state["jobs"] if not job["collected"]]
+            if not outstanding or not wait:
+                return len(outstanding)
+            logging.info(f"{len(outstanding)} batch jobs still running, checking again in {poll_interval}s")
+            time.sleep(poll_interval)
+    finally:
+        writer.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grade clips in bulk through the Gemini Batch API.")
+    parser.add_argument("--base-url", default=GEMINI_API_BASE_URL, help="Gemini REST endpoint (point at a local stand-in for testing)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit_parser = commands.add_parser("submit", help="upload clips and submit batch jobs")
+    submit_parser.add_argument("source", help="folder of clips, or a .jsonl/.csv manifest")
+    submit_parser.add_argument("--state", required=True, help="job state file")
+    submit_parser.add_argument("--skill", default="تمرير", help="skill for clips without one")
+    submit_parser.add_argument("--model", default=None, help=f"Gemini model (default: the state file's, else {DEFAULT_GEMINI_MODEL})")
+    submit_parser.add_argument("--batch-size", type=int, default=100, help="clips per batch job")
+
+    status_parser = commands.add_parser("status", help="show the state of submitted jobs")
+    status_parser.add_argument("--state", required=True)
+
+    collect_parser = commands.add_parser("collect", help="download finished jobs and write one JSONL record per clip")
+    collect_parser.add_argument("--state", required=True)
+    collect_parser.add_argument("--out", required=True, help="output JSONL file")
+    collect_parser.add_argument("--wait", action="store_true", help="keep polling until every job is collected")
+    collect_parser.add_argument("--poll-interval", type=float, default=BATCH_POLL_INTERVAL, help="seconds between status checks with --wait")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    api_key, _ = resolve_api_key()
+    if not api_key:
+        print("No Gemini API key found: set GEMINI_API_KEY (or GOOGLE_API_KEY) or add it to .env", file=sys.stderr)
+        return 2
+    client = BatchClient(api_key, args.base_url)
+    state = load_state(args.state)
+
+    if args.command == "submit":
+        try:
+            submit(client, state, args.state, load_clips(args.source, args.skill), args.model, args.batch_size)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+    elif args.command == "status":
+        refresh(client, state, args.state)
+        for job in state["jobs"]:
+            print(f"{job['name']}\t{job['state']}\t{len(job['keys'])} clips\t{'collected' if job['collected'] else ''}")
+    else:
+        outstanding = collect(client, state, args.state, args.out, args.wait, args.poll_interval)
+        if outstanding:
+            logging.info(f"{outstanding} batch jobs not finished yet; run collect again later")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
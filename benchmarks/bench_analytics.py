@@ -0,0 +1,54 @@
+"""Show that the per-rerun cost of analytics does not grow with the session.
+
+Simulates one long session: every rerun records the page_view the app logs
+on each run plus `--events` interaction events, then flushes the batch as
+the app does at the end of a run. For sessions of increasing length it
+reports the time and the page payload of the last 100 reruns:
+
+    python benchmarks/bench_analytics.py [--events 2]
+
+Before the buffer, every event (including a page_view per rerun) was its
+own page element of roughly 400 bytes.
+"""
+import argparse
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from analytics import new_analytics_session, record_event, take_pending_events, events_html
+
+WINDOW = 100
+
+def rerun(session, events):
+    record_event(session, "page_view", {"page": "main"})
+    for number in range(events):
+        record_event(session, "skill_selection_changed", {"new_skill": "تمرير", "previous_skill": "استقبال", "n": number})
+    batch = take_pending_events(session)
+    return (1, len(events_html(batch).encode())) if batch else (0, 0)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=2, help="events logged per rerun")
+    args = parser.parse_args()
+
+    print(f"{args.events} events per rerun, last {WINDOW} reruns of each session")
+    print(f"  {'reruns':>8} {'us/rerun':>9} {'elements/rerun':>15} {'bytes/rerun':>12} {'buffered':>9}")
+    for reruns in (WINDOW, 1_000, 10_000, 100_000):
+        session = new_analytics_session("bench")
+        for _ in range(reruns - WINDOW):
+            rerun(session, args.events)
+        elements = payload = 0
+        started = time.perf_counter()
+        for _ in range(WINDOW):
+            sent_elements, sent_bytes = rerun(session, args.events)
+            elements += sent_elements
+            payload += sent_bytes
+        elapsed = time.perf_counter() - started
+        print(f"  {reruns:8d} {elapsed / WINDOW * 1e6:9.1f} {elements / WINDOW:15.1f} "
+              f"{payload / WINDOW:12.0f} {len(session['events']):9d}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Show that dashboard queries on the analytics store do not grow with the event log.
+
+Appends synthetic app events (one analysis per batch: started, detection,
+completed or failed) to a fresh store in growing amounts, and after each
+step times `summary()` over the rollups next to the equivalent full scan
+of the event log:
+
+    python benchmarks/bench_analytics_store.py [--steps 10000,100000,500000] [--days 90]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from analytics_store import AnalyticsStore
+
+MODELS = ["models/gemini-2.5-flash", "models/gemini-2.5-pro", "models/gemini-2.0-flash"]
+SKILLS = ["تمرير", "استقبال", "كلاهما"]
+
+def analysis_events(number, days):
+    when = (datetime.now(timezone.utc) - timedelta(days=number % days)).isoformat()
+    model, skill = MODELS[number % 3], SKILLS[number % len(SKILLS)]
+    base = {"session_id": f"s{number // 5}"}
+    events = [
+        ("analysis_started", {"model_used": model, "skill_type": skill}),
+        ("skill_detection_completed", {"selected_skill": skill, "match": str(number % 7 != 0)}),
+    ]
+    if number % 20:
+        events.append(("analysis_completed", {"model_used": model, "skill_analyzed": skill,
+                                              "degradation_tier": "full", "shared_result": str(number % 4 == 0)}))
+    else:
+        events.append(("analysis_failed", {"model_used": model, "skill_type": skill}))
+    return [
+        {"id": f"{number}-{i}", "time": when, "name": name, "params": dict(base, **params)}
+        for i, (name, params) in enumerate(events)
+    ]
+
+def full_scan_summary(store):
+    # What a dashboard without rollups would run
+    counts = {}
+    for name, properties in store._connection().execute("SELECT name, properties FROM events"):
+        params = json.loads(properties)
+        counts[name] = counts.get(name, 0) + 1
+        if name == "analysis_completed":
+            key = ("model", params["model_used"])
+            counts[key] = counts.get(key, 0) + 1
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", default="10000,100000,500000", help="cumulative event counts to measure at")
+    parser.add_argument("--days", type=int, default=90)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AnalyticsStore(os.path.join(tmp, "analytics.db"))
+        number = 0
+        print(f"  {'events':>9} {'summary ms':>11} {'full scan ms':>13} {'append us/event':>16}")
+        for target in (int(step) for step in args.steps.split(",")):
+            appended = 0
+            started = time.perf_counter()
+            while store.event_count() < target:
+                batch = []
+                for _ in range(200):
+                    batch += analysis_events(number, args.days)
+                    number += 1
+                appended += store.append(batch)
+            append_us = (time.perf_counter() - started) / max(appended, 1) * 1e6
+
+            started = time.perf_counter()
+            for _ in range(10):
+                store.summary()
+            summary_ms = (time.perf_counter() - started) / 10 * 1000
+            started = time.perf_counter()
+            full_scan_summary(store)
+            scan_ms = (time.perf_counter() - started) * 1000
+            print(f"  {store.event_count():9d} {summary_ms:11.2f} {scan_ms:13.1f} {append_us:16.1f}")
+
+if __name__ == "__main__":
+    main()
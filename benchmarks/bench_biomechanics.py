@@ -0,0 +1,130 @@
+"""Frames per second per core of the biomechanics engine on 60 fps keypoint sequences.
+
+Builds synthetic MediaPipe keypoint sequences of a kicking player (with
+pose noise and dropped joints) of growing length. It times
+`biomechanics.clip_metrics` (all per-frame rubric metrics plus contact
+detection) against the per-frame Python loop it replaces, checks that both
+give the same angles, and reports frames per second on one core:
+
+    python benchmarks/bench_biomechanics.py [--seconds 10,60,600] [--fps 60]
+"""
+import os
+
+# One core: NumPy's element-wise operations are single-threaded, but BLAS must be too
+for variable in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ[variable] = "1"
+
+import argparse
+import math
+import sys
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import biomechanics as bio
+
+def synthetic_keypoints(frames, fps, seed=0):
+    """(frames, 33, 3) keypoints of a player swinging the left leg through a pass every 2 seconds."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(frames) / fps
+    keypoints = np.zeros((frames, 33, 3))
+    keypoints[:, :, 2] = 0.95
+    hips = np.array([[300.0, 400.0], [340.0, 400.0]])
+    # The left (striking) knee bends and snaps straight in a sharp swing every 2 seconds
+    swing = np.abs(np.sin(math.pi * t / 2.0)) ** 9
+    knee_angles = np.stack([100 + 60 * swing, np.full(frames, 140.0)], axis=1)
+    bend = np.radians(180 - knee_angles)
+    for leg in range(2):
+        hip = np.broadcast_to(hips[leg], (frames, 2))
+        knee = hip + [0.0, 100.0]
+        ankle = knee + 100 * np.stack([np.sin(bend[:, leg]), np.cos(bend[:, leg])], axis=-1)
+        keypoints[:, bio.HIPS[leg], :2] = hip
+        keypoints[:, bio.KNEES[leg], :2] = knee
+        keypoints[:, bio.ANKLES[leg], :2] = ankle
+        keypoints[:, bio.HEELS[leg], :2] = ankle
+        keypoints[:, bio.TOES[leg], :2] = ankle + ([30.0, 0.0] if leg == 0 else [0.0, 30.0])
+    lean = np.radians(20)
+    shoulders = np.array([320.0, 400.0]) + 150 * np.array([math.sin(lean), -math.cos(lean)])
+    keypoints[:, bio.LEFT_SHOULDER, :2] = shoulders - [20, 0]
+    keypoints[:, bio.RIGHT_SHOULDER, :2] = shoulders + [20, 0]
+    keypoints[:, :, :2] += rng.normal(0, 1.5, (frames, 33, 2))
+    # About 2% of joints are occluded
+    keypoints[rng.random((frames, 33)) < 0.02, 2] = 0.1
+    return keypoints
+
+def loop_metrics(keypoints, fps):
+    """The per-frame Python loop: every metric computed one frame and one joint at a time."""
+    def point(frame, index):
+        x, y, visibility = frame[index]
+        return None if visibility < bio.MIN_VISIBILITY else (x, y)
+
+    def angle(a, b, c):
+        if a is None or b is None or c is None:
+            return math.nan
+        first, second = (a[0] - b[0], a[1] - b[1]), (c[0] - b[0], c[1] - b[1])
+        return math.degrees(math.atan2(abs(first[0] * second[1] - first[1] * second[0]),
+                                       first[0] * second[0] + first[1] * second[1]))
+
+    knees, trunks, feet, speeds = [], [], [], []
+    previous = None
+    for frame in keypoints:
+        knees.append([angle(point(frame, bio.HIPS[leg]), point(frame, bio.KNEES[leg]), point(frame, bio.ANKLES[leg]))
+                      for leg in range(2)])
+        upper = [point(frame, index) for index in (bio.LEFT_SHOULDER, bio.RIGHT_SHOULDER, bio.LEFT_HIP, bio.RIGHT_HIP)]
+        if any(p is None for p in upper):
+            trunks.append(math.nan)
+        else:
+            shoulders = ((upper[0][0] + upper[1][0]) / 2, (upper[0][1] + upper[1][1]) / 2)
+            hips = ((upper[2][0] + upper[3][0]) / 2, (upper[2][1] + upper[3][1]) / 2)
+            trunks.append(angle(shoulders, hips, (hips[0], hips[1] - 1)))
+        ends = [(point(frame, bio.HEELS[leg]), point(frame, bio.TOES[leg])) for leg in range(2)]
+        if any(p is None for pair in ends for p in pair):
+            feet.append(math.nan)
+        else:
+            directions = [(toe[0] - heel[0], toe[1] - heel[1]) for heel, toe in ends]
+            feet.append(angle(directions[0], (0, 0), directions[1]))
+        ankles = [point(frame, bio.ANKLES[leg]) for leg in range(2)]
+        if previous is None:
+            speeds.append([math.nan, math.nan])
+        else:
+            speeds.append([math.hypot(a[0] - b[0], a[1] - b[1]) * fps if a and b else math.nan
+                           for a, b in zip(ankles, previous)])
+        previous = ankles
+    best = max(((value, index, leg) for index, row in enumerate(speeds) for leg, value in enumerate(row)
+                if not math.isnan(value)), default=(None, None, None))
+    return {"knee_flexion": np.array(knees), "trunk_inclination": np.array(trunks), "feet_angle": np.array(feet),
+            "contact_frame": best[1], "active_leg": best[2]}
+
+def timed(run, repeat):
+    best = math.inf
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", default="10,60,600", help="clip lengths to measure, in seconds")
+    parser.add_argument("--fps", type=float, default=60)
+    args = parser.parse_args()
+
+    print(f"  {'clip':>7} {'frames':>7} {'loop frames/s':>14} {'vectorized frames/s':>20} {'speed-up':>9} {'contact':>8}")
+    for seconds in (float(value) for value in args.seconds.split(",")):
+        frames = int(seconds * args.fps)
+        keypoints = synthetic_keypoints(frames, args.fps)
+        vectorized = bio.clip_metrics(keypoints, args.fps)
+        looped = loop_metrics(keypoints, args.fps)
+        for name in ("knee_flexion", "trunk_inclination", "feet_angle"):
+            np.testing.assert_allclose(vectorized[name], looped[name], atol=1e-6, equal_nan=True, err_msg=name)
+        repeat = 5 if frames <= 10_000 else 2
+        loop_seconds = timed(lambda: loop_metrics(keypoints, args.fps), min(repeat, 2))
+        vector_seconds = timed(lambda: bio.clip_metrics(keypoints, args.fps), repeat)
+        print(f"  {seconds:6.0f}s {frames:7d} {frames / loop_seconds:14.0f} {frames / vector_seconds:20.0f} "
+              f"{loop_seconds / vector_seconds:8.0f}x {vectorized['contact_frame']:8d}")
+
+if __name__ == "__main__":
+    main()
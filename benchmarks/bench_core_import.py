@@ -0,0 +1,60 @@
+"""Measure the import time of the headless analysis core.
+
+Each sample imports `analysis_core` in a fresh interpreter and records the
+wall time of the import alone. Fails (exit code 1) when the median exceeds
+the budget, or when the import pulls in Streamlit or the Gemini SDK.
+
+    python benchmarks/bench_core_import.py [--runs 15] [--budget-ms 150]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules the core must not import eagerly
+HEAVY_MODULES = ["streamlit", "google.generativeai"]
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import analysis_core
+elapsed = (time.perf_counter() - start) * 1000
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(f"{{elapsed:.3f}} {{','.join(heavy)}}")
+"""
+
+def measure_once():
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(heavy=HEAVY_MODULES)],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    ).stdout.split()
+    return float(out[0]), out[1].split(",") if len(out) > 1 else []
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=150.0)
+    args = parser.parse_args()
+
+    samples, heavy = [], set()
+    for _ in range(args.runs):
+        elapsed, loaded = measure_once()
+        samples.append(elapsed)
+        heavy.update(loaded)
+
+    median = statistics.median(samples)
+    print(f"analysis_core import: median {median:.1f} ms, min {min(samples):.1f} ms, "
+          f"max {max(samples):.1f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    if heavy:
+        print(f"FAIL: importing analysis_core loaded {', '.join(sorted(heavy))}")
+        return 1
+    if median > args.budget_ms:
+        print("FAIL: import time over budget")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Frames per second of the parallel frame decoder against single-threaded decoding.
+
+Decodes each clip once in this process with one decoding thread (the
+baseline) and then with frame_decoder.FrameDecoder at growing worker
+counts, both at full resolution and as the pose backend samples it
+(POSE_SAMPLE_FPS, POSE_FRAME_WIDTH). It checks that every run yields the
+same frames, in the same order, as the baseline. Pass real clips with
+--video; by default it encodes synthetic phone-like footage (1080p H.264,
+one-second GOPs) first:
+
+    python benchmarks/bench_decode.py [--video clip.mp4 ...] [--workers 1,2,4,8,16] [--seconds 20]
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import frame_decoder
+from frame_decoder import FrameDecoder, get_decode_pool
+from pose_backend import POSE_FRAME_WIDTH, POSE_SAMPLE_FPS
+
+def synthetic_clip(path, seconds, fps, width=1920, height=1080):
+    """A moving-gradient H.264 clip with a keyframe every second, as phone cameras record."""
+    av = frame_decoder._av()
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    with av.open(path, "w") as container:
+        stream = container.add_stream("libx264", rate=fps)
+        stream.width, stream.height, stream.pix_fmt = width, height, "yuv420p"
+        stream.options = {"g": str(fps), "bf": "0", "preset": "veryfast", "crf": "20"}
+        for index in range(int(seconds * fps)):
+            image = np.empty((height, width, 3), dtype=np.uint8)
+            image[..., 0] = (x + index * 7) % 256
+            image[..., 1] = (y + index * 3) % 256
+            image[..., 2] = rng.integers(0, 32, (height, width))
+            for packet in stream.encode(av.VideoFrame.from_ndarray(image, format="rgb24")):
+                container.mux(packet)
+        for packet in stream.encode():
+            container.mux(packet)
+
+def digest(frames):
+    """(frames, hash of every index and frame, seconds) of one decode."""
+    started = time.perf_counter()
+    hasher, count = hashlib.blake2b(), 0
+    for index, frame in frames:
+        hasher.update(index.to_bytes(8, "little"))
+        hasher.update(np.ascontiguousarray(frame))
+        count += 1
+    return count, hasher.hexdigest(), time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--video", nargs="*", default=None, help="clips to decode (default: synthetic footage)")
+    parser.add_argument("--workers", default=None, help=f"worker counts to measure (default: 1,2,4,... up to {os.cpu_count()})")
+    parser.add_argument("--seconds", type=float, default=20, help="length of the synthetic clips")
+    args = parser.parse_args()
+    cores = os.cpu_count() or 1
+    workers = [int(value) for value in args.workers.split(",")] if args.workers else \
+        sorted({2 ** power for power in range(cores.bit_length()) if 2 ** power <= cores} | {cores})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        videos = args.video
+        if not videos:
+            videos = []
+            for fps in (30, 60):
+                path = os.path.join(tmp, f"phone_1080p{fps}.mp4")
+                synthetic_clip(path, args.seconds, fps)
+                videos.append(path)
+        # Start every worker process up front: spawning is a one-off cost of the app, not of a clip
+        list(get_decode_pool(max(workers)).map(abs, range(max(workers) * 4)))
+
+        print(f"  {cores} CPU cores")
+        print(f"  {'clip':>20} {'mode':>10} {'workers':>8} {'segments':>9} {'frames':>7} {'frames/s':>9} {'speed-up':>9}")
+        for video in videos:
+            for mode, options in (("full", {}), ("pose", {"sample_fps": POSE_SAMPLE_FPS, "max_width": POSE_FRAME_WIDTH})):
+                # Baseline: this process, one decoding thread, no segments
+                serial = FrameDecoder(video, workers=1, **options)
+                count, expected, baseline = digest(serial._decode_serial())
+                print(f"  {os.path.basename(video)[-20:]:>20} {mode:>10} {'serial':>8} {1:9d} {count:7d} "
+                      f"{count / baseline:9.0f} {1:8.1f}x")
+                for worker_count in workers:
+                    decoder = FrameDecoder(video, workers=worker_count, **options)
+                    count, found, seconds = digest(decoder)
+                    assert found == expected, f"{video} {mode} with {worker_count} workers yielded different frames"
+                    print(f"  {'':>20} {'':>10} {worker_count:8d} {len(decoder.segments):9d} {count:7d} "
+                          f"{count / seconds:9.0f} {baseline / seconds:8.1f}x")
+
+if __name__ == "__main__":
+    main()
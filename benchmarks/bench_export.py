@@ -0,0 +1,77 @@
+"""Show that the columnar export's memory stays flat as the export grows.
+
+Fills a history database with `--steps` synthetic assessments (the
+bench_history.py records, 6 to 12 criteria each), then exports it to
+Parquet and Arrow IPC with assessment_export.py and, for comparison, to one
+JSON document built in memory. Each export runs in a fresh process so its
+peak RSS is its own:
+
+    python benchmarks/bench_export.py [--steps 20000,100000,300000]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from assessment_history import AssessmentHistory
+from bench_history import records
+
+FORMATS = ("parquet", "arrow", "json")
+
+def run_export(db_path, out_path, fmt):
+    """Child process: one export; prints rows, seconds and peak RSS in MB."""
+    from assessment_export import export_rows, history_rows
+
+    history = AssessmentHistory(db_path)
+    started = time.perf_counter()
+    if fmt == "json":
+        # What a per-clip JSON dump amounts to: every row held until the end
+        rows = list(history_rows(history))
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False)
+        written = len(rows)
+    else:
+        written = export_rows(history_rows(history), out_path)
+    elapsed = time.perf_counter() - started
+    print(json.dumps({"rows": written, "seconds": elapsed, "peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", default="20000,100000,300000", help="cumulative assessment counts to measure at")
+    parser.add_argument("--child", nargs=3, metavar=("DB", "OUT", "FORMAT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_export(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "history.db")
+        history = AssessmentHistory(db_path)
+        generated = records(max(int(step) for step in args.steps.split(",")))
+        print(f"  {'assessments':>11} {'rows':>9} {'format':>8} {'seconds':>8} {'rows/s':>9} {'MB on disk':>11} {'peak RSS MB':>12}")
+        stored = 0
+        for target in (int(step) for step in args.steps.split(",")):
+            history.import_records(next(generated) for _ in range(target - stored))
+            stored = target
+            for fmt in FORMATS:
+                out_path = os.path.join(tmp, f"export.{fmt}")
+                output = subprocess.run(
+                    [sys.executable, __file__, "--child", db_path, out_path, fmt],
+                    capture_output=True, text=True, check=True,
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                size_mb = os.path.getsize(out_path) / 1e6
+                print(f"  {target:11d} {result['rows']:9d} {fmt:>8} {result['seconds']:8.2f} "
+                      f"{result['rows'] / result['seconds']:9.0f} {size_mb:11.1f} {result['peak_mb']:12.0f}")
+                os.remove(out_path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""What the frame cache saves on a repeat local analysis of the same clip.
+
+For each clip it times, at the pose backend's sampling (POSE_SAMPLE_FPS,
+POSE_FRAME_WIDTH):
+
+- decoding the frames (frame_decoder.FrameDecoder), the first analysis;
+- reading the same frames back from the memory-mapped cache entry, with
+  the page cache cold (dropped with posix_fadvise) and warm;
+- loading cached keypoints, which skips pose inference too;
+- the validity check: hashing the clip from scratch against the
+  size-and-mtime lookup that repeat analyses pay.
+
+Each read touches every pixel (a checksum), as a consumer would. Pass real
+clips with --video; by default it encodes synthetic 1080p phone-like
+footage (bench_decode.py) first:
+
+    python benchmarks/bench_frame_cache.py [--video clip.mp4 ...] [--seconds 20]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from analysis_core import file_content_hash
+from bench_decode import synthetic_clip
+from frame_cache import FrameCache, frame_variant
+from frame_decoder import FrameDecoder
+from pose_backend import POSE_FRAME_WIDTH, POSE_SAMPLE_FPS
+
+def checksum(frames):
+    return sum(int(frame.sum(dtype=np.uint64)) for frame in frames)
+
+def timed(run):
+    started = time.perf_counter()
+    result = run()
+    return result, time.perf_counter() - started
+
+def drop_page_cache(path):
+    if hasattr(os, "posix_fadvise"):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--video", nargs="*", default=None, help="clips to measure (default: synthetic footage)")
+    parser.add_argument("--seconds", type=float, default=20, help="length of the synthetic clips")
+    args = parser.parse_args()
+    variant = frame_variant(POSE_SAMPLE_FPS, POSE_FRAME_WIDTH)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        videos = args.video
+        if not videos:
+            videos = []
+            for fps in (30, 60):
+                path = os.path.join(tmp, f"phone_1080p{fps}.mp4")
+                synthetic_clip(path, args.seconds, fps)
+                videos.append(path)
+        cache = FrameCache(os.path.join(tmp, "frames"), max_bytes=1 << 40)
+
+        print(f"  {'clip':>20} {'step':>28} {'seconds':>9} {'frames/s':>10} {'speed-up':>9}")
+        for video in videos:
+            name = os.path.basename(video)[-20:]
+            content_hash, hash_seconds = timed(lambda: cache.source_hash(video))
+            decoder = FrameDecoder(video, sample_fps=POSE_SAMPLE_FPS, max_width=POSE_FRAME_WIDTH)
+            with cache.frame_writer(content_hash, variant, len(decoder), decoder.frame_shape, decoder.sampled_fps) as writer:
+                expected, decode_seconds = timed(lambda: checksum(writer.record(image for _, image in decoder)))
+            cache.put_keypoints(content_hash, variant, "bench", np.zeros((writer.count, 33, 3)), decoder.sampled_fps)
+            count = writer.count
+
+            def cached_checksum():
+                frames, _ = cache.frames(content_hash, variant)
+                return checksum(frames)
+
+            drop_page_cache(os.path.join(cache.entry_dir(content_hash, variant), "frames.npy"))
+            found, cold_seconds = timed(cached_checksum)
+            assert found == expected, f"cached frames of {video} differ from the decoded ones"
+            _, warm_seconds = timed(cached_checksum)
+            _, keypoint_seconds = timed(lambda: np.asarray(cache.keypoints(content_hash, variant, "bench")[0]).sum())
+            _, full_hash_seconds = timed(lambda: file_content_hash(video))
+            _, check_seconds = timed(lambda: cache.source_hash(video))
+
+            rows = [
+                ("decode (first analysis)", decode_seconds, count),
+                ("cached frames, cold pages", cold_seconds, count),
+                ("cached frames, warm pages", warm_seconds, count),
+                ("cached keypoints", keypoint_seconds, count),
+            ]
+            for label, seconds, frames in rows:
+                print(f"  {name:>20} {label:>28} {seconds:9.4f} {frames / seconds:10.0f} {decode_seconds / seconds:8.0f}x")
+            print(f"  {name:>20} {'hash check, full read':>28} {full_hash_seconds:9.4f}")
+            print(f"  {name:>20} {'hash check, size and mtime':>28} {check_seconds:9.6f} {'':>10} "
+                  f"{full_hash_seconds / check_seconds:8.0f}x")
+            print(f"  {name:>20} {'cache entry MB':>28} {cache.total_bytes() / 1e6:9.1f}")
+            cache.remove(content_hash, variant)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Measure the assessment history store at squad scale.
+
+Bulk-imports `--assessments` synthetic grade_clips.py records (40 players,
+6 to 12 criteria each) into a fresh database, then times the queries the
+history views and the squad review page run: a squad-wide page near the
+start and deep into the history (keyset cursor vs the OFFSET it
+replaces), a player's page, pages filtered or sorted by a criterion's
+grade, a player's criterion trend and the player list:
+
+    python benchmarks/bench_history.py [--assessments 300000]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from assessment_history import AssessmentHistory, encode_cursor
+
+PLAYERS = [f"لاعب {number}" for number in range(1, 41)]
+PASSING = ["ركبة القدم الضاربة", "انحناء الجذع", "القدم الساندة", "سطح التمرير", "دقة التمرير", "المتابعة"]
+# انحناء الجذع is graded in both sections, as in the real rubrics
+RECEIVING = ["وضعية الجسم", "انحناء الجذع", "سطح الاستلام", "اللمسة الأولى", "امتصاص الكرة", "التحرك"]
+GRADES = ["مثالي", "جيد", "غير مقبول"]
+
+def records(count):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for number in range(count):
+        passing = {criterion: GRADES[(number + i) % 3] for i, criterion in enumerate(PASSING)}
+        if number % 3 == 0:
+            skill, grades = "كلاهما", {"التمرير": passing, "الاستلام": {c: GRADES[(number * 7 + i) % 3] for i, c in enumerate(RECEIVING)}}
+        else:
+            skill, grades = "تمرير", passing
+        yield {
+            "clip_id": f"clip-{number}",
+            "player": PLAYERS[number % len(PLAYERS)],
+            "selected_skill": skill,
+            "skill_analyzed": skill,
+            "model": "models/gemini-2.5-flash",
+            "content_hash": f"{number:064x}",
+            "status": "ok",
+            "grades": grades,
+            "finished_at": (start + timedelta(minutes=number * 3)).isoformat(),
+        }
+
+def timed(run, repeat=20):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+def check_criterion_pages(history, criterion, page_size=1000):
+    """Walk every page of each criterion order and check that each assessment shows up once, with its grades."""
+    graded = history._connection().execute(
+        "SELECT COUNT(DISTINCT assessment_id) FROM grades WHERE criterion = ? AND score IS NOT NULL", (criterion,)).fetchone()[0]
+    for sort in ("newest", "best", "worst"):
+        seen, cursor = set(), None
+        while True:
+            rows, cursor = history.page(criterion=criterion, sort=sort, cursor=cursor, limit=page_size)
+            for row in rows:
+                assert row["assessment_id"] not in seen, f"assessment {row['assessment_id']} repeated in '{sort}' order"
+                assert row["grades"], f"assessment {row['assessment_id']} without grades"
+                seen.add(row["assessment_id"])
+            if not cursor:
+                break
+        assert len(seen) == graded, f"'{sort}' order returned {len(seen)} of {graded} assessments"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--assessments", type=int, default=300_000)
+    parser.add_argument("--page-size", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        history = AssessmentHistory(os.path.join(tmp, "history.db"))
+        started = time.perf_counter()
+        imported, _ = history.import_records(records(args.assessments))
+        elapsed = time.perf_counter() - started
+        print(f"imported {imported} assessments in {elapsed:.1f}s ({imported / elapsed:.0f}/s)")
+
+        deep = args.assessments // 2
+        deep_row = history._connection().execute(
+            "SELECT assessed_at, assessment_id FROM assessments ORDER BY assessed_at DESC, assessment_id DESC LIMIT 1 OFFSET ?",
+            (deep - 1,),
+        ).fetchone()
+        deep_cursor = encode_cursor(list(deep_row))
+        offset_page = lambda: history._connection().execute(
+            "SELECT * FROM assessments ORDER BY assessed_at DESC, assessment_id DESC LIMIT ? OFFSET ?",
+            (args.page_size, deep),
+        ).fetchall()
+        player = PLAYERS[7]
+
+        # كلاهما assessments grade انحناء الجذع in both sections, but are one card each
+        check_criterion_pages(history, "انحناء الجذع")
+
+        print(f"  {'query':<40} {'ms':>8}")
+        for label, run in (
+            ("squad page 1", lambda: history.page(limit=args.page_size)),
+            (f"squad page at row {deep} (cursor)", lambda: history.page(cursor=deep_cursor, limit=args.page_size)),
+            (f"squad page at row {deep} (OFFSET)", offset_page),
+            ("player page 1", lambda: history.page(player, limit=args.page_size)),
+            ("squad page, best 'انحناء الجذع' first", lambda: history.page(criterion="انحناء الجذع", sort="best", limit=args.page_size)),
+            ("squad page, 'انحناء الجذع' = غير مقبول", lambda: history.page(criterion="انحناء الجذع", grade="غير مقبول", limit=args.page_size)),
+            ("player page, worst 'انحناء الجذع' first", lambda: history.page(player, criterion="انحناء الجذع", sort="worst", limit=args.page_size)),
+            ("squad page, كلاهما in one month", lambda: history.page(skill="كلاهما", since="2024-02-01", until="2024-03-01", limit=args.page_size)),
+            ("player criterion trend", lambda: history.criterion_series(player, "انحناء الجذع")),
+            ("player list", history.players),
+        ):
+            print(f"  {label:<40} {timed(run):8.2f}")
+
+if __name__ == "__main__":
+    main()
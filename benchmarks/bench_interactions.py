@@ -0,0 +1,161 @@
+"""Measure server time and websocket payload per UI interaction.
+
+Starts the app with `streamlit run` on a free port and talks to it over the
+same websocket protocol as the browser: it loads the page, then repeats a
+set of interactions (skill radio, model selector, "use this model" button,
+and a full-script rerun as after an upload) and records, for each, the time until the server reports the run finished
+and the bytes and deltas it sent back. Interactions inside an st.fragment
+are sent as fragment reruns, exactly as the browser does.
+
+    python benchmarks/bench_interactions.py [--repeat 10] [--baseline REV]
+
+With `--baseline REV` the app file at that git revision is measured too.
+A Gemini key must be configured (a dummy key is enough; no request is made).
+A dummy Google Analytics ID is set too, so the analytics payload is counted.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from tornado.websocket import websocket_connect
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(app_path, port):
+    env = dict(
+        os.environ,
+        GEMINI_API_KEY=os.getenv("GEMINI_API_KEY", "bench-dummy-key"),
+        GOOGLE_ANALYTICS_ID=os.getenv("GOOGLE_ANALYTICS_ID", "G-BENCH00000"),
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", app_path, "--server.headless", "true",
+         "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1)
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("streamlit did not start")
+
+class Session:
+    """One browser-like websocket session."""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.widgets = {}
+        self.widget_states = {}
+
+    async def rerun(self, fragment_id="", trigger=None):
+        """Request a rerun and read until the run finishes; returns (seconds, bytes, deltas)."""
+        msg = BackMsg()
+        client_state = msg.rerun_script
+        client_state.fragment_id = fragment_id
+        for state in self.widget_states.values():
+            client_state.widget_states.widgets.append(state)
+        if trigger:
+            client_state.widget_states.widgets.add(id=trigger, trigger_value=True)
+        started = time.perf_counter()
+        await self.ws.write_message(msg.SerializeToString(), binary=True)
+        received = deltas = 0
+        while True:
+            data = await self.ws.read_message()
+            if data is None:
+                raise RuntimeError("websocket closed")
+            received += len(data)
+            forward = ForwardMsg()
+            forward.ParseFromString(data)
+            kind = forward.WhichOneof("type")
+            if kind == "delta":
+                deltas += 1
+                self.record_widget(forward.delta)
+            elif kind == "script_finished":
+                return time.perf_counter() - started, received, deltas
+
+    def record_widget(self, delta):
+        if delta.WhichOneof("type") != "new_element":
+            return
+        element = delta.new_element
+        kind = element.WhichOneof("type")
+        if kind in ("radio", "selectbox", "button"):
+            widget = getattr(element, kind)
+            self.widgets[(kind, widget.label)] = (widget.id, delta.fragment_id, widget)
+
+    def widget(self, kind, label):
+        return self.widgets[(kind, label)]
+
+async def measure(app_path, repeat):
+    port = free_port()
+    process = start_server(app_path, port)
+    try:
+        ws = await websocket_connect(f"ws://127.0.0.1:{port}/_stcore/stream", max_message_size=256 * 1024 * 1024)
+        session = Session(ws)
+        results = {"page load": [await session.rerun()]}
+
+        for number in range(repeat):
+            # Looked up again each time: a full rerun may re-register fragments
+            radio_id, radio_fragment, radio = session.widget("radio", "نوع التقييم:")
+            select_id, select_fragment, select = session.widget("selectbox", "النموذج المتاح:")
+            button_id, button_fragment, _ = session.widget("button", "استخدم هذا النموذج")
+            session.widget_states[radio_id] = WidgetState(id=radio_id, int_value=(number + 1) % len(radio.options))
+            results.setdefault("skill radio", []).append(await session.rerun(radio_fragment))
+            option = select.options[(number + 1) % len(select.options)]
+            session.widget_states[select_id] = WidgetState(id=select_id, string_value=option)
+            results.setdefault("model selector", []).append(await session.rerun(select_fragment))
+            results.setdefault("use model button", []).append(await session.rerun(button_fragment, trigger=button_id))
+            results.setdefault("full rerun", []).append(await session.rerun())
+        ws.close()
+        return results
+    finally:
+        process.terminate()
+        process.wait()
+
+def report(label, results):
+    print(f"\n{label}")
+    print(f"  {'interaction':<18} {'server ms':>10} {'bytes':>10} {'deltas':>7}")
+    for interaction, samples in results.items():
+        print(f"  {interaction:<18} {statistics.median(s[0] for s in samples) * 1000:10.1f} "
+              f"{statistics.median(s[1] for s in samples):10.0f} {statistics.median(s[2] for s in samples):7.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--app", default=os.path.join(REPO_ROOT, "new_app.py"))
+    parser.add_argument("--baseline", default=None, help="git revision of new_app.py to compare against")
+    args = parser.parse_args()
+
+    if args.baseline:
+        source = subprocess.run(
+            ["git", "show", f"{args.baseline}:new_app.py"],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        ).stdout
+        # Next to new_app.py, so it imports the same modules
+        baseline_path = os.path.join(REPO_ROOT, ".bench_baseline_app.py")
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            f.write(source)
+        try:
+            report(f"baseline ({args.baseline})", asyncio.run(measure(baseline_path, args.repeat)))
+        finally:
+            os.remove(baseline_path)
+    report("current", asyncio.run(measure(args.app, args.repeat)))
+
+if __name__ == "__main__":
+    main()
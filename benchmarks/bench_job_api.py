@@ -0,0 +1,137 @@
+"""Measure concurrent request throughput of the HTTP job API.
+
+Starts job_api in-process on a free port with a simulated Gemini SDK (fixed
+call latency, no network or quota), then has `--clients` threads each submit
+`--jobs` clips as chunked uploads and poll them to completion. Reports
+submission latency, end-to-end latency and completed jobs per second. The
+Gemini calls are capped by GEMINI_MAX_CONCURRENT_CALLS as in production, so
+set that (and ANALYSIS_MEMORY_BUDGET_MB) to the values you deploy with.
+
+    python benchmarks/bench_job_api.py [--clients 16] [--jobs 4] [--clip-kb 512] [--gemini-latency 0.5]
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analysis_core
+import job_api
+
+def simulated_genai(latency):
+    """Stand-in for google.generativeai with a fixed per-call latency."""
+    def make_file(name):
+        return types.SimpleNamespace(name=name, state=types.SimpleNamespace(name="ACTIVE"))
+
+    class Model:
+        def __init__(self, model_name, **kwargs):
+            pass
+
+        async def generate_content_async(self, contents, request_options=None):
+            await asyncio.sleep(latency)
+            prompt = contents[0] if isinstance(contents[0], str) else contents[1]
+            text = "تمرير" if "identify" in prompt.lower() else "ركبة القدم الضاربة: جيد\nالتقييم العام: جيد"
+            return types.SimpleNamespace(
+                text=text,
+                candidates=[types.SimpleNamespace(finish_reason=1)],
+                usage_metadata=types.SimpleNamespace(prompt_token_count=300, candidates_token_count=20, total_token_count=320),
+            )
+
+    return types.SimpleNamespace(
+        configure=lambda api_key: None,
+        upload_file=lambda path, display_name: make_file(f"files/{display_name}"),
+        get_file=make_file,
+        delete_file=lambda name: None,
+        GenerativeModel=Model,
+    )
+
+def submit_chunked(port, clip, chunk_size=64 * 1024):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    conn.putrequest("POST", "/jobs?skill=Passing&filename=bench.mp4")
+    conn.putheader("Transfer-Encoding", "chunked")
+    conn.endheaders()
+    for start in range(0, len(clip), chunk_size):
+        chunk = clip[start:start + chunk_size]
+        conn.send(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+    conn.send(b"0\r\n\r\n")
+    response = conn.getresponse()
+    body = json.loads(response.read())
+    conn.close()
+    if response.status != 202:
+        raise RuntimeError(f"submit failed: {response.status} {body}")
+    return body["job_id"]
+
+def wait_for_result(port, job_id, poll_interval):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        while True:
+            conn.request("GET", f"/jobs/{job_id}/result")
+            response = conn.getresponse()
+            body = json.loads(response.read())
+            if response.status == 200:
+                return body
+            time.sleep(poll_interval)
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--jobs", type=int, default=4, help="jobs per client")
+    parser.add_argument("--clip-kb", type=int, default=512)
+    parser.add_argument("--gemini-latency", type=float, default=0.5, help="simulated seconds per Gemini call")
+    parser.add_argument("--workers", type=int, default=job_api.JOB_API_WORKERS)
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    args = parser.parse_args()
+
+    analysis_core._genai = lambda: simulated_genai(args.gemini_latency)
+    server = job_api.serve(port=0, workers=args.workers)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    submit_latencies, total_latencies, failures = [], [], []
+    lock = threading.Lock()
+
+    def client(number):
+        for job_number in range(args.jobs):
+            # Distinct clips, so request coalescing does not hide the load
+            clip = f"{number}-{job_number}".encode().ljust(args.clip_kb * 1024, b"\0")
+            started = time.perf_counter()
+            job_id = submit_chunked(port, clip)
+            submitted = time.perf_counter()
+            result = wait_for_result(port, job_id, args.poll_interval)
+            finished = time.perf_counter()
+            with lock:
+                submit_latencies.append(submitted - started)
+                total_latencies.append(finished - started)
+                if result["status"] != "done":
+                    failures.append(result)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(number,)) for number in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    def percentile(values, fraction):
+        return sorted(values)[min(len(values) - 1, int(fraction * len(values)))]
+
+    jobs = len(total_latencies)
+    print(f"{jobs} jobs from {args.clients} clients in {elapsed:.2f}s: {jobs / elapsed:.1f} jobs/s")
+    print(f"submit   p50 {statistics.median(submit_latencies) * 1000:.1f} ms  p95 {percentile(submit_latencies, 0.95) * 1000:.1f} ms")
+    print(f"complete p50 {statistics.median(total_latencies):.2f} s   p95 {percentile(total_latencies, 0.95):.2f} s")
+    print(f"Gemini calls capped at {analysis_core.GEMINI_MAX_CONCURRENT_CALLS} concurrent; {len(failures)} failed jobs")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
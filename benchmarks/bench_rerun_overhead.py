@@ -0,0 +1,73 @@
+"""Measure the per-rerun overhead of the Streamlit app.
+
+Runs new_app.py headless with Streamlit's AppTest, then times `--reruns`
+reruns of the same session (what a radio click or expander toggle costs on
+the server). With `--baseline REV`, the app file at that git revision is
+measured the same way for a before/after comparison:
+
+    python benchmarks/bench_rerun_overhead.py [--reruns 50] [--baseline HEAD~1]
+
+No Gemini request is made; the SDK is only configured with a dummy key.
+"""
+import argparse
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from streamlit.testing.v1 import AppTest
+
+def measure(app_path, reruns):
+    at = AppTest.from_file(app_path, default_timeout=60)
+    at.secrets["GEMINI_API_KEY"] = "bench-dummy-key"
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"{app_path} raised: {[e.value for e in at.exception]}")
+    samples = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        at.run()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+    print(f"{label:<10} median {statistics.median(samples):7.2f} ms  p95 {p95:7.2f} ms  min {samples[0]:7.2f} ms")
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=50)
+    parser.add_argument("--baseline", default=None, help="git revision of new_app.py to compare against")
+    args = parser.parse_args()
+    # The app logs every rerun; keep the measurement about the app, not the terminal
+    logging.disable(logging.INFO)
+
+    results = {}
+    if args.baseline:
+        source = subprocess.run(
+            ["git", "show", f"{args.baseline}:new_app.py"],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        ).stdout
+        # Next to new_app.py, so it imports the same modules
+        baseline_path = os.path.join(REPO_ROOT, ".bench_baseline_app.py")
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            f.write(source)
+        try:
+            results["baseline"] = report(args.baseline, measure(baseline_path, args.reruns))
+        finally:
+            os.remove(baseline_path)
+    results["current"] = report("current", measure(os.path.join(REPO_ROOT, "new_app.py"), args.reruns))
+
+    if "baseline" in results:
+        saved = results["baseline"] - results["current"]
+        print(f"per-rerun saving: {saved:.2f} ms ({saved / results['baseline'] * 100:.0f}%)")
+
+if __name__ == "__main__":
+    main()
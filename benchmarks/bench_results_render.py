@@ -0,0 +1,115 @@
+"""Measure rendering of assessment results: one element per clip vs per criterion.
+
+Renders `--clips` results (alternating كلاهما and single-skill results, the
+largest shapes) in a headless Streamlit script, once with the previous
+renderer (a heading element plus one st.markdown per criterion) and once
+with result_view's single-element renderer, and reports the elements sent
+to the frontend, their payload size and the script run time:
+
+    python benchmarks/bench_results_render.py [--clips 200] [--runs 10]
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from streamlit.testing.v1 import AppTest
+
+from result_view import normalize_assessment_result, assessment_result_html
+
+PASSING = ["دقة التمرير", "قوة التمرير", "اختيار نوع التمرير", "وضعية الجسم", "التوقيت", "الرؤية"]
+RECEIVING = ["استقبال الكرة", "السيطرة", "اللمسة الأولى", "وضعية الجسم", "الحركة بعد الاستلام", "التوقيت"]
+GRADES = ["مثالي", "جيد", "غير مقبول"]
+
+def sample_results(clips):
+    results = []
+    for number in range(clips):
+        grades = {criterion: GRADES[(number + i) % 3] for i, criterion in enumerate(PASSING)}
+        if number % 2:
+            results.append(("تمرير", grades))
+        else:
+            receiving = {criterion: GRADES[(number + i + 1) % 3] for i, criterion in enumerate(RECEIVING)}
+            results.append(("كلاهما", {"التمرير": grades, "الاستلام": receiving}))
+    return results
+
+def per_criterion_app(results):
+    # The renderer new_app.py used before result_view.py
+    import streamlit as st
+
+    def icon_of(grade):
+        return '[مثالي]' if grade == 'مثالي' else '[جيد]' if grade == 'جيد' else '[غير مقبول]'
+
+    def css_class_of(grade):
+        return {'مثالي': 'جيد', 'جيد': 'متوسط', 'غير مقبول': 'ضعيف'}.get(grade, 'متوسط')
+
+    def rows(grades):
+        for criterion, grade in grades.items():
+            st.markdown(f"""
+            <div class="assessment-result {css_class_of(grade)}">
+                {icon_of(grade)} {criterion}: {grade}
+            </div>
+            """, unsafe_allow_html=True)
+
+    for skill, result in results:
+        st.markdown("### نتائج التقييم المفصلة")
+        if 'التمرير' in result and 'الاستلام' in result:
+            st.markdown("#### نتائج التمرير")
+            rows(result['التمرير'])
+            st.markdown("#### نتائج الاستلام")
+            rows(result['الاستلام'])
+        else:
+            rows(result)
+
+def single_element_app(results, repo_root):
+    import sys
+    import streamlit as st
+    sys.path.insert(0, repo_root)
+    from result_view import normalize_assessment_result, assessment_result_html
+
+    for skill, result in results:
+        st.markdown(assessment_result_html(normalize_assessment_result(skill, result)), unsafe_allow_html=True)
+
+def measure(app, args, runs):
+    at = AppTest.from_function(app, args=args, default_timeout=120)
+    at.run()
+    if at.exception:
+        raise RuntimeError([e.value for e in at.exception])
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        at.run()
+        samples.append((time.perf_counter() - started) * 1000)
+    payload = sum(len(element.value.encode()) for element in at.markdown)
+    return len(at.markdown), payload, statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clips", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    # Streamlit warns about the missing script context outside the AppTest runs
+    logging.disable(logging.WARNING)
+
+    results = sample_results(args.clips)
+    started = time.perf_counter()
+    for skill, result in results:
+        assessment_result_html(normalize_assessment_result(skill, result))
+    build_us = (time.perf_counter() - started) / len(results) * 1e6
+
+    print(f"{args.clips} clips, median of {args.runs} runs")
+    print(f"  {'renderer':<16} {'elements':>9} {'bytes':>9} {'run ms':>9}")
+    for label, app, app_args in (
+        ("per criterion", per_criterion_app, (results,)),
+        ("single element", single_element_app, (results, REPO_ROOT)),
+    ):
+        elements, payload, run_ms = measure(app, app_args, args.runs)
+        print(f"  {label:<16} {elements:9d} {payload:9d} {run_ms:9.1f}")
+    print(f"building one clip's HTML: {build_us:.1f} us")
+
+if __name__ == "__main__":
+    main()
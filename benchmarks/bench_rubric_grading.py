@@ -0,0 +1,70 @@
+"""Measurements graded per second by the compiled rubric against a per-value Python loop.
+
+Grades growing arrays of random angles (with some missing values) for
+every criterion of the passing and receiving rubrics, once with
+`rubric.grade_values` (one `np.searchsorted` over the compiled band edges)
+and once with the per-value if/elif comparison it replaces, checks that
+both agree, and reports values graded per second:
+
+    python benchmarks/bench_rubric_grading.py [--values 1000,100000,1000000]
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import rubric
+
+def loop_grades(spec, values):
+    """The per-value comparison against the criterion's ranges."""
+    (ideal_low, ideal_high), (good_low, good_high) = spec["ideal"], spec["good"]
+    grades = []
+    for value in values:
+        if math.isnan(value):
+            grades.append(rubric.NOT_CLEAR_AR)
+        elif ideal_low <= value <= ideal_high:
+            grades.append(rubric.IDEAL)
+        elif good_low <= value <= good_high:
+            grades.append(rubric.GOOD)
+        else:
+            grades.append(rubric.UNACCEPTABLE)
+    return grades
+
+def timed(run, repeat):
+    best = math.inf
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--values", default="1000,100000,1000000", help="measurements per criterion to grade")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    criteria = [(skill, spec) for skill, table in rubric.RUBRICS.items() for spec in table["criteria"]]
+    print(f"  {'values':>9} {'criteria':>9} {'loop values/s':>14} {'searchsorted values/s':>22} {'speed-up':>9}")
+    for count in (int(value) for value in args.values.split(",")):
+        # Whole degrees land on the band edges, where an off-by-one would show
+        samples = [np.where(rng.random(count) < 0.05, np.nan, rng.integers(0, 200, count) + rng.choice([0.0, 0.5], count))
+                   for _ in criteria]
+        for (skill, spec), values in zip(criteria, samples):
+            assert list(rubric.grade_values(skill, spec["key"], values)) == loop_grades(spec, values.tolist()), spec["key"]
+        repeat = 5 if count <= 100_000 else 2
+        loop_seconds = timed(lambda: [loop_grades(spec, values.tolist()) for (_, spec), values in zip(criteria, samples)], repeat)
+        vector_seconds = timed(lambda: [rubric.grade_values(skill, spec["key"], values)
+                                        for (skill, spec), values in zip(criteria, samples)], repeat)
+        graded = count * len(criteria)
+        print(f"  {count:9d} {len(criteria):9d} {graded / loop_seconds:14.0f} {graded / vector_seconds:22.0f} "
+              f"{loop_seconds / vector_seconds:8.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Rubric biomechanics over whole keypoint sequences, as NumPy array operations.
+
+Every function takes a clip's keypoints as one (frames, joints, 2) array of
+x, y image coordinates in MediaPipe Pose order, or (frames, joints, 3) with
+the visibility as third value (joints below MIN_VISIBILITY count as
+missing). Missing joints are NaN and stay NaN through every metric, so no
+function loops over frames: a whole clip is a handful of vector operations.
+
+    positions = keypoint_positions(keypoints)
+    knees = knee_flexion(positions)                  # (frames, 2): left, right
+    frame, leg = detect_contact(positions, fps)
+    measurements = rubric_measurements(keypoints, fps, "تمرير")
+
+Angles are in degrees and distances in centimetres, scaled from the
+player's shin length in the image (SHIN_LENGTH_CM).
+"""
+import numpy as np
+
+# Keypoints below this MediaPipe visibility are treated as missing
+MIN_VISIBILITY = 0.5
+
+# MediaPipe Pose landmark indices
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_HIP, RIGHT_HIP = 23, 24
+LEFT_KNEE, RIGHT_KNEE = 25, 26
+LEFT_ANKLE, RIGHT_ANKLE = 27, 28
+LEFT_HEEL, RIGHT_HEEL = 29, 30
+LEFT_FOOT_INDEX, RIGHT_FOOT_INDEX = 31, 32
+# Per-leg joint indices, left leg first: legs are axis 1 of the per-leg metrics
+LEG_NAMES = ("left", "right")
+HIPS = [LEFT_HIP, RIGHT_HIP]
+KNEES = [LEFT_KNEE, RIGHT_KNEE]
+ANKLES = [LEFT_ANKLE, RIGHT_ANKLE]
+HEELS = [LEFT_HEEL, RIGHT_HEEL]
+TOES = [LEFT_FOOT_INDEX, RIGHT_FOOT_INDEX]
+
+# Typical adult shin (knee to ankle) length, the scale of image distances
+SHIN_LENGTH_CM = 43.0
+# Size 5 football
+BALL_RADIUS_CM = 11.0
+# Ankle speeds are smoothed over this many frames before the contact is looked for
+SPEED_SMOOTHING_FRAMES = 3
+# Measurements are the median over this window around the contact frame
+CONTACT_WINDOW_SECONDS = 0.05
+
+def keypoint_positions(keypoints):
+    """(frames, joints, 2) float array; joints with a low visibility become NaN."""
+    keypoints = np.asarray(keypoints, dtype=np.float64)
+    if keypoints.shape[-1] == 2:
+        return keypoints
+    positions = keypoints[..., :2].copy()
+    positions[~(keypoints[..., 2] >= MIN_VISIBILITY)] = np.nan
+    return positions
+
+def vector_angle(first, second):
+    """Angle in degrees between two arrays of 2D vectors (..., 2), from 0 to 180."""
+    cross = first[..., 0] * second[..., 1] - first[..., 1] * second[..., 0]
+    dot = first[..., 0] * second[..., 0] + first[..., 1] * second[..., 1]
+    angles = np.degrees(np.arctan2(np.abs(cross), dot))
+    # Zero-length vectors have no direction
+    angles[(cross == 0) & (dot == 0)] = np.nan
+    return angles
+
+def joint_angle(a, b, c):
+    """Angle at b between b->a and b->c for arrays of points (..., 2)."""
+    return vector_angle(a - b, c - b)
+
+def knee_flexion(positions):
+    """(frames, 2) hip-knee-ankle angle of the left and right leg; 180 is a straight leg."""
+    return joint_angle(positions[:, HIPS], positions[:, KNEES], positions[:, ANKLES])
+
+def trunk_inclination(positions):
+    """(frames,) angle between the mid-hip to mid-shoulder line and the vertical."""
+    shoulders = positions[:, [LEFT_SHOULDER, RIGHT_SHOULDER]].mean(axis=1)
+    hips = positions[:, HIPS].mean(axis=1)
+    # Image y grows downwards, so "up" is (0, -1)
+    return vector_angle(shoulders - hips, np.broadcast_to([0.0, -1.0], hips.shape))
+
+def feet_angle(positions):
+    """(frames,) angle between the two feet (heel to toe): the inside angle of a foot turned out to receive."""
+    feet = positions[:, TOES] - positions[:, HEELS]
+    return vector_angle(feet[:, 0], feet[:, 1])
+
+def cm_per_pixel(positions):
+    """Image scale from the median shin length over the clip; NaN if no shin was seen."""
+    shins = np.linalg.norm(positions[:, KNEES] - positions[:, ANKLES], axis=-1)
+    if not np.isfinite(shins).any():
+        return np.nan
+    return SHIN_LENGTH_CM / np.nanmedian(shins)
+
+def foot_ball_distance(positions, ball):
+    """(frames, 2) gap in cm between each foot (heel-toe midpoint) and the ball's edge.
+
+    `ball` is a (frames, 2) array of ball centres in image coordinates,
+    NaN where the ball was not found.
+    """
+    feet = (positions[:, HEELS] + positions[:, TOES]) / 2
+    centre_distance = np.linalg.norm(feet - np.asarray(ball, dtype=np.float64)[:, None, :], axis=-1)
+    return np.maximum(centre_distance * cm_per_pixel(positions) - BALL_RADIUS_CM, 0.0)
+
+def ankle_speeds(positions, fps):
+    """(frames, 2) speed of each ankle in pixels per second, smoothed; the first frame is NaN."""
+    ankles = positions[:, ANKLES]
+    speeds = np.full(ankles.shape[:2], np.nan)
+    speeds[1:] = np.linalg.norm(np.diff(ankles, axis=0), axis=-1) * fps
+    if SPEED_SMOOTHING_FRAMES > 1 and len(speeds) >= SPEED_SMOOTHING_FRAMES:
+        # Centred moving average along time; a missing frame leaves only its own windows NaN
+        windows = np.lib.stride_tricks.sliding_window_view(speeds, SPEED_SMOOTHING_FRAMES, axis=0)
+        smoothed = np.full_like(speeds, np.nan)
+        offset = SPEED_SMOOTHING_FRAMES // 2
+        smoothed[offset:offset + len(windows)] = windows.mean(axis=-1)
+        speeds = smoothed
+    return speeds
+
+def detect_contact(positions, fps, ball=None):
+    """(frame index, leg index) of the ball contact, or (None, None) if no foot was tracked.
+
+    With ball positions, the contact is the frame where a foot is closest to
+    the ball. Without, it is the peak of the smoothed ankle speed: the
+    striking foot moves fastest at impact, and the receiving foot as it
+    meets the ball.
+    """
+    if ball is not None:
+        distances = foot_ball_distance(positions, ball)
+        if np.isfinite(distances).any():
+            return tuple(int(i) for i in np.unravel_index(np.nanargmin(distances), distances.shape))
+    speeds = ankle_speeds(positions, fps)
+    if not np.isfinite(speeds).any():
+        return None, None
+    return tuple(int(i) for i in np.unravel_index(np.nanargmax(speeds), speeds.shape))
+
+def clip_metrics(keypoints, fps, ball=None):
+    """Every per-frame metric of a clip, plus the detected contact."""
+    positions = keypoint_positions(keypoints)
+    frame, leg = detect_contact(positions, fps, ball)
+    return {
+        "knee_flexion": knee_flexion(positions),
+        "trunk_inclination": trunk_inclination(positions),
+        "feet_angle": feet_angle(positions),
+        "foot_ball_distance": foot_ball_distance(positions, ball) if ball is not None else None,
+        "contact_frame": frame,
+        "active_leg": leg,
+    }
+
+def at_contact(series, frame, fps):
+    """Median of a per-frame series over the window around `frame`, or None if nothing was measured there."""
+    radius = max(1, round(CONTACT_WINDOW_SECONDS * fps))
+    window = series[max(0, frame - radius):frame + radius + 1]
+    if not np.isfinite(window).any():
+        return None
+    return float(np.nanmedian(window))
+
+def rubric_measurements(keypoints, fps, skill_type, ball=None):
+    """Rubric measurements of one skill (تمرير or استقبال) at the contact: {criterion: value or None}."""
+    metrics = clip_metrics(keypoints, fps, ball)
+    frame, leg = metrics["contact_frame"], metrics["active_leg"]
+    active_knee = "ركبة القدم الضاربة" if skill_type == "تمرير" else "ركبة القدم المستلمة"
+    if frame is None:
+        last = "المسافة للكرة" if skill_type == "تمرير" else "زاوية الداخل"
+        return {active_knee: None, "ركبة القدم المرتكزة": None, "انحناء الجذع": None, last: None}
+    support = 1 - leg
+    measurements = {
+        active_knee: at_contact(metrics["knee_flexion"][:, leg], frame, fps),
+        "ركبة القدم المرتكزة": at_contact(metrics["knee_flexion"][:, support], frame, fps),
+        "انحناء الجذع": at_contact(metrics["trunk_inclination"], frame, fps),
+    }
+    if skill_type == "تمرير":
+        distances = metrics["foot_ball_distance"]
+        measurements["المسافة للكرة"] = at_contact(distances[:, support], frame, fps) if distances is not None else None
+    else:
+        measurements["زاوية الداخل"] = at_contact(metrics["feet_angle"], frame, fps)
+    return measurements
@@ -0,0 +1,152 @@
+"""Local stand-in for the Gemini File and Batch REST endpoints.
+
+Implements just what batch_grading.py uses: multipart file upload, file
+get/delete, `models/*:batchGenerateContent` and batch polling. Batches finish
+`--delay` seconds after submission and every request is answered in the
+prompt's own response format with deterministic grades, so a run can be
+checked end to end without quota:
+
+    python devtools/fake_gemini_batch.py --port 8765 --delay 5
+    python batch_grading.py --base-url http://127.0.0.1:8765 submit clips/ --state s.json
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GRADES = ["مثالي", "جيد", "غير مقبول"]
+
+# "criterion: [مثالي/جيد/غير مقبول]" lines in the prompt's response format
+FORMAT_LINE = re.compile(r"^\s*(.+?):\s*\[مثالي/جيد/غير مقبول\]\s*$", re.MULTILINE)
+
+class FakeGemini:
+    def __init__(self, delay, error_every):
+        self.delay = delay
+        self.error_every = error_every
+        self.files = {}
+        self.batches = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def answer(self, request):
+        """A grading answer in the prompt's format, graded from a hash of the clip URI."""
+        parts = request["contents"][0]["parts"]
+        prompt = next(part["text"] for part in parts if "text" in part)
+        uri = next(part["file_data"]["file_uri"] for part in parts if "file_data" in part)
+        lines = []
+        for criterion in FORMAT_LINE.findall(prompt):
+            digest = hashlib.sha256(f"{uri}|{criterion}".encode()).digest()
+            lines.append(f"{criterion}: {GRADES[digest[0] % len(GRADES)]}")
+        return {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": "\n".join(lines)}]}, "finishReason": "STOP"}],
+            "usageMetadata": {"promptTokenCount": 258 + len(prompt) // 4, "candidatesTokenCount": 12 * len(lines), "totalTokenCount": 258 + len(prompt) // 4 + 12 * len(lines)},
+        }
+
+    def batch_resource(self, name):
+        batch = self.batches[name]
+        if time.monotonic() - batch["created"] < self.delay:
+            return {"name": name, "metadata": {"state": "BATCH_STATE_RUNNING"}, "done": False}
+        responses = []
+        for number, entry in enumerate(batch["requests"], 1):
+            if self.error_every and number % self.error_every == 0:
+                responses.append({"error": {"code": 500, "message": "stand-in injected error"}, "metadata": entry.get("metadata")})
+            else:
+                responses.append({"response": self.answer(entry["request"]), "metadata": entry.get("metadata")})
+        return {
+            "name": name,
+            "metadata": {"state": "BATCH_STATE_SUCCEEDED"},
+            "done": True,
+            "response": {"inlinedResponses": {"inlinedResponses": responses}},
+        }
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def read_body(self):
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def authorized(self):
+            if self.headers.get("x-goog-api-key"):
+                return True
+            self.send_json(401, {"error": {"code": 401, "message": "API key missing"}})
+            return False
+
+        def do_POST(self):
+            if not self.authorized():
+                return
+            body = self.read_body()
+            with fake.lock:
+                if self.path.startswith("/upload/v1beta/files"):
+                    file_id = f"files/fake{next(fake.ids)}"
+                    mime_type = re.findall(rb"Content-Type: (video/[\w.-]+)", body)
+                    fake.files[file_id] = {
+                        "name": file_id,
+                        "uri": f"http://{self.headers['Host']}/v1beta/{file_id}",
+                        "mimeType": mime_type[0].decode() if mime_type else "video/mp4",
+                        "sizeBytes": str(len(body)),
+                        "state": "PROCESSING",
+                    }
+                    self.send_json(200, {"file": fake.files[file_id]})
+                elif self.path.endswith(":batchGenerateContent"):
+                    batch = json.loads(body)["batch"]
+                    name = f"batches/fake{next(fake.ids)}"
+                    fake.batches[name] = {"created": time.monotonic(), "requests": batch["input_config"]["requests"]["requests"]}
+                    self.send_json(200, {"name": name, "metadata": {"state": "BATCH_STATE_PENDING"}})
+                else:
+                    self.send_json(404, {"error": {"code": 404, "message": self.path}})
+
+        def do_GET(self):
+            if not self.authorized():
+                return
+            name = self.path.removeprefix("/v1beta/")
+            with fake.lock:
+                if name in fake.files:
+                    # Files are "processed" by the time they are polled
+                    fake.files[name]["state"] = "ACTIVE"
+                    self.send_json(200, fake.files[name])
+                elif name in fake.batches:
+                    self.send_json(200, fake.batch_resource(name))
+                else:
+                    self.send_json(404, {"error": {"code": 404, "message": name}})
+
+        def do_DELETE(self):
+            if not self.authorized():
+                return
+            with fake.lock:
+                found = fake.files.pop(self.path.removeprefix("/v1beta/"), None)
+            self.send_json(200 if found else 404, {})
+
+    return Handler
+
+def serve(port=8765, delay=5.0, error_every=0):
+    """Start the stand-in in a background thread; returns the server (call shutdown() to stop)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(FakeGemini(delay, error_every)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=5.0, help="seconds before a batch succeeds")
+    parser.add_argument("--error-every", type=int, default=0, help="fail every Nth request in a batch (0 = never)")
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(FakeGemini(args.delay, args.error_every)))
+    print(f"Fake Gemini batch endpoint on http://127.0.0.1:{args.port}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
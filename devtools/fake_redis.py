@@ -0,0 +1,128 @@
+"""Local stand-in for a Redis server, for testing the redis:// cache backend.
+
+Speaks enough RESP for result_cache.RedisCache: PING, AUTH, SELECT, GET,
+SET (with EX/PX/NX), DEL, EXPIRE, TTL, DBSIZE and FLUSHDB. Data is kept in
+memory per database number.
+
+    python devtools/fake_redis.py --port 6390
+    RESULT_CACHE_URL=redis://127.0.0.1:6390/0 streamlit run new_app.py
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+class FakeRedis:
+    def __init__(self):
+        self.dbs = {}
+        self.lock = threading.Lock()
+
+    def _db(self, number):
+        return self.dbs.setdefault(number, {})
+
+    def _live(self, db, key):
+        entry = db.get(key)
+        if entry is not None and entry[1] is not None and entry[1] < time.monotonic():
+            del db[key]
+            return None
+        return entry
+
+    def execute(self, session, args):
+        command = args[0].decode().upper()
+        with self.lock:
+            db = self._db(session["db"])
+            if command == "PING":
+                return "+PONG"
+            if command == "AUTH":
+                return "+OK"
+            if command == "SELECT":
+                session["db"] = int(args[1])
+                return "+OK"
+            if command == "GET":
+                entry = self._live(db, args[1])
+                return entry[0] if entry else None
+            if command == "SET":
+                key, value, options = args[1], args[2], [arg.decode().upper() for arg in args[3:]]
+                expires_at = None
+                for index, option in enumerate(options):
+                    if option == "EX":
+                        expires_at = time.monotonic() + float(options[index + 1])
+                    elif option == "PX":
+                        expires_at = time.monotonic() + float(options[index + 1]) / 1000
+                if "NX" in options and self._live(db, key):
+                    return None
+                db[key] = (value, expires_at)
+                return "+OK"
+            if command == "DEL":
+                return sum(1 for key in args[1:] if self._live(db, key) and db.pop(key))
+            if command == "EXPIRE":
+                entry = self._live(db, args[1])
+                if not entry:
+                    return 0
+                db[args[1]] = (entry[0], time.monotonic() + float(args[2]))
+                return 1
+            if command == "TTL":
+                entry = self._live(db, args[1])
+                if not entry:
+                    return -2
+                return -1 if entry[1] is None else int(entry[1] - time.monotonic())
+            if command == "DBSIZE":
+                return len([key for key in list(db) if self._live(db, key)])
+            if command == "FLUSHDB":
+                db.clear()
+                return "+OK"
+        return f"-ERR unknown command '{command}'"
+
+def encode(reply):
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, str):
+        return (reply + "\r\n").encode()
+    return b"$%d\r\n%s\r\n" % (len(reply), reply)
+
+def make_handler(fake):
+    class Handler(socketserver.StreamRequestHandler):
+        def read_command(self):
+            line = self.rfile.readline()
+            if not line:
+                return None
+            if not line.startswith(b"*"):
+                return line.split()
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2])
+            return args
+
+        def handle(self):
+            session = {"db": 0}
+            while True:
+                args = self.read_command()
+                if args is None:
+                    return
+                if args:
+                    self.wfile.write(encode(fake.execute(session, args)))
+                    self.wfile.flush()
+
+    return Handler
+
+def serve(port=6390):
+    """Start the stand-in in a background thread; returns the server (call shutdown() to stop)."""
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", port), make_handler(FakeRedis()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", args.port), make_handler(FakeRedis()))
+    server.daemon_threads = True
+    print(f"Fake Redis on redis://127.0.0.1:{args.port}/0")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
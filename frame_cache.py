@@ -0,0 +1,294 @@
+"""Disk cache of decoded frames and pose keypoints, read back memory-mapped.
+
+A local analysis decodes and downsamples every frame of a clip and runs
+pose estimation on them. Re-analysing the same clip (another skill, a
+changed rubric, a second look) would repeat all of it. With FRAME_CACHE_DIR
+set, the sampled frames and the keypoints are kept per content hash and
+sampling variant as `.npy` files:
+
+    {FRAME_CACHE_DIR}/{content_hash}/{variant}/frames.npy           (frames, height, width, 3) uint8
+    {FRAME_CACHE_DIR}/{content_hash}/{variant}/keypoints_{name}.npy (frames, 33, 3) float64
+
+Later analyses open them with `np.load(mmap_mode="r")`: zero-copy, paged
+in by the OS as they are read. A SQLite index next to them keeps each
+entry's size and last use; when the cache grows past FRAME_CACHE_MAX_MB the
+least recently used entries are deleted.
+
+Entries are keyed by content hash, so renamed or re-uploaded copies of a
+clip share them. A path's hash is remembered with the file's size and
+modification time, and recomputed only when either changes: checking a
+clip that is already cached costs a `stat`, not a read of the whole file.
+
+Cache errors never fail an analysis: they are logged and behave like a miss.
+"""
+import contextlib
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from analysis_core import file_content_hash
+
+FRAME_CACHE_DIR = os.getenv("FRAME_CACHE_DIR")
+FRAME_CACHE_MAX_BYTES = int(float(os.getenv("FRAME_CACHE_MAX_MB") or 4096) * 1024 * 1024)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    content_hash TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    frame_count INTEGER,
+    fps REAL NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (content_hash, variant)
+);
+CREATE INDEX IF NOT EXISTS entries_by_last_used ON entries (last_used);
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL
+);
+"""
+
+def frame_variant(sample_fps, max_width):
+    """Name of a sampling of the frames, e.g. "30fps_640px"; entries of different samplings are separate."""
+    return f"{sample_fps or 'all'}fps_{max_width or 'full'}px".replace(".0fps", "fps")
+
+class FrameWriter:
+    """Frames appended one by one into a new entry's memory-mapped frames.npy; see FrameCache.frame_writer."""
+
+    def __init__(self, path, capacity, frame_shape):
+        self.path = path
+        self.count = 0
+        self._frames = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=(capacity,) + tuple(frame_shape))
+
+    def append(self, frame):
+        if self.count < len(self._frames):
+            self._frames[self.count] = frame
+            self.count += 1
+
+    def record(self, frames):
+        """Pass an iterable of frames through, appending each one."""
+        for frame in frames:
+            self.append(frame)
+            yield frame
+
+    def close(self):
+        if self._frames is not None:
+            self._frames.flush()
+            self._frames = None
+
+class FrameCache:
+    """Frames and keypoints per (content hash, variant) under `cache_dir`, capped at `max_bytes`."""
+
+    def __init__(self, cache_dir, max_bytes=FRAME_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.cache_dir, "index.db"), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def entry_dir(self, content_hash, variant):
+        return os.path.join(self.cache_dir, content_hash, variant)
+
+    def source_hash(self, video_path):
+        """Content hash of a clip on disk, re-read only if its size or modification time changed; None on errors."""
+        try:
+            stat = os.stat(video_path)
+            path = os.path.abspath(video_path)
+            row = self._connection().execute("SELECT * FROM sources WHERE path = ?", (path,)).fetchone()
+            if row and row["size"] == stat.st_size and row["mtime_ns"] == stat.st_mtime_ns:
+                return row["content_hash"]
+            content_hash = file_content_hash(video_path)
+            self._connection().execute(
+                "INSERT OR REPLACE INTO sources (path, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, content_hash),
+            )
+            return content_hash
+        except (OSError, sqlite3.Error) as e:
+            logging.warning(f"Could not hash {video_path} for the frame cache: {e}")
+            return None
+
+    def _entry(self, content_hash, variant):
+        row = self._connection().execute(
+            "SELECT * FROM entries WHERE content_hash = ? AND variant = ?", (content_hash, variant)).fetchone()
+        if row:
+            self._connection().execute(
+                "UPDATE entries SET last_used = ? WHERE content_hash = ? AND variant = ?",
+                (time.time(), content_hash, variant),
+            )
+        return row
+
+    def _load(self, content_hash, variant, filename):
+        """Memory-mapped array of an entry file; a missing or damaged file drops the whole entry."""
+        path = os.path.join(self.entry_dir(content_hash, variant), filename)
+        try:
+            return np.load(path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            logging.warning(f"Dropping frame cache entry {content_hash[:12]}/{variant}: {e}")
+            self.remove(content_hash, variant)
+            return None
+
+    def frames(self, content_hash, variant):
+        """(memory-mapped (frames, height, width, 3) array, fps) of a cached decode, or None."""
+        try:
+            entry = self._entry(content_hash, variant)
+            if not entry or entry["frame_count"] is None:
+                return None
+            frames = self._load(content_hash, variant, "frames.npy")
+            if frames is None or len(frames) < entry["frame_count"]:
+                return None
+            return frames[:entry["frame_count"]], entry["fps"]
+        except (OSError, sqlite3.Error) as e:
+            logging.warning(f"Frame cache read of {content_hash[:12]} failed: {e}")
+            return None
+
+    def keypoints(self, content_hash, variant, name):
+        """(memory-mapped keypoints array, fps) stored under `name` (the pose model), or None."""
+        try:
+            entry = self._entry(content_hash, variant)
+            if not entry or not os.path.exists(os.path.join(self.entry_dir(content_hash, variant), f"keypoints_{name}.npy")):
+                return None
+            keypoints = self._load(content_hash, variant, f"keypoints_{name}.npy")
+            return None if keypoints is None else (keypoints, entry["fps"])
+        except (OSError, sqlite3.Error) as e:
+            logging.warning(f"Frame cache read of {content_hash[:12]} failed: {e}")
+            return None
+
+    def _temporary_path(self, content_hash, variant, filename):
+        directory = self.entry_dir(content_hash, variant)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f".{uuid.uuid4().hex}.{filename}")
+
+    def _store(self, content_hash, variant, filename, temporary, fps, frame_count=None):
+        """Move a fully written temporary file into its entry, index it and evict down to the size cap."""
+        path = os.path.join(self.entry_dir(content_hash, variant), filename)
+        replaced = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(temporary, path)
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO entries (content_hash, variant, frame_count, fps, bytes, last_used) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (content_hash, variant) DO UPDATE SET "
+                "frame_count = COALESCE(excluded.frame_count, frame_count), bytes = bytes + excluded.bytes, "
+                "last_used = excluded.last_used",
+                (content_hash, variant, frame_count, fps, os.path.getsize(path) - replaced, time.time()),
+            )
+        self.evict()
+
+    @contextlib.contextmanager
+    def frame_writer(self, content_hash, variant, capacity, frame_shape, fps):
+        """Context manager yielding a FrameWriter, or None if the frames cannot be cached.
+
+        The frames are stored when the block exits normally, and discarded
+        if it raises, so a cancelled or failed decode leaves no entry.
+        """
+        if capacity * int(np.prod(frame_shape)) > self.max_bytes:
+            logging.info(f"Not caching {capacity} frames of {content_hash[:12]}: larger than the frame cache")
+            yield None
+            return
+        try:
+            temporary = self._temporary_path(content_hash, variant, "frames.npy")
+            writer = FrameWriter(temporary, capacity, frame_shape)
+        except OSError as e:
+            logging.warning(f"Frame cache write of {content_hash[:12]} failed: {e}")
+            yield None
+            return
+        try:
+            yield writer
+        except BaseException:
+            writer.close()
+            os.remove(temporary)
+            self._prune(content_hash, variant)
+            raise
+        writer.close()
+        try:
+            if writer.count:
+                self._store(content_hash, variant, "frames.npy", temporary, fps, frame_count=writer.count)
+        except (OSError, sqlite3.Error) as e:
+            logging.warning(f"Frame cache write of {content_hash[:12]} failed: {e}")
+        finally:
+            with contextlib.suppress(OSError):
+                os.remove(temporary)
+
+    def put_keypoints(self, content_hash, variant, name, keypoints, fps):
+        try:
+            temporary = self._temporary_path(content_hash, variant, f"keypoints_{name}.npy")
+            try:
+                np.save(temporary, keypoints)
+                self._store(content_hash, variant, f"keypoints_{name}.npy", temporary, fps)
+            finally:
+                with contextlib.suppress(OSError):
+                    os.remove(temporary)
+        except (OSError, sqlite3.Error) as e:
+            logging.warning(f"Frame cache write of {content_hash[:12]} failed: {e}")
+
+    def remove(self, content_hash, variant):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM entries WHERE content_hash = ? AND variant = ?", (content_hash, variant))
+        shutil.rmtree(self.entry_dir(content_hash, variant), ignore_errors=True)
+        self._prune(content_hash, variant)
+
+    def _prune(self, content_hash, variant):
+        """Remove the entry's directory, then the clip's, if they are empty."""
+        for directory in (self.entry_dir(content_hash, variant), os.path.join(self.cache_dir, content_hash)):
+            with contextlib.suppress(OSError):
+                os.rmdir(directory)
+
+    def total_bytes(self):
+        return self._connection().execute("SELECT COALESCE(SUM(bytes), 0) FROM entries").fetchone()[0]
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes; returns how many were deleted."""
+        excess = self.total_bytes() - self.max_bytes
+        if excess <= 0:
+            return 0
+        victims = []
+        for row in self._connection().execute("SELECT content_hash, variant, bytes FROM entries ORDER BY last_used"):
+            if excess <= 0:
+                break
+            victims.append((row["content_hash"], row["variant"]))
+            excess -= row["bytes"]
+        for content_hash, variant in victims:
+            logging.info(f"Evicting frame cache entry {content_hash[:12]}/{variant}")
+            self.remove(content_hash, variant)
+        return len(victims)
+
+_frame_cache = None
+_frame_cache_lock = threading.Lock()
+
+def get_frame_cache():
+    """Process-wide FrameCache when FRAME_CACHE_DIR is set, else None."""
+    global _frame_cache
+    if not FRAME_CACHE_DIR:
+        return None
+    with _frame_cache_lock:
+        if _frame_cache is None:
+            _frame_cache = FrameCache(FRAME_CACHE_DIR)
+        return _frame_cache
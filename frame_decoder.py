@@ -0,0 +1,253 @@
+"""Parallel video frame decoding: GOP-aligned segments decoded across CPU cores.
+
+A clip's video packets are indexed once without decoding (cheap, I/O only).
+Its keyframes split it into GOP-aligned segments, short GOPs merged to at
+least MIN_SEGMENT_FRAMES frames. Each segment can be decoded independently
+from its keyframe, so segments are decoded in a pool of DECODE_WORKERS
+processes straight into shared-memory frame buffers, and the frames are
+yielded in presentation order:
+
+    decoder = FrameDecoder("clip.mp4", sample_fps=30, max_width=640)
+    for index, frame in decoder:     # (height, width, 3) uint8 RGB
+        ...
+    decoder.sampled_fps              # rate of the yielded frames
+
+Frames are downscaled (and turned upright for rotated phone footage) in
+the workers. Skipped frames still have to be decoded, but are not
+converted. With one worker or a single segment, frames are decoded in
+this process with the same code.
+
+Needs `pip install av` (PyAV, with its bundled FFmpeg), imported on first use.
+"""
+import bisect
+import collections
+import concurrent.futures
+import concurrent.futures.process
+import math
+import multiprocessing
+import os
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+DECODE_WORKERS = int(os.getenv("DECODE_WORKERS") or 0) or os.cpu_count() or 1
+# Shorter segments cost more in seeks and task overhead than they win in parallelism
+MIN_SEGMENT_FRAMES = 48
+# Segments per worker, so a slow segment does not leave the other cores idle at the end
+SEGMENTS_PER_WORKER = 4
+# Segments decoded ahead of the consumer, per worker: bounds the shared memory in use
+PREFETCH_SEGMENTS = 2
+
+def _av():
+    try:
+        import av
+    except ImportError:
+        raise RuntimeError("Frame decoding needs PyAV: pip install av")
+    return av
+
+def decode_errors():
+    """Exception types PyAV raises for unreadable or corrupt video (none if PyAV is missing)."""
+    try:
+        import av
+    except ImportError:
+        return ()
+    return (av.error.FFmpegError,)
+
+_decode_pool = None
+_decode_pool_lock = threading.Lock()
+
+def get_decode_pool(workers=DECODE_WORKERS):
+    """Process pool shared by every decode, started on first use.
+
+    Spawned rather than forked: the app and the workers run threads that a fork would copy mid-flight.
+    """
+    global _decode_pool
+    with _decode_pool_lock:
+        if _decode_pool is None or _decode_pool._max_workers < workers:
+            if _decode_pool is not None:
+                _decode_pool.shutdown(wait=False)
+            _decode_pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _decode_pool
+
+def _reset_decode_pool():
+    global _decode_pool
+    with _decode_pool_lock:
+        if _decode_pool is not None:
+            _decode_pool.shutdown(wait=False, cancel_futures=True)
+        _decode_pool = None
+
+def _open_stream(container):
+    stream = container.streams.video[0]
+    # One decoding thread per process: the parallelism comes from the segments
+    stream.thread_type = "NONE"
+    stream.codec_context.thread_count = 1
+    return stream
+
+def decode_segment_frames(container, stream, start_pts, end_pts, first_index, step, size, rotation):
+    """Yield the sampled (index, RGB frame) of one segment: frames with start_pts <= pts < end_pts.
+
+    `size` is the (width, height) to scale to before rotating by `rotation` degrees counterclockwise.
+    """
+    if start_pts is not None:
+        container.seek(start_pts, stream=stream, backward=True, any_frame=False)
+    index = first_index
+    for frame in container.decode(stream):
+        if frame.pts is not None:
+            if start_pts is not None and frame.pts < start_pts:
+                continue
+            if end_pts is not None and frame.pts >= end_pts:
+                return
+        if index % step == 0:
+            image = frame.to_ndarray(format="rgb24", width=size[0], height=size[1], interpolation="AREA")
+            yield index, np.rot90(image, rotation // 90) if rotation else image
+        index += 1
+
+def _decode_segment(video_path, segment, step, size, rotation, shm_name, shape):
+    """Worker: decode one segment into the shared-memory buffer; returns the frames written."""
+    av = _av()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        buffer = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        written = 0
+        with av.open(video_path) as container:
+            stream = _open_stream(container)
+            for _, image in decode_segment_frames(container, stream, *segment, step, size, rotation):
+                if written == shape[0]:
+                    break
+                buffer[written] = image
+                written += 1
+        del buffer
+        return written
+    finally:
+        shm.close()
+
+def _rotation(container, stream):
+    """Display rotation of the stream in degrees counterclockwise (0, 90, 180 or 270), from its first frame."""
+    for frame in container.decode(stream):
+        return round(getattr(frame, "rotation", 0) or 0) % 360
+    return 0
+
+class FrameDecoder:
+    """Sampled, downscaled RGB frames of one clip, decoded in parallel and yielded in order."""
+
+    def __init__(self, video_path, sample_fps=None, max_width=None, workers=DECODE_WORKERS):
+        av = _av()
+        self.video_path = video_path
+        self.workers = max(1, workers)
+        try:
+            container = av.open(video_path)
+        except av.error.FFmpegError as e:
+            raise ValueError(f"Cannot open video {video_path}: {e}")
+        with container:
+            if not container.streams.video:
+                raise ValueError(f"No video stream in {video_path}")
+            stream = container.streams.video[0]
+            self.fps = float(stream.average_rate or stream.guessed_rate or 30)
+            # Presentation timestamps of every packet, and the keyframes among them, without decoding
+            pts, keyframe_pts = [], []
+            for packet in container.demux(stream):
+                if packet.size == 0 or packet.pts is None:
+                    continue
+                pts.append(packet.pts)
+                if packet.is_keyframe:
+                    keyframe_pts.append(packet.pts)
+            self.rotation = 0
+            if pts:
+                container.seek(0, stream=stream)
+                self.rotation = _rotation(container, stream)
+            source_width, source_height = stream.codec_context.width, stream.codec_context.height
+        pts.sort()
+        self.frame_count = len(pts)
+        self.step = max(1, round(self.fps / sample_fps)) if sample_fps else 1
+        self.sampled_fps = self.fps / self.step
+        width, height = source_width, source_height
+        if max_width:
+            # The width limit applies to the upright frame
+            upright_width = height if self.rotation in (90, 270) else width
+            if upright_width > max_width:
+                scale = max_width / upright_width
+                width, height = round(width * scale / 2) * 2, round(height * scale / 2) * 2
+        self.size = (width, height)
+        self.frame_shape = (width, height, 3) if self.rotation in (90, 270) else (height, width, 3)
+        self.segments = self._segments(pts, sorted(set(keyframe_pts)))
+
+    def _segments(self, pts, keyframe_pts):
+        """[(start pts, end pts, first frame index, sampled frames)] covering the clip in order."""
+        if not pts:
+            return []
+        # The first segment starts at the first frame even if the clip does not open on a keyframe
+        starts = [None] + [k for k in keyframe_pts if k > pts[0]]
+        target = max(MIN_SEGMENT_FRAMES, math.ceil(len(pts) / (self.workers * SEGMENTS_PER_WORKER)))
+        merged = []
+        for start in starts:
+            index = 0 if start is None else bisect.bisect_left(pts, start)
+            if merged and index - merged[-1][1] < target:
+                continue
+            merged.append((start, index))
+        segments = []
+        for (start, index), following in zip(merged, merged[1:] + [(None, len(pts))]):
+            end = following[0]
+            frames = following[1] - index
+            # Frame indices index, index + 1, ... that fall on the sampling step
+            sampled = len(range(-index % self.step, frames, self.step))
+            segments.append((start, end, index, sampled))
+        return segments
+
+    def __len__(self):
+        return sum(segment[3] for segment in self.segments)
+
+    def __iter__(self):
+        if self.workers == 1 or len(self.segments) <= 1:
+            return self._decode_serial()
+        return self._decode_parallel()
+
+    def _decode_serial(self):
+        av = _av()
+        with av.open(self.video_path) as container:
+            stream = _open_stream(container)
+            yield from decode_segment_frames(container, stream, None, None, 0, self.step, self.size, self.rotation)
+
+    def _decode_parallel(self):
+        pool = get_decode_pool(self.workers)
+        pending = collections.deque()
+        queued = iter(self.segments)
+
+        def submit():
+            segment = next(queued, None)
+            if segment is None:
+                return
+            start, end, index, sampled = segment
+            # One spare frame in case the container's packet count was short
+            shape = (sampled + 1,) + self.frame_shape
+            shm = shared_memory.SharedMemory(create=True, size=max(1, math.prod(shape)))
+            future = pool.submit(_decode_segment, self.video_path, (start, end, index), self.step, self.size,
+                                 self.rotation, shm.name, shape)
+            pending.append((future, shm, shape, index))
+
+        try:
+            for _ in range(self.workers * PREFETCH_SEGMENTS):
+                submit()
+            while pending:
+                future, shm, shape, first_index = pending.popleft()
+                try:
+                    written = future.result()
+                    # One copy out of shared memory, so it can be released now and the frames outlive it
+                    frames = np.array(np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)[:written])
+                except concurrent.futures.process.BrokenProcessPool:
+                    _reset_decode_pool()
+                    raise RuntimeError("A frame decoding worker died")
+                finally:
+                    shm.close()
+                    shm.unlink()
+                submit()
+                first = first_index + (-first_index % self.step)
+                for offset, frame in enumerate(frames):
+                    yield first + offset * self.step, frame
+        finally:
+            # The consumer stopped early or failed: drop the segments still queued
+            for future, shm, _, _ in pending:
+                future.cancel()
+                shm.close()
+                shm.unlink()
@@ -0,0 +1,212 @@
+"""Grade a folder or manifest of football clips from the command line.
+
+Runs the same upload / detection / analysis pipeline as the Streamlit app
+(see analysis_core.py) over many clips concurrently and writes one JSONL
+record per clip with grades, stage timings and token usage. The output
+file doubles as the checkpoint: re-running the same command skips clips
+that already have a successful record, so an interrupted run resumes
+where it stopped.
+
+Examples:
+    python grade_clips.py clips/ --skill تمرير --out results.jsonl
+    python grade_clips.py manifest.jsonl --out results.jsonl --concurrency 8 --rpm 60
+
+A manifest is a .jsonl file with one {"path": ..., "skill": ..., "clip_id": ...,
+"player": ...} object per line, or a .csv file with the same columns. Only
+"path" is required; relative paths are resolved against the manifest's folder.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+# Before the project imports: they read their settings from the environment
+load_dotenv()
+
+from analysis_core import (
+    ASSESSMENT_OPTIONS,
+    DEFAULT_GEMINI_MODEL,
+    LOCAL_POSE_MODEL,
+    AnalysisBudget,
+    resolve_api_key,
+    configure_gemini,
+    run_analysis_pipeline,
+    run_coalesced,
+    file_content_hash,
+)
+
+VIDEO_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv", ".webm"}
+
+# Accept the English skill names too (Passing -> تمرير, ...)
+SKILL_ALIASES = {english.lower(): arabic for arabic, english in ASSESSMENT_OPTIONS.items()}
+
+def normalize_skill(skill):
+    if skill in ASSESSMENT_OPTIONS:
+        return skill
+    arabic = SKILL_ALIASES.get(str(skill).strip().lower())
+    if not arabic:
+        raise ValueError(f"Unknown skill '{skill}', expected one of {list(ASSESSMENT_OPTIONS)} or {list(SKILL_ALIASES)}")
+    return arabic
+
+def load_clips(source, default_skill):
+    """List clips as dicts with clip_id, path, skill and player from a folder or manifest."""
+    clips = []
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS:
+                    path = os.path.join(root, name)
+                    clips.append({"clip_id": os.path.relpath(path, source), "path": path})
+    else:
+        base = os.path.dirname(os.path.abspath(source))
+        with open(source, encoding="utf-8", newline="") as f:
+            if source.endswith(".csv"):
+                rows = list(csv.DictReader(f))
+            else:
+                rows = [json.loads(line) for line in f if line.strip()]
+        for row in rows:
+            path = row["path"] if os.path.isabs(row["path"]) else os.path.join(base, row["path"])
+            clips.append({
+                "clip_id": row.get("clip_id") or row["path"],
+                "path": path,
+                "skill": row.get("skill") or None,
+                "player": row.get("player") or None,
+            })
+
+    for clip in clips:
+        clip["skill"] = normalize_skill(clip.get("skill") or default_skill)
+        clip.setdefault("player", None)
+    return clips
+
+def load_checkpoint(out_path, retry_failed):
+    """clip_ids already recorded in the output file (only successful ones with retry_failed)."""
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a truncated last line behind
+                continue
+            if record.get("status") == "ok" or not retry_failed:
+                done.add(record["clip_id"])
+    return done
+
+class RecordWriter:
+    """Appends JSONL records, flushed to disk one by one so a crash loses at most one clip."""
+
+    def __init__(self, path):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+def grade_clip(clip, model_name, deadline_seconds):
+    """Run the analysis pipeline for one clip and build its output record."""
+    started = time.monotonic()
+    record = {
+        "clip_id": clip["clip_id"],
+        "path": clip["path"],
+        "player": clip["player"],
+        "selected_skill": clip["skill"],
+        "model": model_name,
+    }
+    budget = AnalysisBudget(total_seconds=deadline_seconds)
+    progress = lambda level, message: logging.log(
+        logging.WARNING if level in ("warning", "error") else logging.DEBUG,
+        f"[{clip['clip_id']}] {message}"
+    )
+    try:
+        content_hash = file_content_hash(clip["path"])
+        record["content_hash"] = content_hash
+        # Duplicate files in one intake are analysed once
+        outcome, shared = run_coalesced(
+            (content_hash, clip["skill"], model_name),
+            lambda: run_analysis_pipeline(clip["path"], os.path.basename(clip["path"]), clip["skill"], model_name, progress, budget),
+            budget,
+        )
+        record.update({
+            "status": "ok" if outcome["result"] else "failed",
+            "error": outcome["error"],
+            "detected_skill": outcome["detected_skill"],
+            "skill_analyzed": outcome["skill_analyzed"],
+            "degradation_tier": outcome["degradation_tier"],
+            "grades": outcome["result"],
+            "shared_result": shared,
+            "timings": outcome["timings"],
+            # Tokens are billed once, to the clip that ran the pipeline
+            "usage": None if shared else outcome["usage"],
+        })
+        if not outcome["result"] and not outcome["error"]:
+            record["error"] = "unsupported_skill"
+    except Exception as e:
+        logging.error(f"[{clip['clip_id']}] failed: {e}", exc_info=True)
+        record.update({"status": "failed", "error": f"{type(e).__name__}: {e}", "grades": None})
+    record["elapsed_seconds"] = round(time.monotonic() - started, 3)
+    record["finished_at"] = datetime.now(timezone.utc).isoformat()
+    return record
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grade football clips with Gemini and write one JSONL record per clip.")
+    parser.add_argument("source", help="folder of clips, or a .jsonl/.csv manifest")
+    parser.add_argument("--out", required=True, help="output JSONL file; also the resume checkpoint")
+    parser.add_argument("--skill", default="تمرير", help="skill for clips without one (تمرير/استقبال/كلاهما or Passing/Receiving/Both)")
+    parser.add_argument("--model", default=DEFAULT_GEMINI_MODEL, help=f"Gemini model name, or {LOCAL_POSE_MODEL} to grade on this machine")
+    parser.add_argument("--concurrency", type=int, default=4, help="clips processed in parallel")
+    parser.add_argument("--rpm", type=float, default=None, help="max Gemini requests per minute for the API key")
+    parser.add_argument("--deadline", type=float, default=600, help="end-to-end seconds allowed per clip")
+    parser.add_argument("--retry-failed", action="store_true", help="re-run clips whose previous record failed")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.model != LOCAL_POSE_MODEL:
+        api_key, _ = resolve_api_key()
+        if not api_key:
+            print("No Gemini API key found: set GEMINI_API_KEY (or GOOGLE_API_KEY) or add it to .env", file=sys.stderr)
+            return 2
+        configure_gemini(api_key, requests_per_minute=args.rpm)
+
+    clips = load_clips(args.source, args.skill)
+    done = load_checkpoint(args.out, args.retry_failed)
+    pending = [clip for clip in clips if clip["clip_id"] not in done]
+    logging.info(f"{len(clips)} clips, {len(clips) - len(pending)} already in {args.out}, {len(pending)} to grade")
+
+    writer = RecordWriter(args.out)
+    counts = {"ok": 0, "failed": 0}
+    tokens = 0
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = {pool.submit(grade_clip, clip, args.model, args.deadline): clip for clip in pending}
+            for number, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                writer.write(record)
+                counts[record["status"]] += 1
+                tokens += (record.get("usage") or {}).get("total_tokens", 0)
+                logging.info(f"[{number}/{len(pending)}] {record['clip_id']}: {record['status']} in {record['elapsed_seconds']:.1f}s")
+    finally:
+        writer.close()
+
+    logging.info(f"Done: {counts['ok']} ok, {counts['failed']} failed, {tokens} tokens")
+    return 0 if counts["failed"] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,379 @@
+"""HTTP job API for submitting clips without the Streamlit UI.
+
+A small stdlib HTTP service for programmatic clients (e.g. the club portal)
+that runs the same analysis pipeline as new_app.py: the same memory
+admission, overload tiers and request coalescing from analysis_core.
+
+    POST   /jobs?skill=تمرير&model=models/gemini-2.5-flash&filename=clip.mp4
+           body: the raw clip, with Content-Length or Transfer-Encoding: chunked
+           -> 202 {"job_id": ..., "status": "queued", "status_url": ..., "result_url": ...}
+    GET    /jobs/<job_id>          -> job status
+    GET    /jobs/<job_id>/result   -> grades per criterion (409 while the job runs)
+    DELETE /jobs/<job_id>          -> cancel a queued or running job
+    GET    /health                 -> load snapshot
+
+The upload is streamed to a temp file, never held in memory. Results use the
+structure result_view.normalize_assessment_result accepts: {criterion: grade}, or
+{"التمرير": {...}, "الاستلام": {...}} for كلاهما.
+
+    python job_api.py --port 8080 --workers 8
+
+Set JOB_API_TOKEN to require `Authorization: Bearer <token>` on every request.
+"""
+import argparse
+import json
+import hashlib
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from dotenv import load_dotenv
+
+# Before the project imports: they read their settings from the environment
+load_dotenv()
+
+from analysis_core import (
+    ANALYSIS_MODELS,
+    DEFAULT_GEMINI_MODEL,
+    ANALYSIS_DEADLINE_SECONDS,
+    AnalysisBudget,
+    AnalysisCancelled,
+    resolve_api_key,
+    configure_gemini,
+    run_analysis_pipeline,
+    run_coalesced,
+    get_admission_controller,
+    get_overload_controller,
+    get_analysis_flights,
+)
+from grade_clips import normalize_skill
+
+JOB_API_WORKERS = int(os.getenv("JOB_API_WORKERS", "8"))
+# Same default as Streamlit's server.maxUploadSize
+JOB_API_MAX_UPLOAD_MB = float(os.getenv("JOB_API_MAX_UPLOAD_MB", "200"))
+# Finished jobs are forgotten after this long
+JOB_RESULT_TTL_SECONDS = float(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+class RequestError(Exception):
+    """A client error, answered with `status` and a JSON error body."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class JobStore:
+    """In-memory job table plus the worker pool that runs the analyses."""
+
+    def __init__(self, workers=JOB_API_WORKERS):
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+
+    def submit(self, path, size, content_hash, filename, skill, model_name):
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "filename": filename,
+            "size_bytes": size,
+            "content_hash": content_hash,
+            "skill": skill,
+            "model": model_name,
+            "queue_position": None,
+            "error": None,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "outcome": None,
+            "shared_result": False,
+            "_path": path,
+            "_budget": AnalysisBudget(total_seconds=ANALYSIS_DEADLINE_SECONDS),
+            "_finished": None,
+        }
+        with self._lock:
+            self._evict_expired()
+            self._jobs[job["job_id"]] = job
+        self._pool.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise RequestError(404, f"Unknown job {job_id}")
+        return job
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        job["_budget"].cancel()
+        return job
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        expired = [job_id for job_id, job in self._jobs.items() if job["_finished"] and now - job["_finished"] > JOB_RESULT_TTL_SECONDS]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _run(self, job):
+        budget = job["_budget"]
+        tag = job["job_id"][:8]
+        progress = lambda level, message: logging.log(
+            logging.WARNING if level in ("warning", "error") else logging.DEBUG,
+            f"[job {tag}] {message}"
+        )
+
+        def show_queue_position(position, estimated_seconds):
+            job["queue_position"] = position + 1
+
+        def run_pipeline():
+            with get_admission_controller().admit(job["size_bytes"], budget, on_wait=show_queue_position):
+                job["status"] = "running"
+                job["queue_position"] = None
+                job["started_at"] = datetime.now(timezone.utc).isoformat()
+                return run_analysis_pipeline(
+                    job["_path"],
+                    job["filename"],
+                    job["skill"],
+                    job["model"],
+                    progress,
+                    budget,
+                    tier=get_overload_controller().current_tier()
+                )
+
+        try:
+            # Waiting for a worker thread only counts against cancellation: the deadline starts now
+            if budget.cancelled:
+                raise AnalysisCancelled("تم إلغاء التحليل.")
+            budget.restart()
+            outcome, shared = run_coalesced(
+                (job["content_hash"], job["skill"], job["model"]),
+                run_pipeline,
+                budget,
+                on_wait=lambda: job.update(status="running", started_at=datetime.now(timezone.utc).isoformat()),
+            )
+            job["outcome"] = outcome
+            job["shared_result"] = shared
+            if outcome["result"]:
+                job["status"] = "done"
+            else:
+                job["status"] = "failed"
+                job["error"] = outcome["error"] or "unsupported_skill"
+        except AnalysisCancelled:
+            job["status"] = "cancelled"
+        except Exception as e:
+            logging.error(f"[job {tag}] failed: {e}", exc_info=True)
+            job["status"] = "failed"
+            job["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            job["finished_at"] = datetime.now(timezone.utc).isoformat()
+            job["_finished"] = time.monotonic()
+            try:
+                os.remove(job["_path"])
+            except OSError as e:
+                logging.warning(f"Could not delete local temp file: {e}")
+
+def job_status(job):
+    """Public view of a job (internal fields start with an underscore)."""
+    status = {key: value for key, value in job.items() if not key.startswith("_") and key != "outcome"}
+    status["status_url"] = f"/jobs/{job['job_id']}"
+    status["result_url"] = f"/jobs/{job['job_id']}/result"
+    return status
+
+def job_result(job):
+    """Grades of a finished job in the structure `display_assessment_result` renders."""
+    outcome = job["outcome"] or {}
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "error": job["error"],
+        "selected_skill": job["skill"],
+        "detected_skill": outcome.get("detected_skill"),
+        "skill_analyzed": outcome.get("skill_analyzed"),
+        "degradation_tier": outcome.get("degradation_tier"),
+        "model": outcome.get("model_name", job["model"]),
+        "result": outcome.get("result"),
+        "shared_result": job["shared_result"],
+        "timings": outcome.get("timings"),
+        # Tokens are billed once, to the job that ran the pipeline
+        "usage": None if job["shared_result"] else outcome.get("usage"),
+    }
+
+def make_handler(store, token=None):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            logging.debug(f"{self.address_string()} {format % args}")
+
+        def send_json(self, status, body, close=False):
+            data = json.dumps(body, ensure_ascii=False).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            self.send_header("Content-Length", str(len(data)))
+            if close:
+                # The body of a rejected upload may be unread, so do not reuse the connection
+                self.send_header("Connection", "close")
+            self.end_headers()
+            self.wfile.write(data)
+
+        def handle_errors(self, handler):
+            try:
+                if token and self.headers.get("Authorization") != f"Bearer {token}":
+                    raise RequestError(401, "Missing or invalid bearer token")
+                handler()
+            except RequestError as e:
+                self.send_json(e.status, {"error": str(e)}, close=self.command == "POST")
+            except Exception as e:
+                logging.error(f"Job API error: {e}", exc_info=True)
+                self.send_json(500, {"error": "Internal server error"}, close=True)
+
+        def route(self):
+            parts = [part for part in urlsplit(self.path).path.split("/") if part]
+            return parts, parse_qs(urlsplit(self.path).query)
+
+        def do_POST(self):
+            self.handle_errors(self.create_job)
+
+        def do_GET(self):
+            self.handle_errors(self.read_job)
+
+        def do_DELETE(self):
+            self.handle_errors(self.cancel_job)
+
+        def create_job(self):
+            parts, query = self.route()
+            if parts != ["jobs"]:
+                raise RequestError(404, "Not found")
+            try:
+                skill = normalize_skill(query.get("skill", ["تمرير"])[0])
+            except ValueError as e:
+                raise RequestError(400, str(e))
+            model_name = query.get("model", [DEFAULT_GEMINI_MODEL])[0]
+            if model_name not in ANALYSIS_MODELS:
+                raise RequestError(400, f"Unknown model '{model_name}'")
+            filename = os.path.basename(query.get("filename", ["clip.mp4"])[0])
+
+            path, size, content_hash = self.receive_upload(os.path.splitext(filename)[1] or ".mp4")
+            job = store.submit(path, size, content_hash, filename, skill, model_name)
+            logging.info(f"[job {job['job_id'][:8]}] queued {filename} ({size / (1024 * 1024):.1f} MB, {skill}, {model_name})")
+            self.send_json(202, job_status(job))
+
+        def read_body_chunks(self):
+            """Yield the request body, decoding Transfer-Encoding: chunked."""
+            if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+                while True:
+                    size_line = self.rfile.readline(1024)
+                    try:
+                        chunk_size = int(size_line.split(b";")[0].strip(), 16)
+                    except ValueError:
+                        raise RequestError(400, "Malformed chunked body")
+                    if chunk_size == 0:
+                        # Skip trailers up to the terminating blank line
+                        while self.rfile.readline(1024) not in (b"\r\n", b"\n", b""):
+                            pass
+                        return
+                    while chunk_size:
+                        data = self.rfile.read(min(chunk_size, UPLOAD_CHUNK_SIZE))
+                        if not data:
+                            raise RequestError(400, "Upload ended early")
+                        chunk_size -= len(data)
+                        yield data
+                    self.rfile.readline(1024)
+            else:
+                remaining = int(self.headers.get("Content-Length") or 0)
+                while remaining:
+                    data = self.rfile.read(min(remaining, UPLOAD_CHUNK_SIZE))
+                    if not data:
+                        raise RequestError(400, "Upload ended early")
+                    remaining -= len(data)
+                    yield data
+
+        def receive_upload(self, suffix):
+            """Stream the body to a temp file, hashing as it arrives; returns (path, size, hash)."""
+            limit = JOB_API_MAX_UPLOAD_MB * 1024 * 1024
+            digest = hashlib.sha256()
+            size = 0
+            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
+                try:
+                    for data in self.read_body_chunks():
+                        size += len(data)
+                        if size > limit:
+                            raise RequestError(413, f"Clip larger than {JOB_API_MAX_UPLOAD_MB:.0f} MB")
+                        digest.update(data)
+                        tmp_file.write(data)
+                    if not size:
+                        raise RequestError(400, "Empty upload")
+                except BaseException:
+                    tmp_file.close()
+                    os.remove(tmp_file.name)
+                    raise
+            return tmp_file.name, size, digest.hexdigest()
+
+        def read_job(self):
+            parts, _ = self.route()
+            if parts == ["health"]:
+                flights = get_analysis_flights()
+                self.send_json(200, {
+                    "admission": get_admission_controller().snapshot(),
+                    "tier": get_overload_controller().last_tier()["name"],
+                    "coalescing": dict(flights["stats"]),
+                })
+            elif len(parts) == 2 and parts[0] == "jobs":
+                self.send_json(200, job_status(store.get(parts[1])))
+            elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "result":
+                job = store.get(parts[1])
+                if job["status"] in ("queued", "running"):
+                    raise RequestError(409, f"Job is {job['status']}")
+                self.send_json(200, job_result(job))
+            else:
+                raise RequestError(404, "Not found")
+
+        def cancel_job(self):
+            parts, _ = self.route()
+            if len(parts) != 2 or parts[0] != "jobs":
+                raise RequestError(404, "Not found")
+            self.send_json(202, job_status(store.cancel(parts[1])))
+
+    return Handler
+
+def serve(host="127.0.0.1", port=8080, workers=JOB_API_WORKERS, token=None):
+    """Create the job API server; call serve_forever() on it (or shutdown() to stop)."""
+    server = ThreadingHTTPServer((host, port), make_handler(JobStore(workers), token))
+    server.daemon_threads = True
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP job API for football clip analysis.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=JOB_API_WORKERS, help="analyses run in parallel (memory admission still applies)")
+    parser.add_argument("--rpm", type=float, default=None, help="max Gemini requests per minute for the API key")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    api_key, _ = resolve_api_key()
+    if not api_key:
+        print("No Gemini API key found: set GEMINI_API_KEY (or GOOGLE_API_KEY) or add it to .env", file=sys.stderr)
+        return 2
+    configure_gemini(api_key, requests_per_minute=args.rpm)
+
+    server = serve(args.host, args.port, args.workers, os.getenv("JOB_API_TOKEN") or None)
+    logging.info(f"Job API listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+"""Durable shared job queue and result store for multi-process analysis.
+
+Front ends (Streamlit, job API, scripts) enqueue clips; queue_worker.py
+processes lease jobs, run the analysis pipeline and store the outcome.
+Everything lives in one SQLite database plus a spool directory holding the
+clips, so front ends and workers scale independently as long as they share
+both paths.
+
+Processing is at-least-once: a worker holds a time-limited lease that it
+renews while the analysis runs, and a job whose lease expires (worker
+crashed or lost) goes back to the queue. Result writes are idempotent on the
+job ID: the first stored result wins and a late duplicate is ignored.
+
+SQLite's WAL mode (the default here) needs all processes on one host. For
+workers on several machines, set JOB_QUEUE_JOURNAL_MODE=DELETE and keep the
+database on a filesystem with working POSIX locks.
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import sqlite3
+import threading
+import contextlib
+
+from analysis_core import AnalysisCancelled
+
+ANALYSIS_QUEUE_DB = os.getenv("ANALYSIS_QUEUE_DB")
+ANALYSIS_SPOOL_DIR = os.getenv("ANALYSIS_SPOOL_DIR")
+JOB_QUEUE_JOURNAL_MODE = os.getenv("JOB_QUEUE_JOURNAL_MODE", "WAL")
+
+# A worker renews its lease every LEASE_SECONDS / 3
+LEASE_SECONDS = 60
+# Leases granted per job before it is marked failed
+MAX_ATTEMPTS = 3
+QUEUE_POLL_INTERVAL = 2.0
+
+# Statuses a job never leaves
+TERMINAL_STATUSES = ("done", "failed", "cancelled")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    clip_path TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    content_hash TEXT,
+    skill TEXT NOT NULL,
+    model TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS results (
+    job_id TEXT PRIMARY KEY,
+    worker_id TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    shared INTEGER NOT NULL DEFAULT 0,
+    written_at REAL NOT NULL
+);
+"""
+
+class JobQueue:
+    """SQLite-backed job queue with leases, plus the result store.
+
+    Timestamps are wall-clock (time.time()) because leases are compared
+    across processes and machines; keep their clocks in sync.
+    """
+
+    def __init__(self, db_path, spool_dir=None):
+        self.db_path = db_path
+        self.spool_dir = spool_dir or ANALYSIS_SPOOL_DIR or os.path.join(os.path.dirname(os.path.abspath(db_path)), "spool")
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        """One connection per thread, in autocommit mode with explicit transactions."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA journal_mode={JOB_QUEUE_JOURNAL_MODE}")
+            conn.execute("PRAGMA synchronous=NORMAL" if JOB_QUEUE_JOURNAL_MODE.upper() == "WAL" else "PRAGMA synchronous=FULL")
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Write transaction that takes the database lock up front (no upgrade deadlocks)."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # --- Front end side ---
+    def enqueue(self, clip, filename, skill, model_name, content_hash=None, job_id=None):
+        """Copy `clip` (a path, bytes or BytesIO-like upload) to the spool and queue it.
+
+        Enqueueing the same `job_id` twice keeps the first job. Returns the job ID.
+        """
+        job_id = job_id or uuid.uuid4().hex
+        # Unique per call, so a duplicate enqueue never touches the first job's clip
+        clip_path = os.path.join(self.spool_dir, f"{job_id}-{uuid.uuid4().hex[:8]}{os.path.splitext(filename)[1] or '.mp4'}")
+        tmp_path = f"{clip_path}.part"
+        with open(tmp_path, "wb") as f:
+            if isinstance(clip, (str, os.PathLike)):
+                with open(clip, "rb") as source:
+                    shutil.copyfileobj(source, f, 1024 * 1024)
+            elif hasattr(clip, "getbuffer"):
+                f.write(clip.getbuffer())
+            else:
+                f.write(clip)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, clip_path)
+
+        now = time.time()
+        with self._transaction() as conn:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO jobs (job_id, clip_path, filename, content_hash, skill, model, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, clip_path, filename, content_hash, skill, model_name, now, now),
+            ).rowcount
+        if not inserted:
+            os.remove(clip_path)
+        logging.info(f"Queued job {job_id} ({filename}, {skill}, {model_name})")
+        return job_id
+
+    def get(self, job_id):
+        """Job row as a dict (with `position` in the queue while queued), or None."""
+        conn = self._connection()
+        row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if job["status"] == "queued":
+            job["position"] = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at <= ?", (job["created_at"],)
+            ).fetchone()[0]
+        return job
+
+    def result(self, job_id):
+        """(outcome, shared) stored for a job, or None before it is done."""
+        row = self._connection().execute("SELECT outcome, shared FROM results WHERE job_id = ?", (job_id,)).fetchone()
+        return (json.loads(row["outcome"]), bool(row["shared"])) if row else None
+
+    def cancel(self, job_id):
+        """Stop a job: queued jobs are never leased, a running worker sees it on its next heartbeat."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', updated_at = ? WHERE job_id = ? AND status IN ('queued', 'leased')",
+                (time.time(), job_id),
+            )
+        self.discard_clip_if_finished(job_id)
+
+    def wait_for_result(self, job_id, budget, on_status=None, poll_interval=QUEUE_POLL_INTERVAL):
+        """Poll until the job is done and return (outcome, shared).
+
+        While the job is queued only cancellation is checked; the budget's
+        deadline restarts once a worker leases the job, as it does when a
+        local analysis is admitted. If the caller stops waiting
+        (cancelled budget, deadline or any other exception) the job is cancelled.
+        """
+        leased = False
+        try:
+            while True:
+                job = self.get(job_id)
+                if job is None:
+                    raise KeyError(f"Unknown job {job_id}")
+                if job["status"] == "done":
+                    return self.result(job_id)
+                if job["status"] == "failed":
+                    raise RuntimeError(job["error"] or "analysis failed")
+                if job["status"] == "cancelled":
+                    raise AnalysisCancelled("تم إلغاء التحليل.")
+                if job["status"] == "leased" and not leased:
+                    leased = True
+                    budget.restart()
+                if on_status:
+                    on_status(job)
+                if leased:
+                    budget.sleep(poll_interval)
+                else:
+                    # Still queued: only cancellation counts, as in AdmissionController.admit;
+                    # the deadline starts when a worker leases the job
+                    if budget.cancelled:
+                        raise AnalysisCancelled("تم إلغاء التحليل.")
+                    time.sleep(poll_interval)
+        except BaseException:
+            self.cancel(job_id)
+            raise
+
+    # --- Worker side ---
+    def lease(self, worker_id, lease_seconds=LEASE_SECONDS):
+        """Lease the oldest runnable job (queued, or leased with an expired lease), or return None."""
+        now = time.time()
+        with self._transaction() as conn:
+            exhausted = [row["job_id"] for row in conn.execute(
+                "SELECT job_id FROM jobs WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?", (now, MAX_ATTEMPTS)
+            )]
+            conn.executemany(
+                "UPDATE jobs SET status = 'failed', error = 'lease_expired', lease_owner = NULL, updated_at = ? WHERE job_id = ?",
+                [(now, job_id) for job_id in exhausted],
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ? "
+                    "WHERE job_id = ?",
+                    (worker_id, now + lease_seconds, now, row["job_id"]),
+                )
+        for job_id in exhausted:
+            logging.warning(f"Job {job_id} failed: lease expired after {MAX_ATTEMPTS} attempts")
+            self.discard_clip_if_finished(job_id)
+        if row is None:
+            return None
+        job = dict(row)
+        job["attempts"] += 1
+        return job
+
+    def heartbeat(self, job_id, worker_id, lease_seconds=LEASE_SECONDS):
+        """Extend the lease; False if the job was cancelled or the lease went to another worker."""
+        now = time.time()
+        with self._transaction() as conn:
+            renewed = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE job_id = ? AND lease_owner = ? AND status = 'leased'",
+                (now + lease_seconds, now, job_id, worker_id),
+            ).rowcount
+        return bool(renewed)
+
+    def complete(self, job_id, worker_id, outcome, shared=False):
+        """Store the job's outcome; returns False if a result was already stored (duplicate run)."""
+        now = time.time()
+        with self._transaction() as conn:
+            stored = conn.execute(
+                "INSERT OR IGNORE INTO results (job_id, worker_id, outcome, shared, written_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, worker_id, json.dumps(outcome, ensure_ascii=False), int(shared), now),
+            ).rowcount
+            conn.execute(
+                "UPDATE jobs SET status = 'done', error = NULL, lease_owner = NULL, updated_at = ? WHERE job_id = ? AND status != 'cancelled'",
+                (now, job_id),
+            )
+        if not stored:
+            logging.info(f"Job {job_id} already had a result, ignoring the duplicate from {worker_id}")
+        return bool(stored)
+
+    def fail(self, job_id, worker_id, error):
+        """Record a failed attempt: requeue the job, or fail it once it used MAX_ATTEMPTS leases."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                "error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE job_id = ? AND lease_owner = ? AND status = 'leased'",
+                (MAX_ATTEMPTS, error, time.time(), job_id, worker_id),
+            )
+
+    def release(self, job_id, worker_id):
+        """Give a leased job back without counting the attempt (worker shutting down)."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = attempts - 1, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE job_id = ? AND lease_owner = ? AND status = 'leased'",
+                (time.time(), job_id, worker_id),
+            )
+
+    def discard_clip_if_finished(self, job_id):
+        """Delete the spooled clip once its job reached a terminal status."""
+        job = self.get(job_id)
+        if job and job["status"] in TERMINAL_STATUSES and os.path.exists(job["clip_path"]):
+            try:
+                os.remove(job["clip_path"])
+            except OSError as e:
+                logging.warning(f"Could not delete spooled clip {job['clip_path']}: {e}")
+
+    def stats(self):
+        """Number of jobs per status."""
+        rows = self._connection().execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status")
+        return {row["status"]: row["count"] for row in rows}
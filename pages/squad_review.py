@@ -0,0 +1,126 @@
+"""Squad review: stored assessments as a grid of cards, filtered and sorted on the server.
+
+A page of the app, listed in the sidebar of new_app.py. Each page of cards
+is one keyset-paginated query on the history store (assessment_history.py)
+rendered as one HTML element. Thumbnails load only as their card scrolls
+into view, and off-screen cards are not laid out (content-visibility in
+static/theme.css), so a page costs the same with a hundred or a few hundred
+thousand stored assessments.
+"""
+import os
+from datetime import timedelta
+
+import streamlit as st
+import streamlit.components.v1 as components
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from analysis_core import ASSESSMENT_OPTIONS
+from assessment_history import (
+    ASSESSMENT_HISTORY_DB,
+    ASSESSMENT_THUMBNAIL_DIR,
+    GRADE_SCORES,
+    AssessmentHistory,
+    thumbnail_path,
+)
+from result_view import assessment_card_html, review_grid_html
+from ui_theme import apply_theme
+
+st.set_page_config(page_title="مراجعة الفريق", layout="wide", initial_sidebar_state="collapsed")
+apply_theme()
+
+ALL = "الكل"
+DATE_SORTS = {"الأحدث أولاً": "newest", "الأقدم أولاً": "oldest"}
+CRITERION_SORTS = {"الأفضل في المعيار أولاً": "best", "الأضعف في المعيار أولاً": "worst"}
+PAGE_SIZES = [24, 48, 96]
+
+@st.cache_resource
+def get_assessment_history():
+    return AssessmentHistory(ASSESSMENT_HISTORY_DB)
+
+@st.cache_resource
+def thumbnail_base_url():
+    """Thumbnails are named by clip content hash and never change, so they are served from a cacheable component route."""
+    thumbnails = components.declare_component("assessment_thumbnails", path=ASSESSMENT_THUMBNAIL_DIR)
+    return f"component/{thumbnails.name}/"
+
+def thumbnail_url(content_hash):
+    if not ASSESSMENT_THUMBNAIL_DIR or not content_hash:
+        return None
+    if not os.path.exists(thumbnail_path(ASSESSMENT_THUMBNAIL_DIR, content_hash)):
+        return None
+    return f"{thumbnail_base_url()}{content_hash}.jpg"
+
+def previous_page():
+    st.session_state.review_cursors.pop()
+
+def next_page(cursor):
+    st.session_state.review_cursors.append(cursor)
+
+def review_filters(history):
+    """Filter and sort widgets; returns the keyword arguments of AssessmentHistory.page."""
+    columns = st.columns(3)
+    with columns[0]:
+        player = st.selectbox("اللاعب:", [ALL] + [row["player"] for row in history.players()])
+    with columns[1]:
+        skill = st.selectbox("المهارة:", [ALL] + list(ASSESSMENT_OPTIONS))
+    with columns[2]:
+        dates = st.date_input("الفترة:", value=(), format="YYYY-MM-DD")
+    columns = st.columns(3)
+    with columns[0]:
+        criterion = st.selectbox("المعيار:", [ALL] + history.criteria())
+    with columns[1]:
+        grade = st.selectbox("التقدير في المعيار:", [ALL] + list(GRADE_SCORES), disabled=criterion == ALL)
+    with columns[2]:
+        # Sorting by a grade needs the criterion it is the grade of
+        sorts = dict(DATE_SORTS, **CRITERION_SORTS) if criterion != ALL else DATE_SORTS
+        sort = sorts[st.selectbox("الترتيب:", list(sorts))]
+
+    return {
+        "player": None if player == ALL else player,
+        "skill": None if skill == ALL else skill,
+        "since": dates[0].isoformat() if len(dates) == 2 else None,
+        "until": (dates[1] + timedelta(days=1)).isoformat() if len(dates) == 2 else None,
+        "criterion": None if criterion == ALL else criterion,
+        "grade": None if criterion == ALL or grade == ALL else grade,
+        "sort": sort,
+    }
+
+@st.fragment
+def review_grid(history, filters, page_size):
+    """One page of cards and its navigation; paging reruns only this fragment."""
+    cursors = st.session_state.review_cursors
+    rows, next_cursor = history.page(cursor=cursors[-1], limit=page_size, **filters)
+    if not rows:
+        st.info("لا توجد تقييمات تطابق هذه الاختيارات.")
+        return
+    st.markdown(
+        review_grid_html([assessment_card_html(row, thumbnail_url(row["content_hash"])) for row in rows]),
+        unsafe_allow_html=True,
+    )
+    columns = st.columns([1, 2, 1])
+    with columns[0]:
+        st.button("→ السابق", on_click=previous_page, disabled=len(cursors) == 1, use_container_width=True)
+    with columns[1]:
+        st.markdown(f'<p style="text-align: center;">الصفحة {len(cursors)}</p>', unsafe_allow_html=True)
+    with columns[2]:
+        st.button("التالي ←", on_click=next_page, args=(next_cursor,), disabled=next_cursor is None,
+                  use_container_width=True)
+
+def main():
+    st.markdown('<h1 class="main-header">مراجعة تقييمات الفريق</h1>', unsafe_allow_html=True)
+    if not ASSESSMENT_HISTORY_DB:
+        st.info("سجل التقييمات غير مفعّل: اضبط ASSESSMENT_HISTORY_DB لحفظ التقييمات ومراجعتها هنا.")
+        return
+    history = get_assessment_history()
+
+    filters = review_filters(history)
+    page_size = st.selectbox("عدد التقييمات في الصفحة:", PAGE_SIZES)
+    # New filters start again from the first page
+    if st.session_state.get("review_filters") != (filters, page_size):
+        st.session_state.review_filters = (filters, page_size)
+        st.session_state.review_cursors = [None]
+    review_grid(history, filters, page_size)
+
+main()
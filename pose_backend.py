@@ -0,0 +1,129 @@
+"""Local pose-estimation backend: grades a clip on the CPU, without Gemini.
+
+MediaPipe Pose extracts 33 body keypoints per frame, the rubric angles of
+`create_assessment_prompt` are measured on them (biomechanics.py), and each
+angle is graded against the bands of the rubric table (rubric.py). The result has the same shape as
+`analyze_video_skill`'s ({criterion: grade}, nested per skill for كلاهما),
+so the app, the CLIs, the cache and the history treat it like any other
+model: `run_analysis_pipeline` runs it for LOCAL_POSE_MODEL, which is listed
+next to the Gemini models.
+
+The striking (or receiving) leg is the one whose ankle moves fastest, and
+the angles are measured around the frame of its peak speed, taken as the
+moment of contact. Criteria that need the ball (المسافة للكرة) cannot be
+measured from the body alone and are graded غير واضح.
+
+Needs `pip install mediapipe av`; both are imported on first use only.
+"""
+import contextlib
+import logging
+import os
+
+import numpy as np
+
+from analysis_core import no_progress, AnalysisBudget, AnalysisCancelled, DeadlineExceeded
+from biomechanics import rubric_measurements
+from frame_cache import frame_variant, get_frame_cache
+from frame_decoder import FrameDecoder, decode_errors
+from rubric import grade_measurements
+
+# Frames are sampled down to this rate and width before pose inference
+POSE_SAMPLE_FPS = float(os.getenv("POSE_SAMPLE_FPS", "30"))
+POSE_FRAME_WIDTH = int(os.getenv("POSE_FRAME_WIDTH", "640"))
+BUDGET_CHECK_FRAMES = 15
+# Cached keypoints are stored under this name: change it when the pose model or its settings change
+POSE_KEYPOINTS_NAME = "mediapipe_pose_full"
+
+def _mediapipe():
+    try:
+        import mediapipe
+    except ImportError:
+        raise RuntimeError("The local pose backend needs: pip install mediapipe av")
+    return mediapipe
+
+def pose_keypoints(pose, images, size, budget):
+    """(frames, 33, 3) keypoints of an iterable of RGB frames of `size` (width, height)."""
+    width, height = size
+    frames = []
+    for image in images:
+        if len(frames) % BUDGET_CHECK_FRAMES == 0:
+            budget.check()
+        landmarks = pose.process(image).pose_landmarks
+        if landmarks is None:
+            frames.append(np.full((33, 3), np.nan))
+        else:
+            frames.append([(point.x * width, point.y * height, point.visibility) for point in landmarks.landmark])
+    return np.asarray(frames, dtype=np.float64).reshape(-1, 33, 3)
+
+def extract_keypoints(video_path, progress=no_progress, budget=None, content_hash=None):
+    """(frames, 33, 3) array of x, y in pixels and visibility, NaN where no person was found; and its fps.
+
+    With the frame cache enabled (frame_cache.py), keypoints already
+    extracted from the clip are returned as they are, and cached frames are
+    read instead of decoding the video again.
+    """
+    budget = budget or AnalysisBudget()
+    cache = get_frame_cache()
+    variant = frame_variant(POSE_SAMPLE_FPS, POSE_FRAME_WIDTH)
+    if cache:
+        content_hash = content_hash or cache.source_hash(video_path)
+        # Without a hash (unreadable clip, broken index) the analysis runs uncached
+        cache = cache if content_hash else None
+    if cache:
+        cached = cache.keypoints(content_hash, variant, POSE_KEYPOINTS_NAME)
+        if cached:
+            logging.info(f"Frame cache hit: keypoints of {content_hash[:12]}")
+            return cached
+    cached_frames = cache.frames(content_hash, variant) if cache else None
+    mediapipe = _mediapipe()
+    with contextlib.ExitStack() as stack:
+        pose = stack.enter_context(mediapipe.solutions.pose.Pose(static_image_mode=False, model_complexity=1))
+        if cached_frames:
+            logging.info(f"Frame cache hit: frames of {content_hash[:12]}")
+            images, fps = cached_frames
+            size = (images.shape[2], images.shape[1])
+        else:
+            # Frames are decoded across cores (frame_decoder.py), already sampled, downscaled and RGB.
+            # Closed explicitly so a cancelled analysis releases the decode buffers at once.
+            decoder = FrameDecoder(video_path, sample_fps=POSE_SAMPLE_FPS, max_width=POSE_FRAME_WIDTH)
+            fps = decoder.sampled_fps
+            size = (decoder.frame_shape[1], decoder.frame_shape[0])
+            images = (image for _, image in stack.enter_context(contextlib.closing(iter(decoder))))
+            writer = stack.enter_context(cache.frame_writer(content_hash, variant, len(decoder), decoder.frame_shape, fps)) \
+                if cache else None
+            if writer:
+                images = writer.record(images)
+        keypoints = pose_keypoints(pose, images, size, budget)
+    logging.info(f"Extracted keypoints from {len(keypoints)} frames of {video_path}")
+    if cache:
+        cache.put_keypoints(content_hash, variant, POSE_KEYPOINTS_NAME, keypoints, fps)
+    return keypoints, fps
+
+def grade_skill(keypoints, fps, skill_type):
+    measurements = rubric_measurements(keypoints, fps, skill_type)
+    logging.info(f"Pose measurements for {skill_type}: {measurements}")
+    return grade_measurements(skill_type, measurements)
+
+def analyze_video_pose(video_path, skill_type, progress=no_progress, budget=None, content_hash=None):
+    """Grade a clip locally; returns the same result dict as `analyze_video_skill`, or None on failure.
+
+    `content_hash` (the clip's SHA-256, if the caller has it) saves the frame cache from hashing the file.
+    """
+    progress("info", f"جاري تحليل مهارة {skill_type} محلياً بتقدير وضعية الجسم...")
+    try:
+        keypoints, fps = extract_keypoints(video_path, progress, budget, content_hash)
+    except AnalysisCancelled:
+        raise
+    except DeadlineExceeded as e:
+        progress("error", str(e))
+        logging.error(f"Analysis budget exhausted for local pose analysis of {video_path}")
+        return None
+    except (RuntimeError, ValueError, *decode_errors()) as e:
+        progress("error", f"تعذر التحليل المحلي: {e}")
+        logging.error(f"Local pose analysis failed for {video_path}: {e}")
+        return None
+    if not np.isfinite(keypoints[:, :, 0]).any():
+        progress("warning", "لم يتم العثور على لاعب واضح في الفيديو.")
+    if skill_type == "كلاهما":
+        return {"التمرير": grade_skill(keypoints, fps, "تمرير"), "الاستلام": grade_skill(keypoints, fps, "استقبال")}
+    return grade_skill(keypoints, fps, skill_type)
@@ -0,0 +1,170 @@
+"""Worker process that runs analyses from the shared job queue.
+
+Leases jobs from the SQLite queue (job_queue.py), runs the analysis
+pipeline with the usual admission control, overload tiers and coalescing,
+and stores each outcome in the shared result store. Run as many workers, on
+as many machines, as the Gemini quota allows:
+
+    ANALYSIS_QUEUE_DB=/shared/queue.db python queue_worker.py --concurrency 4
+
+SIGTERM/SIGINT stops leasing new jobs and waits for the running ones; a
+second signal gives the running jobs back to the queue.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+# Before the project imports: they read their settings from the environment
+load_dotenv()
+
+from analysis_core import (
+    ANALYSIS_DEADLINE_SECONDS,
+    AnalysisBudget,
+    AnalysisCancelled,
+    resolve_api_key,
+    configure_gemini,
+    file_content_hash,
+    run_analysis_pipeline,
+    run_coalesced,
+    get_admission_controller,
+    get_overload_controller,
+)
+from job_queue import ANALYSIS_QUEUE_DB, LEASE_SECONDS, QUEUE_POLL_INTERVAL, JobQueue
+from result_cache import open_cache
+
+class Worker:
+    def __init__(self, queue, worker_id, concurrency, lease_seconds=LEASE_SECONDS, cache=None):
+        self.queue = queue
+        self.cache = cache
+        self.worker_id = worker_id
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.stopping = threading.Event()
+        self._budgets = {}
+        self._lock = threading.Lock()
+
+    def stop(self, abort=False):
+        """Stop leasing; with `abort`, also cancel the running jobs (they are released to the queue)."""
+        self.stopping.set()
+        if abort:
+            with self._lock:
+                for budget in self._budgets.values():
+                    budget.cancel()
+
+    def run(self):
+        logging.info(f"Worker {self.worker_id} polling {self.queue.db_path} with concurrency {self.concurrency}")
+        active = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="worker") as pool:
+            while not self.stopping.is_set():
+                active = {future for future in active if not future.done()}
+                if len(active) < self.concurrency:
+                    job = self.queue.lease(self.worker_id, self.lease_seconds)
+                    if job:
+                        active.add(pool.submit(self.process, job))
+                        continue
+                self.stopping.wait(QUEUE_POLL_INTERVAL)
+            logging.info(f"Worker {self.worker_id} stopping, waiting for {len(active)} running jobs")
+
+    def keep_lease(self, job_id, budget, done):
+        """Renew the lease until `done`; cancel the analysis if the job was cancelled or taken over."""
+        while not done.wait(self.lease_seconds / 3):
+            if not self.queue.heartbeat(job_id, self.worker_id, self.lease_seconds):
+                logging.info(f"Job {job_id} was cancelled or lost its lease, stopping it")
+                budget.cancel()
+                return
+
+    def process(self, job):
+        job_id = job["job_id"]
+        budget = AnalysisBudget(total_seconds=ANALYSIS_DEADLINE_SECONDS)
+        with self._lock:
+            self._budgets[job_id] = budget
+        done = threading.Event()
+        threading.Thread(target=self.keep_lease, args=(job_id, budget, done), daemon=True).start()
+        progress = lambda level, message: logging.log(
+            logging.WARNING if level in ("warning", "error") else logging.DEBUG,
+            f"[job {job_id[:8]}] {message}"
+        )
+
+        content_hash = job["content_hash"]
+
+        def run_pipeline():
+            with get_admission_controller().admit(os.path.getsize(job["clip_path"]), budget):
+                return run_analysis_pipeline(
+                    job["clip_path"],
+                    job["filename"],
+                    job["skill"],
+                    job["model"],
+                    progress,
+                    budget,
+                    tier=get_overload_controller().current_tier(),
+                    cache=self.cache,
+                    content_hash=content_hash
+                )
+
+        try:
+            logging.info(f"[job {job_id[:8]}] attempt {job['attempts']}: {job['filename']} ({job['skill']}, {job['model']})")
+            content_hash = content_hash or file_content_hash(job["clip_path"])
+            outcome, shared = run_coalesced((content_hash, job["skill"], job["model"]), run_pipeline, budget)
+            if outcome["error"] == "gemini_upload_failed":
+                # Usually transient; let another attempt try
+                self.queue.fail(job_id, self.worker_id, outcome["error"])
+            else:
+                self.queue.complete(job_id, self.worker_id, outcome, shared)
+                logging.info(f"[job {job_id[:8]}] done in {outcome['timings'].get('total', 0):.1f}s")
+        except AnalysisCancelled:
+            if self.stopping.is_set():
+                self.queue.release(job_id, self.worker_id)
+        except Exception as e:
+            logging.error(f"[job {job_id[:8]}] failed: {e}", exc_info=True)
+            self.queue.fail(job_id, self.worker_id, f"{type(e).__name__}: {e}")
+        finally:
+            done.set()
+            with self._lock:
+                del self._budgets[job_id]
+            self.queue.discard_clip_if_finished(job_id)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run analyses from the shared job queue.")
+    parser.add_argument("--db", default=ANALYSIS_QUEUE_DB, help="queue database (default: $ANALYSIS_QUEUE_DB)")
+    parser.add_argument("--spool", default=None, help="clip spool directory shared with the front ends")
+    parser.add_argument("--concurrency", type=int, default=4, help="jobs processed in parallel")
+    parser.add_argument("--lease", type=float, default=LEASE_SECONDS, help="lease length in seconds")
+    parser.add_argument("--rpm", type=float, default=None, help="max Gemini requests per minute for the API key")
+    parser.add_argument("--worker-id", default=None)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if not args.db:
+        print("No queue database: pass --db or set ANALYSIS_QUEUE_DB", file=sys.stderr)
+        return 2
+    api_key, _ = resolve_api_key()
+    if not api_key:
+        print("No Gemini API key found: set GEMINI_API_KEY (or GOOGLE_API_KEY) or add it to .env", file=sys.stderr)
+        return 2
+    configure_gemini(api_key, requests_per_minute=args.rpm)
+
+    worker_id = args.worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    # Share Gemini uploads with the front ends' cache, if they use one
+    cache = open_cache(os.environ["RESULT_CACHE_URL"]) if os.getenv("RESULT_CACHE_URL") else None
+    worker = Worker(JobQueue(args.db, args.spool), worker_id, args.concurrency, args.lease, cache)
+
+    def handle_signal(signum, frame):
+        abort = worker.stopping.is_set()
+        logging.info("Aborting running jobs" if abort else "Finishing running jobs, signal again to abort")
+        worker.stop(abort=abort)
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    worker.run()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""Shared cache backends for assessment results and Gemini file handles.
+
+Replicas of the app behind a load balancer share nothing in memory, so a
+clip analysed on one replica is analysed again on the next. A cache backend
+keyed by content hash lets every replica reuse finished results and
+still-valid Gemini uploads. Backends are picked by URL:
+
+    memory://                  per-process (tests, single replica)
+    sqlite:///path/cache.db    a file shared by processes on one host
+    redis://host:6379/0        any Redis-protocol server (devtools/fake_redis.py locally)
+
+Cache errors never fail an analysis: `get_json` / `set_json` log them and
+behave like a miss.
+"""
+import os
+import json
+import time
+import socket
+import logging
+import sqlite3
+import threading
+import collections
+from urllib.parse import urlsplit, unquote
+
+# Finished results are kept for a week
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Gemini deletes uploaded files after 48 hours; stop reusing them well before
+GEMINI_FILE_CACHE_TTL_SECONDS = float(os.getenv("GEMINI_FILE_CACHE_TTL_SECONDS", str(6 * 3600)))
+MEMORY_CACHE_MAX_ENTRIES = 1024
+
+def result_cache_key(content_hash, skill, model_name):
+    return f"result:v1:{content_hash}:{skill}:{model_name}"
+
+def gemini_file_cache_key(content_hash):
+    return f"gemini_file:v1:{content_hash}"
+
+class CacheBackend:
+    """Byte-string key/value store with optional per-entry TTL."""
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def get_json(self, key):
+        try:
+            value = self.get(key)
+            return json.loads(value) if value is not None else None
+        except Exception as e:
+            logging.warning(f"Cache read of {key} failed: {e}")
+            return None
+
+    def set_json(self, key, value, ttl=None):
+        try:
+            self.set(key, json.dumps(value, ensure_ascii=False).encode(), ttl)
+        except Exception as e:
+            logging.warning(f"Cache write of {key} failed: {e}")
+
+    def discard(self, key):
+        try:
+            self.delete(key)
+        except Exception as e:
+            logging.warning(f"Cache delete of {key} failed: {e}")
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache."""
+
+    def __init__(self, max_entries=MEMORY_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl if ttl else None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+class SQLiteCache(CacheBackend):
+    """Cache table in a SQLite file, shared by the processes of one host."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] is not None and row[1] < time.time():
+            self.delete(key)
+            return None
+        return bytes(row[0])
+
+    def set(self, key, value, ttl=None):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl if ttl else None),
+        )
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+class RedisError(Exception):
+    """An error reply from the Redis server."""
+
+class RedisCache(CacheBackend):
+    """Minimal RESP client (GET/SET/DEL) with one connection per thread."""
+
+    def __init__(self, host="127.0.0.1", port=6379, db=0, password=None, timeout=5.0):
+        self.address = (host, port)
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection(self.address, timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock = sock
+        self._local.reader = sock.makefile("rb")
+        if self.password:
+            self._send("AUTH", self.password)
+        if self.db:
+            self._send("SELECT", self.db)
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                self._local.reader.close()
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    def _send(self, *args):
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._local.sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RedisError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._local.reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(payload)
+            return None if count < 0 else [self._read_reply() for _ in range(count)]
+        raise RedisError(f"Unexpected reply {line!r}")
+
+    def command(self, *args):
+        """Run one command, reconnecting once if the connection dropped."""
+        for attempt in range(2):
+            try:
+                if getattr(self._local, "sock", None) is None:
+                    self._connect()
+                return self._send(*args)
+            except (OSError, ConnectionError):
+                self._close()
+                if attempt:
+                    raise
+
+    def get(self, key):
+        return self.command("GET", key)
+
+    def set(self, key, value, ttl=None):
+        if ttl:
+            self.command("SET", key, value, "PX", int(ttl * 1000))
+        else:
+            self.command("SET", key, value)
+
+    def delete(self, key):
+        self.command("DEL", key)
+
+def open_cache(url):
+    """Cache backend for a memory://, sqlite:///path or redis://[:password@]host:port/db URL."""
+    parts = urlsplit(url)
+    if parts.scheme == "memory":
+        return MemoryCache()
+    if parts.scheme == "sqlite":
+        return SQLiteCache(unquote(parts.netloc + parts.path))
+    if parts.scheme == "redis":
+        return RedisCache(
+            parts.hostname or "127.0.0.1",
+            parts.port or 6379,
+            db=int(parts.path.strip("/") or 0),
+            password=unquote(parts.password) if parts.password else None,
+        )
+    raise ValueError(f"Unsupported cache URL '{url}' (use memory://, sqlite:///path or redis://host:port/db)")
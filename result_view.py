@@ -0,0 +1,93 @@
+"""Normalized assessment results and their HTML rendering.
+
+`parse_assessment_text` returns grades in several shapes: {criterion: grade},
+{"التمرير": {...}, "الاستلام": {...}} for كلاهما, a legacy {skill: grade}
+map, or a single grade string. `normalize_assessment_result` turns any of
+them into one model (a title plus sections of graded rows), and
+`assessment_result_html` renders that model as a single HTML block, so the
+whole results panel is one frontend element instead of one per criterion.
+
+No Streamlit import: the job API, scripts and benchmarks can use it too.
+"""
+import html
+
+# grade -> (CSS class, icon). The classes are named after the colour they
+# give in static/theme.css: جيد is green, متوسط orange, ضعيف red.
+GRADE_STYLES = {
+    "مثالي": ("جيد", "[مثالي]"),
+    "جيد": ("متوسط", "[جيد]"),
+    "غير مقبول": ("ضعيف", "[غير مقبول]"),
+}
+UNKNOWN_GRADE_STYLE = ("متوسط", "")
+
+BOTH_SKILLS_SECTIONS = (("التمرير", "نتائج التمرير"), ("الاستلام", "نتائج الاستلام"))
+
+def grade_row(label, grade, with_icon=True):
+    css_class, icon = GRADE_STYLES.get(grade, UNKNOWN_GRADE_STYLE)
+    return {"label": str(label), "grade": str(grade), "css_class": css_class, "icon": icon if with_icon else ""}
+
+def normalize_assessment_result(skill, result):
+    """Model of a result: {"title": str, "sections": [{"heading": str or None, "rows": [row, ...]}]}.
+
+    Each row is {"label", "grade", "css_class", "icon"}.
+    """
+    if isinstance(result, dict):
+        if "التمرير" in result and "الاستلام" in result:
+            # Both skills with detailed criteria
+            sections = [
+                {"heading": heading, "rows": [grade_row(criterion, grade) for criterion, grade in result[key].items()]}
+                for key, heading in BOTH_SKILLS_SECTIONS
+                if result[key]
+            ]
+            return {"title": "نتائج التقييم المفصلة", "sections": sections}
+        if len(result) > 1 and any(":" not in str(k) for k in result.keys()):
+            # Single skill with detailed criteria
+            rows = [grade_row(criterion, grade) for criterion, grade in result.items()]
+            return {"title": "نتائج التقييم المفصلة", "sections": [{"heading": None, "rows": rows}]}
+        # Legacy format - simple skill results
+        rows = [grade_row(skill_name, grade, with_icon=False) for skill_name, grade in result.items()]
+        return {"title": "نتائج التقييم", "sections": [{"heading": None, "rows": rows}]}
+    if isinstance(result, str):
+        return {"title": "نتيجة التقييم", "sections": [{"heading": None, "rows": [grade_row(skill, result, with_icon=False)]}]}
+    # This shouldn't happen, but handle it gracefully
+    row = {"label": str(skill), "grade": str(result), "css_class": UNKNOWN_GRADE_STYLE[0], "icon": ""}
+    return {"title": "نتيجة التقييم", "sections": [{"heading": None, "rows": [row]}]}
+
+def assessment_result_html(model):
+    """One HTML block for a normalized result; labels and grades come from the model and are escaped."""
+    parts = [f'<div class="assessment-results"><h3>{html.escape(model["title"])}</h3>']
+    for section in model["sections"]:
+        if section["heading"]:
+            parts.append(f'<h4>{html.escape(section["heading"])}</h4>')
+        for row in section["rows"]:
+            icon = f'{html.escape(row["icon"])} ' if row["icon"] else ""
+            parts.append(
+                f'<div class="assessment-result {row["css_class"]}">'
+                f'{icon}{html.escape(row["label"])}: {html.escape(row["grade"])}</div>'
+            )
+    parts.append("</div>")
+    return "".join(parts)
+
+def assessment_card_html(assessment, thumbnail_url=None):
+    """Compact card for one stored assessment (an AssessmentHistory.page row, with its grades)."""
+    if thumbnail_url:
+        # Loaded by the browser only when the card scrolls into view
+        thumbnail = f'<img class="review-thumbnail" src="{html.escape(thumbnail_url)}" loading="lazy" decoding="async" alt="">'
+    else:
+        thumbnail = '<div class="review-thumbnail review-thumbnail-missing">🎬</div>'
+    chips = []
+    for grade in assessment["grades"]:
+        css_class = GRADE_STYLES.get(grade["grade"], UNKNOWN_GRADE_STYLE)[0]
+        label = grade["criterion"] or assessment["skill"]
+        chips.append(f'<span class="grade-chip {css_class}">{html.escape(label)}: {html.escape(grade["grade"])}</span>')
+    return (
+        f'<div class="review-card">{thumbnail}'
+        f'<div class="review-player">{html.escape(assessment["player"])}</div>'
+        f'<div class="review-meta">{html.escape(assessment["assessed_at"][:10])} · {html.escape(assessment["skill"])}'
+        f' · {html.escape((assessment["model"] or "").replace("models/", ""))}</div>'
+        f'<div class="review-grades">{"".join(chips)}</div></div>'
+    )
+
+def review_grid_html(cards):
+    """A page of cards as one element."""
+    return f'<div class="review-grid">{"".join(cards)}</div>'
@@ -0,0 +1,271 @@
+"""The assessment rubrics as data: criteria, units and grade bands.
+
+Each skill's criteria are defined once in RUBRICS, with their Arabic output
+key, unit, ideal range and good range. Everything else is derived from the
+table:
+
+- the Gemini prompts (`assessment_prompt`, `fallback_prompt`), reference
+  ranges included, and the response keys `parse_assessment_text` reads;
+- the local grader (`compile_bands`, `grade_values`), which turns each
+  criterion's ranges into sorted band edges and grades whole arrays of
+  measurements with one `np.searchsorted` per criterion.
+
+So the numbers Gemini is told and the numbers local grading applies cannot
+drift apart.
+
+A value in the (closed) ideal range is مثالي, in the good range جيد, and
+anything else غير مقبول; a missing measurement (NaN) is غير واضح.
+"""
+import numpy as np
+
+IDEAL, GOOD, UNACCEPTABLE = "مثالي", "جيد", "غير مقبول"
+NOT_CLEAR_AR = "غير واضح"
+GRADES = (IDEAL, GOOD, UNACCEPTABLE)
+# Points of each grade for the overall grade of locally graded criteria
+GRADE_POINTS = {IDEAL: 2, GOOD: 1, UNACCEPTABLE: 0}
+OVERALL_CRITERION = "التقييم العام"
+
+SAFETY_PREAMBLE = """
+    This is an educational analysis for improving athletic performance in football/soccer.
+    The goal is to enhance training and skill development in a safe and healthy environment.
+    """
+
+def criterion(key, title, summary, unit, ideal, good, ideal_text, good_text, unacceptable_text, short_title=None):
+    """One rubric row. The *_text templates are the prompt's band descriptions; {reference} is filled in from the ranges."""
+    return {
+        "key": key,
+        "title": title,
+        # Title in the combined كلاهما prompt's one-line summary
+        "short_title": short_title or title[0] + title[1:].lower(),
+        "summary": summary,
+        "unit": unit,
+        "ideal": ideal,
+        "good": good,
+        "text": {IDEAL: ideal_text, GOOD: good_text, UNACCEPTABLE: unacceptable_text},
+    }
+
+RUBRICS = {
+    "تمرير": {
+        "section": "التمرير",
+        "task": "Your task is to assess short passing skills in football/soccer using specific technical criteria.",
+        "short_title": "Passing Criteria",
+        "fallback_task": "Assess this football skill for sports training.",
+        "safety_preamble": False,
+        "focus": [
+            "Overall body posture during passing",
+            "Supporting foot stability",
+            "Forward trunk lean",
+            "Distance between foot and ball",
+            "Overall smoothness of movement",
+        ],
+        "criteria": [
+            criterion("ركبة القدم الضاربة", "Striking Foot Knee", "Appropriate balance and stability", "degrees",
+                      (95, 110), (95, 130),
+                      "Supporting foot at appropriate angle ({reference}) with clear stability and balance",
+                      "Acceptable angle ({reference}) with reasonable balance",
+                      "Inappropriate angle ({reference}) or clear instability"),
+            criterion("ركبة القدم المرتكزة", "Supporting Foot Knee", "Balanced and stable posture", "degrees",
+                      (130, 145), (120, 150),
+                      "Excellent balance with supporting knee in stable position ({reference})",
+                      "Good balance with acceptable posture ({reference})",
+                      "Lack of balance or unstable posture ({reference})"),
+            criterion("انحناء الجذع", "Trunk Inclination", "Appropriate forward lean for control", "degrees",
+                      (15, 30), (10, 35),
+                      "Appropriate forward lean ({reference}) that helps with control and balance",
+                      "Acceptable lean ({reference})",
+                      "Inappropriate lean ({reference}) or completely upright stance"),
+            criterion("المسافة للكرة", "Distance Between Supporting Foot and Ball", "Optimal distance for balance and accuracy", "cm",
+                      (10, 15), (8, 18),
+                      "Optimal distance maintaining balance and accuracy ({reference})",
+                      "Acceptable distance ({reference}) with reasonable balance",
+                      "Too close or too far ({reference}) reducing control",
+                      short_title="Distance to ball"),
+        ],
+    },
+    "استقبال": {
+        "section": "الاستلام",
+        "task": "Your task is to assess ball receiving skills in football/soccer using specific technical criteria.",
+        "short_title": "Receiving Criteria",
+        "fallback_task": "Assess this ball receiving skill for training.",
+        "safety_preamble": True,
+        "focus": [
+            "Body posture when receiving the ball",
+            "Supporting foot stability",
+            "Slight forward trunk lean",
+            "Ball control after reception",
+            "Overall smoothness of movement",
+        ],
+        "criteria": [
+            criterion("ركبة القدم المستلمة", "Receiving Foot Knee", "Posture that helps with control", "degrees",
+                      (100, 115), (90, 125),
+                      "Appropriate posture that helps slow ball reception and increase control ({reference})",
+                      "Acceptable posture for reception ({reference})",
+                      "Inappropriate posture ({reference}) reducing control"),
+            criterion("ركبة القدم المرتكزة", "Supporting Foot Knee", "Body balance and stability", "degrees",
+                      (130, 150), (120, 155),
+                      "Clear balance and stability of body ({reference})",
+                      "Acceptable balance ({reference})",
+                      "Lack of balance or stability ({reference})"),
+            criterion("انحناء الجذع", "Trunk Inclination", "Slight forward lean", "degrees",
+                      (10, 25), (5, 30),
+                      "Slight forward lean that helps proper reception ({reference})",
+                      "Acceptable lean ({reference})",
+                      "Standing straight or excessive lean ({reference})"),
+            criterion("زاوية الداخل", "Inside Angle", "Ball control and preventing bounce", "degrees",
+                      (80, 100), (70, 110),
+                      "Excellent ball control and preventing bounce ({reference})",
+                      "Acceptable control ({reference})",
+                      "Loss of control or ball bounce ({reference})"),
+        ],
+    },
+}
+BOTH_SKILLS = "كلاهما"
+BOTH_TASK = "Your task is to assess both short passing and ball receiving skills in football/soccer using specific technical criteria."
+BOTH_FALLBACK_TASK = "Assess football skills for training."
+
+def _number(value):
+    return f"{value:g}"
+
+def _good_parts(spec):
+    """Whole-number sub-ranges of the good range outside the ideal range, as the prompts state them."""
+    (ideal_low, ideal_high), (good_low, good_high) = spec["ideal"], spec["good"]
+    parts = []
+    if good_low < ideal_low:
+        parts.append((good_low, ideal_low - 1))
+    if good_high > ideal_high:
+        parts.append((ideal_high + 1, good_high))
+    return parts
+
+def reference(spec, grade):
+    """The "(reference: ...)" text of one band of a criterion."""
+    unit = spec["unit"]
+    if grade == IDEAL:
+        low, high = spec["ideal"]
+        return f"reference: {_number(low)}-{_number(high)} {unit}"
+    if grade == GOOD:
+        parts = " or ".join(f"{_number(low)}-{_number(high)}" for low, high in _good_parts(spec))
+        return f"reference: {parts} {unit}"
+    low, high = spec["good"]
+    return f"less than {_number(low)} or more than {_number(high)} {unit}"
+
+def response_lines(skill_type):
+    """The "key: [مثالي/جيد/غير مقبول]" lines Gemini is asked to answer with."""
+    choices = f"[{'/'.join(GRADES)}]"
+    if skill_type == BOTH_SKILLS:
+        lines = []
+        for rubric in RUBRICS.values():
+            keys = [spec["key"] for spec in rubric["criteria"]] + [OVERALL_CRITERION]
+            lines += [f"{rubric['section']} - {key}: {choices}" for key in keys] + [""]
+        return lines[:-1]
+    return [f"{spec['key']}: {choices}" for spec in RUBRICS[skill_type]["criteria"]] + [f"{OVERALL_CRITERION}: {choices}"]
+
+def _prompt(lines):
+    return "\n" + "\n".join(f"        {line}" if line else "" for line in lines) + "\n        "
+
+def assessment_prompt(skill_type):
+    """The full rubric prompt of `create_assessment_prompt` for تمرير, استقبال or كلاهما."""
+    if skill_type == BOTH_SKILLS:
+        lines = [BOTH_TASK, ""]
+        for rubric in RUBRICS.values():
+            lines.append(f"**{rubric['short_title']}:**")
+            lines += [
+                f"- {spec['short_title']}: {spec['summary']} ({reference(spec, IDEAL)})"
+                for spec in rubric["criteria"]
+            ]
+            lines.append("")
+        lines += ["Watch the video and assess both skills based on execution quality.", "", "**Response Format:**"]
+        lines += response_lines(skill_type)
+        lines += ["", "Write nothing else except this format."]
+        return SAFETY_PREAMBLE + _prompt(lines)
+
+    rubric = RUBRICS[skill_type]
+    lines = [rubric["task"], "", "**Technical Assessment Criteria:**", ""]
+    for number, spec in enumerate(rubric["criteria"], 1):
+        lines.append(f"**{number}. {spec['title']}:**")
+        for label, grade in (("Ideal", IDEAL), ("Good", GOOD), ("Unacceptable", UNACCEPTABLE)):
+            lines.append(f"- {label}: {spec['text'][grade].format(reference=reference(spec, grade))}")
+        lines.append("")
+    lines += ["**Assessment Instructions:**", "Watch the video carefully and focus on:"]
+    lines += [f"- {item}" for item in rubric["focus"]]
+    lines += ["", "**Response Format:**", "Provide assessment in this exact format only:"]
+    lines += response_lines(skill_type)
+    lines += ["", "Write nothing else except this format."]
+    prompt = _prompt(lines)
+    return SAFETY_PREAMBLE + prompt if rubric["safety_preamble"] else prompt
+
+def fallback_prompt(skill_type):
+    """The short prompt of `create_simple_fallback_prompt`: the first criterion and the overall grade."""
+    choices = f"[{'/'.join(GRADES)}]"
+    if skill_type == BOTH_SKILLS:
+        task = BOTH_FALLBACK_TASK
+        answers = [f"{rubric['section']} - {OVERALL_CRITERION}: {choices}" for rubric in RUBRICS.values()]
+    else:
+        rubric = RUBRICS[skill_type]
+        task = rubric["fallback_task"]
+        answers = [f"{rubric['criteria'][0]['key']}: {choices}", f"{OVERALL_CRITERION}: {choices}"]
+    lines = [task, f"Options: {' or '.join(GRADES)}", "Return response in this format:"] + answers
+    return _prompt(lines)
+
+# --- Local grading ---
+def compile_bands(spec):
+    """(edges, grades) of a criterion for `np.searchsorted(edges, values, side="left")`.
+
+    Band i covers (edges[i - 1], edges[i]]. Edges where the grade improves
+    are moved down by one ulp, so that both ends of every range in the
+    table stay inside the better grade, as in the prompt's wording.
+    """
+    (ideal_low, ideal_high), (good_low, good_high) = spec["ideal"], spec["good"]
+    points = sorted({good_low, ideal_low, ideal_high, good_high})
+
+    def grade_at(value):
+        if ideal_low <= value <= ideal_high:
+            return IDEAL
+        if good_low <= value <= good_high:
+            return GOOD
+        return UNACCEPTABLE
+
+    # Grade of each open interval between the points, then of the points themselves
+    probes = [points[0] - 1] + [(low + high) / 2 for low, high in zip(points, points[1:])] + [points[-1] + 1]
+    grades = [grade_at(probe) for probe in probes]
+    edges = []
+    for index, point in enumerate(points):
+        # The point belongs to the better of its two neighbouring intervals
+        if GRADE_POINTS[grades[index + 1]] > GRADE_POINTS[grades[index]]:
+            edges.append(np.nextafter(point, -np.inf))
+        else:
+            edges.append(point)
+    return np.array(edges, dtype=np.float64), np.array(grades + [NOT_CLEAR_AR], dtype=object)
+
+_compiled = {}
+
+def compiled_rubric(skill_type):
+    """{criterion key: (edges, grades)} of one skill, compiled once."""
+    if skill_type not in _compiled:
+        _compiled[skill_type] = {spec["key"]: compile_bands(spec) for spec in RUBRICS[skill_type]["criteria"]}
+    return _compiled[skill_type]
+
+def grade_values(skill_type, criterion_key, values):
+    """Grades of an array of measurements of one criterion (NaN or None is غير واضح)."""
+    edges, grades = compiled_rubric(skill_type)[criterion_key]
+    values = np.asarray(values, dtype=np.float64)
+    indices = np.searchsorted(edges, values, side="left")
+    # NaN sorts after every edge; point it at the trailing غير واضح entry
+    indices[np.isnan(values)] = len(grades) - 1
+    return grades[indices]
+
+def grade_measurements(skill_type, measurements):
+    """{criterion: grade} for one clip's {criterion: value or None}, plus the overall grade."""
+    result = {
+        key: str(grade_values(skill_type, key, [np.nan if value is None else value])[0])
+        for key, value in measurements.items()
+    }
+    result[OVERALL_CRITERION] = overall_grade(result.values())
+    return result
+
+def overall_grade(grades):
+    """Mean of the measured criteria: 1.5 points or more is مثالي, 0.75 or more جيد."""
+    points = [GRADE_POINTS[grade] for grade in grades if grade in GRADE_POINTS]
+    if not points:
+        return NOT_CLEAR_AR
+    mean = sum(points) / len(points)
+    return IDEAL if mean >= 1.5 else GOOD if mean >= 0.75 else UNACCEPTABLE
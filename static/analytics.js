@@ -0,0 +1,45 @@
+// Google Analytics for new_app.py. Added to the page once per session by the
+// app (see "Google Analytics Integration"); loads gtag.js and sends the event
+// batches that flush_analytics() leaves in the page as [data-ga-events] elements.
+(function () {
+  var loader = document.getElementById("ga-loader");
+  var measurementId = loader && loader.dataset.gaId;
+  if (!measurementId || window.footballAnalytics) return;
+
+  var tag = document.createElement("script");
+  tag.async = true;
+  tag.src = "https://www.googletagmanager.com/gtag/js?id=" + encodeURIComponent(measurementId);
+  document.head.appendChild(tag);
+
+  window.dataLayer = window.dataLayer || [];
+  function gtag() { window.dataLayer.push(arguments); }
+  window.gtag = gtag;
+  gtag("js", new Date());
+  gtag("config", measurementId);
+  gtag("event", "page_view", {
+    page_title: "Football Skills Assessment",
+    page_location: window.location.href
+  });
+
+  // Each event carries a unique id; reruns may re-render a batch, send it once
+  var sent = {};
+  function sendEvents() {
+    var elements = document.querySelectorAll("[data-ga-events]");
+    for (var i = 0; i < elements.length; i++) {
+      var events;
+      try {
+        events = JSON.parse(elements[i].getAttribute("data-ga-events"));
+      } catch (e) {
+        continue; // Malformed batch; skip it
+      }
+      for (var j = 0; j < events.length; j++) {
+        if (sent[events[j].id]) continue;
+        sent[events[j].id] = true;
+        gtag("event", events[j].name, events[j].params);
+      }
+    }
+  }
+  window.footballAnalytics = { send: sendEvents };
+  sendEvents();
+  new MutationObserver(sendEvents).observe(document.body, { childList: true, subtree: true });
+})();
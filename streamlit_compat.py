@@ -0,0 +1,65 @@
+"""Streamlit internals the app relies on, read in one place.
+
+Streamlit has no public API telling a running script whether a rerun or
+stop is already queued for it (a new upload, a re-submit, a closed tab).
+The session liveness check needs exactly that, so it reads the script
+run's private request queue (`ScriptRequests._state` and `_rerun_data`).
+
+Those attributes are only read on the Streamlit release they were checked
+against, TESTED_STREAMLIT_VERSION; tests/test_streamlit_compat.py fails if
+they disappear from it. On any other release, or if they are missing, the
+run is reported as alive: analyses then only stop when the session ends or
+is explicitly cancelled, never because of a misread.
+"""
+import logging
+
+import streamlit
+
+# Release series whose private ScriptRequests attributes are read below
+TESTED_STREAMLIT_VERSION = "1.48"
+
+_warned = False
+
+def _untested_version():
+    global _warned
+    if streamlit.__version__.split(".")[:2] == TESTED_STREAMLIT_VERSION.split("."):
+        return False
+    if not _warned:
+        _warned = True
+        logging.warning(f"Streamlit {streamlit.__version__} is not {TESTED_STREAMLIT_VERSION}.x: "
+                        "queued reruns no longer cancel running analyses")
+    return True
+
+def queued_script_request(ctx):
+    """(request type name, rerun data) queued for the script run behind `ctx`, or None if it cannot be read.
+
+    The type name is "CONTINUE", "RERUN" or "STOP"; the rerun data is
+    Streamlit's RerunData (fragment_id_queue, is_fragment_scoped_rerun).
+    """
+    if _untested_version():
+        return None
+    requests = getattr(ctx, "script_requests", None)
+    state = getattr(requests, "_state", None)
+    if state is None or not hasattr(requests, "_rerun_data"):
+        return None
+    return state.name, requests._rerun_data
+
+def script_run_superseded(ctx, fragment_id=None):
+    """Whether a queued rerun or stop ends the script run behind `ctx` at its next Streamlit call.
+
+    Reruns queued for other fragments (page sections) than `fragment_id`
+    wait for the run instead of interrupting it. False when the queue
+    cannot be read.
+    """
+    request = queued_script_request(ctx)
+    if request is None:
+        return False
+    state, rerun_data = request
+    if state == "CONTINUE":
+        return False
+    if state == "RERUN":
+        if (rerun_data is not None and rerun_data.fragment_id_queue
+                and not rerun_data.is_fragment_scoped_rerun
+                and fragment_id not in rerun_data.fragment_id_queue):
+            return False
+    return True
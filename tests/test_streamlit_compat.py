@@ -0,0 +1,48 @@
+"""The private Streamlit attributes streamlit_compat.py reads still exist and mean what it expects."""
+import os
+import sys
+from types import SimpleNamespace
+
+import streamlit
+from streamlit.runtime.scriptrunner_utils.script_requests import RerunData, ScriptRequests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from streamlit_compat import TESTED_STREAMLIT_VERSION, queued_script_request, script_run_superseded
+
+def run_context():
+    return SimpleNamespace(script_requests=ScriptRequests())
+
+def test_installed_streamlit_is_the_tested_release():
+    assert streamlit.__version__.startswith(TESTED_STREAMLIT_VERSION + ".")
+
+def test_script_requests_attributes_exist():
+    requests = ScriptRequests()
+    assert requests._state.name == "CONTINUE"
+    assert hasattr(requests._rerun_data, "fragment_id_queue")
+    assert hasattr(requests._rerun_data, "is_fragment_scoped_rerun")
+
+def test_idle_run_is_alive():
+    ctx = run_context()
+    assert queued_script_request(ctx)[0] == "CONTINUE"
+    assert not script_run_superseded(ctx)
+
+def test_full_rerun_and_stop_supersede_the_run():
+    ctx = run_context()
+    ctx.script_requests.request_rerun(RerunData())
+    assert script_run_superseded(ctx, "analysis")
+    ctx = run_context()
+    ctx.script_requests.request_stop()
+    assert script_run_superseded(ctx, "analysis")
+
+def test_rerun_of_another_fragment_waits():
+    ctx = run_context()
+    ctx.script_requests.request_rerun(RerunData(fragment_id_queue=["history"]))
+    assert not script_run_superseded(ctx, "analysis")
+    ctx = run_context()
+    ctx.script_requests.request_rerun(RerunData(fragment_id_queue=["analysis"]))
+    assert script_run_superseded(ctx, "analysis")
+
+def test_missing_attributes_fall_back_to_alive():
+    assert queued_script_request(SimpleNamespace(script_requests=object())) is None
+    assert not script_run_superseded(SimpleNamespace(script_requests=object()), "analysis")
@@ -0,0 +1,30 @@
+"""Theme stylesheet and static assets shared by the Streamlit pages."""
+import os
+import hashlib
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+@st.cache_resource(show_spinner=False)
+def static_asset_url(name, mtime):
+    """Content-hashed URL of a file in static/, computed once per file version.
+
+    Streamlit's own /app/static route serves CSS and JS as text/plain, which
+    browsers refuse to apply. The directory is instead registered as a
+    component, whose route serves the right MIME type with
+    `Cache-Control: public`; the hash in the URL changes with the file, so
+    the browser downloads each version once.
+    """
+    assets = components.declare_component("static_assets", path=STATIC_DIR)
+    with open(os.path.join(STATIC_DIR, name), "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    return f"component/{assets.name}/{name}?v={digest}"
+
+def static_url(name):
+    return static_asset_url(name, os.path.getmtime(os.path.join(STATIC_DIR, name)))
+
+def apply_theme():
+    """Link static/theme.css: a one-line element per run instead of the whole stylesheet."""
+    st.markdown(f'<link rel="stylesheet" href="{static_url("theme.css")}">', unsafe_allow_html=True)